@@ -0,0 +1,68 @@
+"""Counts the data objects allocated while running loop-heavy programs,
+with the shared Booleans and small Integers, and without them.
+
+Run with `python -m benchmarks.allocation`."""
+
+import time
+import tracemalloc
+import vivarium
+import benchmarks.backends
+
+numeric = vivarium.data.numeric
+boolean = vivarium.data.boolean
+
+class AllocationCounter:
+	"""Counts calls to the constructors of Integer, Float and Boolean while in use."""
+
+	def __enter__(self):
+		self.count = 0
+		self.originals = {}
+		for cls in (numeric.Numeric, boolean.Boolean):
+			original = cls.__init__
+			self.originals[cls] = original
+			cls.__init__ = self.wrap(original)
+		return self
+
+	def wrap(self, original):
+		def counted(obj, *args):
+			self.count += 1
+			original(obj, *args)
+		return counted
+
+	def __exit__(self, *args):
+		for cls, original in self.originals.items():
+			cls.__init__ = original
+
+class NotShared:
+	"""Temporarily replaces the factory functions with ones that always allocate."""
+
+	def __enter__(self):
+		self.originals = (numeric.integer, numeric.boolean, boolean.boolean)
+		numeric.integer = numeric.Integer
+		numeric.boolean = boolean.Boolean
+		boolean.boolean = boolean.Boolean
+
+	def __exit__(self, *args):
+		numeric.integer, numeric.boolean, boolean.boolean = self.originals
+
+def measure(code):
+	"""Returns the number of allocations, peak memory (in bytes) and time taken to run the code."""
+	bytecode = vivarium.easy.compile(code)
+	scope = vivarium.scope.Scope(vivarium.scope.global_scope())
+	with AllocationCounter() as counter:
+		tracemalloc.start()
+		start = time.perf_counter()
+		bytecode.evaluate(scope)
+		taken = time.perf_counter() - start
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return counter.count, peak, taken
+
+if __name__ == '__main__':
+	for name, code in benchmarks.backends.PROGRAMS.items():
+		print(name)
+		with NotShared():
+			before = measure(code)
+		after = measure(code)
+		for label, (count, peak, taken) in (('not shared', before), ('shared', after)):
+			print('  {:10} {:9} allocations {:9} bytes peak {:8.4f}s'.format(label, count, peak, taken))
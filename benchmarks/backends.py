@@ -0,0 +1,37 @@
+"""Compares the speed of the execution backends.
+
+Run with `python -m benchmarks.backends`."""
+
+import vivarium
+import benchmarks.suite
+
+PROGRAMS = {
+	'fibonacci': '''
+def r(i):
+    if i <= 0:
+        return 1
+    return r(i - 1) + r(i - 2)
+r(16)
+''',
+	'while_loop': '''
+i = 0
+total = 0
+while i < 20000:
+    if i % 3 == 0:
+        total = total + i
+    i = i + 1
+''',
+}
+
+def time_program(code, backend, repeats = 3):
+	"""Returns the best time (in seconds) taken to evaluate the code, excluding compilation."""
+	bytecode = vivarium.easy.compile(code, backend)
+	return benchmarks.suite.best_time(bytecode.evaluate, repeats, lambda: vivarium.scope.Scope(vivarium.scope.global_scope()))
+
+if __name__ == '__main__':
+	for name, code in PROGRAMS.items():
+		baseline = time_program(code, 'tree')
+		print(name)
+		for backend in vivarium.easy.BACKENDS:
+			taken = time_program(code, backend)
+			print('  {:10} {:8.4f}s  {:5.2f}x'.format(backend, taken, baseline / taken))
@@ -0,0 +1,59 @@
+"""Measures the throughput of `vivarium.easy.run_many`, against running the same jobs one at a time.
+
+Each program is run `count` times with different input. Throughput should grow with the number of workers,
+up to the number of CPUs.
+
+Run with `python -m benchmarks.batch`."""
+
+import multiprocessing
+import time
+import vivarium
+
+PROGRAMS = {
+	'sum': '''
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + i
+    i = i + 1
+print(total)
+''',
+	'fibonacci': '''
+def r(i):
+    if i <= 1:
+        return 1
+    return r(i - 1) + r(i - 2)
+print(r(int(input())))
+''',
+}
+
+def make_jobs(code, count):
+	return [(code, [str(10 + i % 5)]) for i in range(count)]
+
+def time_serial(jobs):
+	start = time.perf_counter()
+	for code, input_data in jobs:
+		vivarium.easy.run(code, input_data, do_print = False, backend = 'vm')
+	return time.perf_counter() - start
+
+def time_batch(jobs, workers):
+	start = time.perf_counter()
+	for result in vivarium.easy.run_many(jobs, workers = workers, timeout = 10):
+		if result.error is not None:
+			raise Exception(result.error)
+	return time.perf_counter() - start
+
+if __name__ == '__main__':
+	count = 2000
+	cpus = multiprocessing.cpu_count()
+	worker_counts = sorted(set([1, 2, 4, cpus]))
+	print('{} CPUs'.format(cpus))
+	for name, code in PROGRAMS.items():
+		jobs = make_jobs(code, count)
+		print(name, '(x{})'.format(count))
+		taken = time_serial(jobs)
+		print('  {:12} {:8.4f}s {:10.1f} jobs/s'.format('serial', taken, count / taken))
+		for workers in worker_counts:
+			taken = time_batch(jobs, workers)
+			print('  {:12} {:8.4f}s {:10.1f} jobs/s'.format('{} workers'.format(workers), taken, count / taken))
@@ -0,0 +1,41 @@
+"""Measures the overhead of calling a function, with each backend.
+
+Each program runs a loop `ITERATIONS` times, calling a function that takes some number of arguments
+and returns the first (or 0). The same loop without the call is timed too, and the difference,
+divided by the number of calls, is the time taken by each call.
+
+Run with `python -m benchmarks.calls`."""
+
+import vivarium
+import benchmarks.suite
+
+ITERATIONS = 20000
+
+LOOP = '''
+{definition}
+i = 0
+total = 0
+while i < {iterations}:
+    total = total + {expression}
+    i = i + 1
+'''
+
+def program(arity, call):
+	"""Returns a program whose loop calls a function with `arity` arguments, or uses a constant if `call` is False."""
+	names = ['a', 'b', 'c', 'd'][:arity]
+	definition = 'def f({}):\n    return {}'.format(', '.join(names), names[0] if names else '0')
+	expression = 'f({})'.format(', '.join(['i'] * arity)) if call else '1'
+	return LOOP.format(definition = definition, iterations = ITERATIONS, expression = expression)
+
+def time_program(code, backend, repeats = 5):
+	"""Returns the best time (in seconds) taken to evaluate the code, excluding compilation."""
+	bytecode = vivarium.easy.compile(code, backend)
+	return benchmarks.suite.best_time(bytecode.evaluate, repeats, lambda: vivarium.scope.Scope(vivarium.scope.builtin_scope()))
+
+if __name__ == '__main__':
+	for backend in vivarium.easy.BACKENDS:
+		print(backend)
+		for arity in range(4):
+			loop = time_program(program(arity, False), backend)
+			calls = time_program(program(arity, True), backend)
+			print('  {} arguments {:8.3f}us per call'.format(arity, (calls - loop) / ITERATIONS * 1000000))
@@ -0,0 +1,57 @@
+"""Measures how long a fresh process takes to run a large script, with and without the on-disk cache.
+
+Run with `python -m benchmarks.cold_start`."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import vivarium
+
+def large_script(functions = 400):
+	"""Returns the source of a long program, which doesn't take long to run."""
+	lines = []
+	for i in range(functions):
+		lines.append('def f{}(a, b):'.format(i))
+		lines.append('    c = a * {} + b'.format(i))
+		lines.append('    if c > 100:')
+		lines.append('        c = c - 100')
+		lines.append('    else:')
+		lines.append('        c = c + 1')
+		lines.append('    return c')
+	lines.append('print(f0(1, 2))')
+	return '\n'.join(lines) + '\n'
+
+def run_process(filename):
+	"""Returns the time taken (in seconds) for `python -m vivarium filename` to finish."""
+	root = os.path.dirname(os.path.dirname(os.path.abspath(vivarium.__file__)))
+	start = time.perf_counter()
+	subprocess.check_call([sys.executable, '-m', 'vivarium', filename], cwd = root, stdout = subprocess.DEVNULL)
+	return time.perf_counter() - start
+
+if __name__ == '__main__':
+	directory = tempfile.mkdtemp()
+	try:
+		filename = os.path.join(directory, 'large.py')
+		with open(filename, 'w') as f:
+			f.write(large_script())
+		cache = os.path.dirname(vivarium.cache.cache_path(filename))
+		shutil.rmtree(cache, ignore_errors = True)
+		cold = run_process(filename)
+		warm = min(run_process(filename) for i in range(3))
+		print('process, no cache   {:8.4f}s'.format(cold))
+		print('process, cached     {:8.4f}s  {:5.2f}x'.format(warm, cold / warm))
+		# Compilation alone, within this process
+		code = open(filename).read()
+		start = time.perf_counter()
+		vivarium.resolve.resolve(vivarium.transform.transform(code))
+		compiled = time.perf_counter() - start
+		start = time.perf_counter()
+		vivarium.cache.load_tree(filename, code)
+		loaded = time.perf_counter() - start
+		print('compile from source {:8.4f}s'.format(compiled))
+		print('load from cache     {:8.4f}s  {:5.2f}x'.format(loaded, compiled / loaded))
+	finally:
+		shutil.rmtree(directory)
@@ -0,0 +1,29 @@
+"""Measures the cost of metering a program's fuel (see `vivarium.fuel`).
+
+Each program is timed compiled normally, and compiled with metering and given plenty of fuel.
+
+Run with `python -m benchmarks.fuel`."""
+
+import vivarium
+import benchmarks.backends
+import benchmarks.suite
+
+def time_program(code, backend, metered, repeats = 10):
+	"""Returns the best time (in seconds) taken to evaluate the code, and the fuel it used."""
+	bytecode = vivarium.easy.compile(code, backend, metered = metered)
+	fuel = []
+	def setup():
+		globs = vivarium.scope.global_scope()
+		fuel[:] = [vivarium.fuel.Fuel(10 ** 12, globs) if metered else None]
+		return vivarium.scope.Scope(globs)
+	best = benchmarks.suite.best_time(bytecode.evaluate, repeats, setup)
+	return best, fuel[0].used() if metered else None
+
+if __name__ == '__main__':
+	for name, code in benchmarks.backends.PROGRAMS.items():
+		print(name)
+		for backend in vivarium.easy.BACKENDS:
+			plain, _ = time_program(code, backend, False)
+			metered, used = time_program(code, backend, True)
+			overhead = (metered - plain) / plain * 100
+			print('  {:10} {:8.4f}s plain {:8.4f}s metered {:+6.1f}%  ({} steps)'.format(backend, plain, metered, overhead, used))
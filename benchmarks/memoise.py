@@ -0,0 +1,58 @@
+"""Measures how much memoising pure functions (see `vivarium.memoise`) saves.
+
+Each program is run with the 'tree' backend, with and without a Memoiser, and the outputs are checked to be the same.
+
+Run with `python -m benchmarks.memoise`."""
+
+import time
+import vivarium
+import vivarium.memoise
+
+PROGRAMS = {
+	# The naive, exponential version, as often written by students
+	'fibonacci': '''
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+print(fib(22))
+''',
+	# Nothing can be memoised, so this only shows the cost of checking for pure functions
+	'printing': '''
+def show(n):
+    print(n)
+i = 0
+while i < 2000:
+    show(i)
+    i = i + 1
+''',
+	# Every call has different arguments, so this shows the cost of looking up and storing results
+	'all_misses': '''
+def square(n):
+    return n * n
+i = 0
+total = 0
+while i < 20000:
+    total = total + square(i)
+    i = i + 1
+print(total)
+''',
+}
+
+def time_run(code, memoise):
+	"""Returns the output of the code, and the time (in seconds) taken to run it."""
+	start = time.perf_counter()
+	output = vivarium.easy.run(code, do_print = False, memoise = memoise)
+	return output, time.perf_counter() - start
+
+if __name__ == '__main__':
+	for name, code in PROGRAMS.items():
+		plain_output, plain = time_run(code, None)
+		memoiser = vivarium.memoise.Memoiser()
+		memoised_output, memoised = time_run(code, memoiser)
+		if memoised_output != plain_output:
+			raise Exception('{}: memoised output differs'.format(name))
+		print(name)
+		print('  {:8.4f}s plain {:8.4f}s memoised ({:.2f}x speed-up)'.format(plain, memoised, plain / memoised))
+		for line in memoiser.report().splitlines():
+			print('  ' + line)
@@ -0,0 +1,70 @@
+"""Measures how much memory compiled programs and live values take up.
+
+Reports the average size of a node in a compiled (transformed and resolved) program,
+and the memory used by each value held in a variable.
+
+Run with `python -m benchmarks.memory`."""
+
+import tracemalloc
+import vivarium
+import vivarium.cache
+import benchmarks.backends
+import benchmarks.cold_start
+
+# Number of values created when measuring their size
+VALUES = 10000
+
+NODE_TYPES = tuple(vivarium.serialise.NODE_FIELDS)
+
+def count_nodes(obj):
+	"""Returns the number of nodes in a structure."""
+	seen = set()
+	pending = [obj]
+	count = 0
+	while pending:
+		i = pending.pop()
+		if id(i) in seen:
+			continue
+		seen.add(id(i))
+		if isinstance(i, (list, tuple)):
+			pending.extend(i)
+		elif isinstance(i, NODE_TYPES):
+			count += 1
+			for cls in type(i).__mro__:
+				for name in cls.__dict__.get('__slots__', ()):
+					if hasattr(i, name):
+						pending.append(getattr(i, name))
+			pending.extend(getattr(i, '__dict__', {}).values())
+	return count
+
+def bytes_per_node(code):
+	"""Returns the number of nodes in the compiled program, and their average size in bytes."""
+	tree = vivarium.resolve.resolve(vivarium.transform.transform(code))
+	nodes = count_nodes(tree)
+	return nodes, vivarium.cache.approximate_size(tree) / nodes
+
+def bytes_per_value(make):
+	"""Returns the average memory used by a value created by `make(i)`, and the Store holding it."""
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	values = [vivarium.data.Store(make(i)) for i in range(VALUES)]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	# The list holding the values isn't part of their cost
+	return (after - before - len(values) * 8) / VALUES
+
+VALUE_KINDS = {
+	'Integer': lambda i: vivarium.data.Integer(1000 + i),
+	'Float': lambda i: vivarium.data.Float(i + 0.5),
+	'String': lambda i: vivarium.data.String('s'),
+	'Boolean': lambda i: vivarium.data.Boolean(i % 2),
+}
+
+if __name__ == '__main__':
+	programs = dict(benchmarks.backends.PROGRAMS)
+	programs['large_script'] = benchmarks.cold_start.large_script()
+	for name, code in programs.items():
+		nodes, size = bytes_per_node(code)
+		print('{:14} {:6} nodes {:8.1f} bytes per node'.format(name, nodes, size))
+	for name, make in VALUE_KINDS.items():
+		print('{:14} {:8.1f} bytes per stored value'.format(name, bytes_per_value(make)))
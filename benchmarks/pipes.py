@@ -0,0 +1,77 @@
+"""Compares the ways a program's output can be captured, and its input given (see `vivarium.pipes`).
+
+Each program prints (or reads) `count` lines. Output is captured in full, through a ring buffer,
+streamed to a callback, and written to /dev/null in batches or one line at a time.
+Input is given as a list, and read lazily from a file and a memory-mapped file.
+
+Run with `python -m benchmarks.pipes`."""
+
+import mmap
+import os
+import sys
+import tempfile
+import time
+import vivarium
+
+PRINT_CODE = '''
+n = int(input())
+i = 0
+while i < n:
+    print(i)
+    i = i + 1
+'''
+
+READ_CODE = '''
+n = int(input())
+total = 0
+i = 0
+while i < n:
+    total = total + int(input())
+    i = i + 1
+print(total)
+'''
+
+def time_output(bytecode, count, **options):
+	globs = vivarium.scope.builtin_scope()
+	output = vivarium.pipes.Output(scope = globs, **options)
+	vivarium.pipes.Input([str(count)], globs)
+	start = time.perf_counter()
+	bytecode.evaluate(vivarium.scope.Scope(globs))
+	output.flush()
+	return time.perf_counter() - start
+
+def time_input(bytecode, source):
+	globs = vivarium.scope.builtin_scope()
+	output = vivarium.pipes.Output(display = False, scope = globs)
+	vivarium.pipes.Input(source, globs)
+	start = time.perf_counter()
+	bytecode.evaluate(vivarium.scope.Scope(globs))
+	return time.perf_counter() - start
+
+if __name__ == '__main__':
+	count = 100000
+	bytecode = vivarium.easy.compile(PRINT_CODE, 'vm')
+	with open(os.devnull, 'w') as devnull:
+		print('Printing {} lines'.format(count))
+		print('  {:24} {:8.4f}s'.format('list', time_output(bytecode, count, display = False)))
+		print('  {:24} {:8.4f}s'.format('ring buffer of 100', time_output(bytecode, count, display = False, keep = 100)))
+		print('  {:24} {:8.4f}s'.format('callback', time_output(bytecode, count, display = False, keep = 0, callback = len)))
+		print('  {:24} {:8.4f}s'.format('batched to /dev/null', time_output(bytecode, count, display = False, keep = 0, fd = devnull.fileno())))
+		stdout = sys.stdout
+		sys.stdout = devnull
+		try:
+			taken = time_output(bytecode, count, keep = 0)
+		finally:
+			sys.stdout = stdout
+		print('  {:24} {:8.4f}s'.format('print to /dev/null', taken))
+	lines = [str(count)] + [str(i) for i in range(count)]
+	bytecode = vivarium.easy.compile(READ_CODE, 'vm')
+	with tempfile.TemporaryFile('w+b') as f:
+		f.write('\n'.join(lines).encode('utf-8') + b'\n')
+		f.flush()
+		print('Reading {} lines'.format(count))
+		print('  {:24} {:8.4f}s'.format('list', time_input(bytecode, lines)))
+		f.seek(0)
+		print('  {:24} {:8.4f}s'.format('file', time_input(bytecode, f)))
+		with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+			print('  {:24} {:8.4f}s'.format('memory-mapped file', time_input(bytecode, mapped)))
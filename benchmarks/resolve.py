@@ -0,0 +1,30 @@
+"""Compares variable access inside functions before and after `vivarium.resolve`.
+
+Run with `python -m benchmarks.resolve`."""
+
+import vivarium
+import benchmarks.suite
+
+PROGRAM = '''
+def outer(n):
+    total = 0
+    def step(i):
+        return total + i * 2
+    i = 0
+    while i < n:
+        total = step(i)
+        i = i + 1
+    return total
+outer(20000)
+'''
+
+def time_tree(tree, repeats = 3):
+	"""Returns the best time (in seconds) taken to evaluate the tree."""
+	return benchmarks.suite.best_time(tree.evaluate, repeats, lambda: vivarium.scope.Scope(vivarium.scope.global_scope()))
+
+if __name__ == '__main__':
+	tree = vivarium.transform.transform(PROGRAM)
+	unresolved = time_tree(tree)
+	resolved = time_tree(vivarium.resolve.resolve(tree))
+	print('unresolved {:8.4f}s'.format(unresolved))
+	print('resolved   {:8.4f}s  {:5.2f}x'.format(resolved, unresolved / resolved))
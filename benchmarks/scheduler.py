@@ -0,0 +1,41 @@
+"""Measures the cost of running many programs at once with `vivarium.scheduler`.
+
+Each program is run `count` times one after the other with `vivarium.easy.run`,
+then all at once through a Scheduler, for a few slice sizes.
+Smaller slices share the time more fairly, but switch between programs more often.
+
+Run with `python -m benchmarks.scheduler`."""
+
+import time
+import vivarium
+import vivarium.scheduler
+import benchmarks.backends
+
+SLICE_SIZES = (10, 100, 1000)
+
+def time_sequential(code, count):
+	start = time.perf_counter()
+	for i in range(count):
+		vivarium.easy.run(code, backend = 'vm')
+	return time.perf_counter() - start
+
+def time_scheduled(code, count, slice_steps):
+	"""Returns the time taken to run `count` copies of the code, and the number of slices they took."""
+	scheduler = vivarium.scheduler.Scheduler(slice_steps)
+	start = time.perf_counter()
+	tasks = [scheduler.add(code) for i in range(count)]
+	scheduler.run()
+	taken = time.perf_counter() - start
+	for task in tasks:
+		if task.error is not None:
+			raise task.error
+	return taken, sum(task.slices for task in tasks)
+
+if __name__ == '__main__':
+	count = 100
+	for name, code in benchmarks.backends.PROGRAMS.items():
+		print(name, '(x{})'.format(count))
+		print('  {:16} {:8.4f}s'.format('sequential', time_sequential(code, count)))
+		for slice_steps in SLICE_SIZES:
+			taken, slices = time_scheduled(code, count, slice_steps)
+			print('  {:16} {:8.4f}s  ({} slices)'.format('slices of {}'.format(slice_steps), taken, slices))
@@ -0,0 +1,84 @@
+"""Load tests `python -m vivarium serve`.
+
+Starts a server on a Unix socket, then sends it requests from a number of clients at once,
+each waiting for one response before sending its next request.
+Reports the requests answered per second, and the median and 99th percentile latency.
+
+Run with `python -m benchmarks.serve [clients] [requests per client]`."""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+CODE = '''
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + i
+    i = i + 1
+print(total)
+'''
+
+def connect(path, timeout = 10):
+	"""Connect to the server, waiting for it to start listening."""
+	give_up = time.monotonic() + timeout
+	while True:
+		try:
+			client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			client.connect(path)
+			return client
+		except OSError:
+			client.close()
+			if time.monotonic() > give_up:
+				raise
+			time.sleep(0.05)
+
+def client(path, count, latencies):
+	connection = connect(path)
+	reader = connection.makefile('rb')
+	for i in range(count):
+		request = {'id': i, 'code': CODE, 'input': [str(100 + i % 10)], 'backend': 'vm', 'max_steps': 10 ** 6, 'timeout': 5}
+		start = time.perf_counter()
+		connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+		response = json.loads(reader.readline().decode('utf-8'))
+		latencies.append(time.perf_counter() - start)
+		if response['error'] is not None:
+			raise Exception(response['error'])
+	connection.close()
+
+def percentile(values, fraction):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * fraction))]
+
+if __name__ == '__main__':
+	clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+	directory = tempfile.mkdtemp()
+	path = os.path.join(directory, 'vivarium.sock')
+	server = subprocess.Popen([sys.executable, '-m', 'vivarium', 'serve', '--socket', path])
+	try:
+		# Make sure the server is up before starting the clock
+		connect(path).close()
+		latencies = []
+		threads = [threading.Thread(target = client, args = (path, count, latencies)) for i in range(clients)]
+		start = time.perf_counter()
+		for i in threads:
+			i.start()
+		for i in threads:
+			i.join()
+		taken = time.perf_counter() - start
+	finally:
+		server.terminate()
+		server.wait()
+		shutil.rmtree(directory)
+	print('{} clients, {} requests each'.format(clients, count))
+	print('{:10.1f} requests/s'.format(len(latencies) / taken))
+	print('{:10.2f}ms median latency'.format(percentile(latencies, 0.5) * 1000))
+	print('{:10.2f}ms p99 latency'.format(percentile(latencies, 0.99) * 1000))
@@ -0,0 +1,218 @@
+"""A suite of representative workloads, for noticing when a change makes vivarium slower.
+
+Each workload is timed with every backend, and with CPython itself as a baseline,
+so the results also show how much slower than Python each backend is.
+
+	python -m benchmarks.suite run --output before.json
+	(make some changes)
+	python -m benchmarks.suite run --output after.json
+	python -m benchmarks.suite compare before.json after.json
+
+`compare` lists the change in each timing, and exits with status 1 if any got slower by more than the threshold."""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import vivarium
+import benchmarks.cold_start
+
+# Bumped whenever the layout of the results file changes
+FORMAT_VERSION = 1
+
+# The timing taken with CPython, in the results
+BASELINE = 'cpython'
+
+FIBONACCI = '''
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+print(fib(18))
+'''
+
+WHILE_LOOP = '''
+i = 0
+total = 0
+while i < 30000:
+    if i % 3 == 0:
+        total = total + i * 2
+    else:
+        total = total - 1
+    i = i + 1
+print(total)
+'''
+
+STRING_BUILDING = '''
+s = ''
+i = 0
+while i < 5000:
+    s = s + str(i % 10)
+    i = i + 1
+print('done')
+'''
+
+SMALL_PROGRAM = '''
+a = int(input())
+b = int(input())
+print(a * b + max(a, b))
+'''
+
+class Workload:
+	"""Something to time. `run_vivarium(backend)` and `run_cpython()` each do the work once."""
+
+	def __init__(self, name, run_vivarium, run_cpython):
+		self.name = name
+		self.run_vivarium = run_vivarium
+		self.run_cpython = run_cpython
+
+def cpython_globals(input_data = ()):
+	"""The builtins a program expects, for running it with CPython."""
+	lines = iter(input_data)
+	return {'print': lambda *args: None, 'input': lambda prompt = '': next(lines)}
+
+def run_workload(name, code):
+	"""A workload that runs a single program, compiled beforehand."""
+	compiled = {}
+	python_code = compile(code, name, 'exec')
+	def run_vivarium(backend):
+		if backend not in compiled:
+			compiled[backend] = vivarium.easy.compile(code, backend)
+		vivarium.easy.execute(compiled[backend], do_print = False)
+	def run_cpython():
+		exec(python_code, cpython_globals())
+	return Workload(name, run_vivarium, run_cpython)
+
+def small_runs_workload(count = 500):
+	"""A workload that runs a small program many times through `vivarium.easy.run`, including setting up each run."""
+	python_code = compile(SMALL_PROGRAM, 'small_runs', 'exec')
+	def run_vivarium(backend):
+		for i in range(count):
+			vivarium.easy.run(SMALL_PROGRAM, [str(i), '7'], do_print = False, backend = backend)
+	def run_cpython():
+		for i in range(count):
+			exec(python_code, cpython_globals([str(i), '7']))
+	return Workload('small_runs', run_vivarium, run_cpython)
+
+def compile_workload():
+	"""A workload that only compiles a large program, without running it (or using any cache)."""
+	code = benchmarks.cold_start.large_script()
+	def run_vivarium(backend):
+		vivarium.easy.compile(code, backend)
+	def run_cpython():
+		compile(code, 'compile_large', 'exec')
+	return Workload('compile_large', run_vivarium, run_cpython)
+
+def workloads():
+	return [
+		run_workload('fibonacci', FIBONACCI),
+		run_workload('while_loop', WHILE_LOOP),
+		run_workload('string_building', STRING_BUILDING),
+		small_runs_workload(),
+		compile_workload(),
+	]
+
+def best_time(function, repeats, setup = None):
+	"""Returns the shortest time (in seconds) that `function` took, out of `repeats` calls.
+
+	If `setup` is given, it's called (untimed) before each call, and what it returns is passed to `function`."""
+	best = None
+	for i in range(repeats):
+		arguments = () if setup is None else (setup(),)
+		start = time.perf_counter()
+		function(*arguments)
+		taken = time.perf_counter() - start
+		if best is None or taken < best:
+			best = taken
+	return best
+
+def run(repeats = 5, names = None):
+	"""Time each workload (or those named) with each backend and CPython. Returns the results, ready to be saved as JSON."""
+	results = {}
+	for workload in workloads():
+		if names and workload.name not in names:
+			continue
+		timings = {BASELINE: best_time(workload.run_cpython, repeats)}
+		for backend in vivarium.easy.BACKENDS:
+			# Once first, so that compiling and caching aren't part of the timing
+			workload.run_vivarium(backend)
+			timings[backend] = best_time(lambda: workload.run_vivarium(backend), repeats)
+		results[workload.name] = timings
+		show(workload.name, timings)
+	return {
+		'version': FORMAT_VERSION,
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'repeats': repeats,
+		'results': results,
+	}
+
+def show(name, timings):
+	baseline = timings[BASELINE]
+	print(name)
+	for key, taken in timings.items():
+		if key == BASELINE:
+			print('  {:10} {:9.5f}s'.format(key, taken))
+		else:
+			print('  {:10} {:9.5f}s {:8.1f}x slower than CPython'.format(key, taken, taken / baseline))
+
+def load(filename):
+	with open(filename) as f:
+		data = json.load(f)
+	if data.get('version') != FORMAT_VERSION:
+		raise ValueError('{} has an unsupported format version {!r}'.format(filename, data.get('version')))
+	return data
+
+def compare(before, after, threshold = 0.1, relative = False):
+	"""Compare two sets of results. Returns a list of (workload, backend, before, after) for each regression.
+
+	A regression is a vivarium timing that got more than `threshold` (a fraction) slower.
+	If `relative` is True, timings are compared as multiples of the CPython baseline measured in the same run,
+	so that results from different machines can be compared."""
+	regressions = []
+	print('{:16} {:10} {:>10} {:>10} {:>8}'.format('workload', 'backend', 'before', 'after', 'change'))
+	for name, old in sorted(before['results'].items()):
+		new = after['results'].get(name)
+		if new is None:
+			continue
+		for backend in old:
+			if backend == BASELINE or backend not in new:
+				continue
+			if relative:
+				change = (new[backend] / new[BASELINE]) / (old[backend] / old[BASELINE]) - 1
+			else:
+				change = new[backend] / old[backend] - 1
+			flag = ''
+			if change > threshold:
+				flag = '  REGRESSION'
+				regressions.append((name, backend, old[backend], new[backend]))
+			print('{:16} {:10} {:9.5f}s {:9.5f}s {:+7.1%}{}'.format(name, backend, old[backend], new[backend], change, flag))
+	return regressions
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(prog = 'python -m benchmarks.suite')
+	commands = parser.add_subparsers(dest = 'command')
+	run_parser = commands.add_parser('run', help = 'Time each workload')
+	run_parser.add_argument('--output', help = 'Write the results to this JSON file')
+	run_parser.add_argument('--repeats', type = int, default = 5, help = 'Take the best of this many timings')
+	run_parser.add_argument('workloads', nargs = '*', help = 'Only run these workloads')
+	compare_parser = commands.add_parser('compare', help = 'Compare two results files')
+	compare_parser.add_argument('before')
+	compare_parser.add_argument('after')
+	compare_parser.add_argument('--threshold', type = float, default = 0.1,
+		help = 'How much slower (as a fraction) a timing may get before it counts as a regression')
+	compare_parser.add_argument('--relative', action = 'store_true', help = 'Compare timings relative to the CPython baseline')
+	arguments = parser.parse_args()
+	if arguments.command == 'run':
+		data = run(arguments.repeats, arguments.workloads)
+		if arguments.output is not None:
+			with open(arguments.output, 'w') as f:
+				json.dump(data, f, indent = '\t')
+	elif arguments.command == 'compare':
+		regressions = compare(load(arguments.before), load(arguments.after), arguments.threshold, arguments.relative)
+		if regressions:
+			print('{} regression(s)'.format(len(regressions)))
+			sys.exit(1)
+	else:
+		parser.print_help()
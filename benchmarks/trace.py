@@ -0,0 +1,33 @@
+"""Measures the cost of tracing hooks (see `vivarium.trace`).
+
+Each program is run with the 'tree' backend three ways: normally, with an empty list of hooks,
+and with a single hook that does nothing. The first two should take the same time,
+since a run without hooks uses the usual (cached) structure, which never checks for them.
+
+Run with `python -m benchmarks.trace`."""
+
+import vivarium
+import benchmarks.backends
+import benchmarks.suite
+
+def ignore(event, node, arg):
+	pass
+
+def time_program(code, hooks, repeats = 10):
+	"""Returns the best time (in seconds) taken to run the code with the given hooks, and the number of events."""
+	events = [0]
+	if hooks:
+		def count(event, node, arg):
+			events[0] += 1
+		hooks = hooks + [count]
+	best = benchmarks.suite.best_time(lambda: vivarium.easy.run(code, do_print = False, hooks = hooks), repeats)
+	return best, events[0] // repeats
+
+if __name__ == '__main__':
+	for name, code in benchmarks.backends.PROGRAMS.items():
+		plain, _ = time_program(code, None)
+		empty, _ = time_program(code, [])
+		traced, events = time_program(code, [ignore])
+		print(name)
+		print('  {:8.4f}s plain {:8.4f}s no hooks {:+6.1f}% {:8.4f}s traced {:+6.1f}%  ({} events)'.format(
+			plain, empty, (empty - plain) / plain * 100, traced, (traced - plain) / plain * 100, events))
@@ -1,73 +1,139 @@
+"""Runs the tests listed in tests.txt, with every backend, with and without optimisation.
+
+Each test is a program (name.py) and a list of cases (name.json), each giving the input and the expected output.
+Each program is compiled once per configuration, and its cases are run in parallel across worker processes
+(see `vivarium.batch`). Every case is run, even after one fails. The checks in tests/checks.py are run afterwards.
+
+	python -m tests [--workers N] [--report FILE]
+
+The report is a JSON object with the number of cases (and checks) that passed and failed, and a list describing each."""
+
 import vivarium
+import vivarium.batch
+from tests.checks import CHECKS
+import argparse
 import json
 import os
 import itertools
+import sys
+import time
+import traceback
 
 def open_relative(my_file):
 	fn = os.path.join(os.path.dirname(__file__), my_file)
 	return open(fn)
 
-class OutputCapture:
-
-	def __init__(self):
-		self.output = []
-
-	def __call__(self, *args):
-		s = ' '.join(str(i) for i in args)
-		self.output.append(s)
-
-class InputPipe:
-
-	def __init__(self, lines, scope = None):
-		self.lines = lines
-		self.current = 0
-
-	def __call__(self, *args):
-		assert self.current < len(self.lines)
-		l = self.lines[self.current]
-		self.current += 1
-		return l
-
-def run_test(name):
-	print('Running', n)
-	# Load required data
-	jdata = json.loads(open_relative(name + '.json').read())
-	code = open_relative(name + '.py').read()
-	for k, io in enumerate(jdata):
-		print('Case', k + 1)
-		# print(io)
-		globs = vivarium.scope.global_scope()
-		bytecode = vivarium.transform.transform(code)
-		# Capture the output
-		capture = OutputCapture()
-		globs.set('print').set(vivarium.data.function.FunctionBuiltin(capture))
-		# Pipe the input
-		pipe = InputPipe(io['input'])
-		globs.set('input').set(vivarium.data.function.FunctionBuiltin(pipe))
-		# Run
-		globs.lockdown()
-		program_scope = vivarium.scope.Scope(globs)
-		bytecode.evaluate(program_scope)
-		# This should be updated to give more detailed errors
-		if capture.output != io['output']:
+def load_test(name):
+	"""Returns the code for a test, and its cases."""
+	with open_relative(name + '.py') as f:
+		code = f.read()
+	with open_relative(name + '.json') as f:
+		cases = json.loads(f.read())
+	return code, cases
+
+def show_difference(output, expected):
+	for a, b in itertools.zip_longest(output, expected, fillvalue = ''):
+		s1 = a.rjust(30)
+		s2 = b.ljust(30)
+		if a == b:
+			print(s1, '   ', s2)
+		else:
+			print(s1, '---', s2)
+
+def run_tests(tests, backend, optimise, workers = None):
+	"""Run every case of every test in one configuration. Returns a list of reports, one per case.
+
+	Arguments:
+	tests -- A list of (name, code, cases) for each test."""
+	jobs = []
+	reports = []
+	for name, code, cases in tests:
+		for k, io in enumerate(cases):
+			jobs.append((code, io['input']))
+			reports.append({
+				'test': name,
+				'case': k + 1,
+				'backend': backend,
+				'optimised': optimise,
+				'expected': io['output'],
+			})
+	for result in vivarium.batch.run_many(jobs, backend, optimise, workers):
+		report = reports[result.index]
+		report['output'] = result.output
+		report['error'] = result.error
+		report['time'] = result.time
+		report['passed'] = result.error is None and result.output == report['expected']
+	return reports
+
+def show_reports(reports):
+	name = None
+	for report in reports:
+		if report['test'] != name:
+			name = report['test']
+			print('Running', name, '({}{})'.format(report['backend'], ', optimised' if report['optimised'] else ''))
+		print('Case', report['case'])
+		if report['time'] is not None:
+			# Only a rough guide to speed, since cases run in parallel. See benchmarks/ for proper timings.
+			print('Took {:.4f}s'.format(report['time']))
+		if report['error'] is not None:
+			print('Error:', report['error'])
+		elif not report['passed']:
 			print('Output does not match!')
-			for a, b in itertools.zip_longest(capture.output, io['output'], fillvalue = ''):
-				s1 = a.rjust(30)
-				s2 = b.ljust(30)
-				if a == b:
-					print(s1, '   ', s2)
-				else:
-					print(s1, '---', s2)
-			return False
-	return True
-
-if __name__ == '__main__':		
+			show_difference(report['output'], report['expected'])
+
+def run_checks(checks):
+	"""Run each check, returning a list of reports like those of `run_tests`."""
+	reports = []
+	for function in checks:
+		start = time.perf_counter()
+		try:
+			function()
+			error = None
+		except Exception as e:
+			error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+		reports.append({
+			'test': 'check',
+			'case': function.__name__,
+			'error': error,
+			'time': time.perf_counter() - start,
+			'passed': error is None,
+		})
+	return reports
+
+def show_checks(reports):
+	print('Running checks')
+	for report in reports:
+		print('Check', report['case'], 'passed' if report['passed'] else 'failed')
+		if report['error'] is not None:
+			print('Error:', report['error'])
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(prog = 'python -m tests')
+	parser.add_argument('--workers', type = int, help = 'Number of processes to run cases in. Defaults to the number of CPUs.')
+	parser.add_argument('--report', help = 'Write a JSON report of every case to this file')
+	arguments = parser.parse_args()
 
 	print('Running unit tests...')
 
-	for i in open_relative('tests.txt'):
-		n = i.strip()
-		if not run_test(n):
-			break
-	else:
-		print('Done!')
\ No newline at end of file
+	with open_relative('tests.txt') as f:
+		names = [i.strip() for i in f if i.strip()]
+	tests = [(name,) + load_test(name) for name in names]
+	configurations = [(b, o) for o in (False, True) for b in vivarium.easy.BACKENDS]
+	reports = []
+	for backend, optimise in configurations:
+		results = run_tests(tests, backend, optimise, arguments.workers)
+		show_reports(results)
+		reports.extend(results)
+	results = run_checks(CHECKS)
+	show_checks(results)
+	reports.extend(results)
+	passed = sum(1 for i in reports if i['passed'])
+	failed = len(reports) - passed
+	if arguments.report is not None:
+		with open(arguments.report, 'w') as f:
+			json.dump({'passed': passed, 'failed': failed, 'cases': reports}, f, indent = '\t')
+	if failed:
+		print('{} of {} cases failed'.format(failed, len(reports)))
+		sys.exit(1)
+	print('Done!')
@@ -0,0 +1,19 @@
+def zero():
+    return 0
+
+def one(a):
+    return a
+
+def two(a, b):
+    return b
+
+def three(a, b, c):
+    return a + c
+
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + zero() + one(i) + two(1, i) + three(1, 2, 3)
+    i = i + 1
+print(total)
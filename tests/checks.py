@@ -0,0 +1,482 @@
+"""Checks of behaviour that can't be tested by running a program and comparing its output.
+
+Each check is a function that raises an exception (usually an AssertionError) if it fails.
+They're run by `python -m tests`, after the programs in tests.txt."""
+
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import vivarium
+import vivarium.cache
+import vivarium.memoise
+import vivarium.profiler
+import vivarium.quota
+import vivarium.scheduler
+
+# The checks, in the order they're run
+CHECKS = []
+
+def check(function):
+	"""Add a function to CHECKS."""
+	CHECKS.append(function)
+	return function
+
+def run_coroutine(coroutine, timeout = 10):
+	"""Run a coroutine to completion on a new event loop, failing if it takes longer than `timeout` seconds."""
+	loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(loop)
+	try:
+		return loop.run_until_complete(asyncio.wait_for(coroutine, timeout))
+	finally:
+		asyncio.set_event_loop(None)
+		loop.close()
+
+@check
+def run_async_output_before_input():
+	"""A program that fills the output buffer before asking for input shouldn't wait for input to make room."""
+	count = vivarium.easy.MAX_PENDING_OUTPUT + 50
+	code = 'i = 0\nwhile i < {}:\n    print(i)\n    i = i + 1\nprint(input())\n'.format(count)
+	printed = []
+	async def main():
+		# Made here, so that it belongs to the loop the check runs on
+		everything_printed = asyncio.Event()
+		async def sink(line):
+			printed.append(line)
+			if len(printed) == count:
+				everything_printed.set()
+		async def source():
+			# Only gives input once every line before the `input` has been passed on
+			await everything_printed.wait()
+			yield 'done'
+		await vivarium.easy.run_async(code, source(), sink, slice_steps = 50)
+	run_coroutine(main())
+	assert printed == [str(i) for i in range(count)] + ['done'], printed[-3:]
+
+@check
+def run_async_interleaving():
+	"""Each line of output is passed on before the program waits for the input that follows it."""
+	code = 'n = int(input())\nwhile n > 0:\n    print(n)\n    n = int(input())\nprint("end")\n'
+	events = []
+	async def sink(line):
+		events.append(('out', line))
+	async def source():
+		for i in ('2', '1', '0'):
+			# Give the program time to print everything it can before the next line
+			for j in range(5):
+				await asyncio.sleep(0)
+			events.append(('in', i))
+			yield i
+	run_coroutine(vivarium.easy.run_async(code, source(), sink))
+	assert events == [('in', '2'), ('out', '2'), ('in', '1'), ('out', '1'), ('in', '0'), ('out', 'end')], events
+
+TRACED_PROGRAM = '''
+def double(n):
+    result = n * 2
+    return result
+i = 0
+while i < 3:
+    x = double(i)
+    i = i + 1
+print(x)
+'''
+
+@check
+def hooks_events():
+	"""Hooks see calls, returns, loop iterations, assignments and builtin calls, in order."""
+	for optimise in (False, True):
+		events = []
+		def hook(event, node, arg):
+			if event in ('call', 'builtin'):
+				events.append((event, node.lineno))
+			elif event == 'assign':
+				events.append((event, (arg[0], str(arg[1]))))
+			else:
+				events.append((event, None if arg is None else str(arg)))
+		output = vivarium.easy.run(TRACED_PROGRAM, do_print = False, optimise = optimise, hooks = [hook])
+		assert output == ['4'], output
+		expected = [('assign', ('i', '0'))]
+		for i in range(3):
+			expected += [
+				('loop', None),
+				('call', 7),
+				('assign', ('result', str(i * 2))),
+				('return', str(i * 2)),
+				('assign', ('x', str(i * 2))),
+				('assign', ('i', str(i + 1))),
+			]
+		expected.append(('builtin', 9))
+		assert events == expected, events
+
+@check
+def profile_with_hooks():
+	"""Adding hooks doesn't change what the profiler sees."""
+	def line_counts(hooks):
+		profiler = vivarium.profiler.Profiler()
+		vivarium.easy.run(TRACED_PROGRAM, do_print = False, profile = profiler, hooks = hooks)
+		return dict((line, stats[0]) for line, stats in profiler.line_stats().items())
+	plain = line_counts(None)
+	traced = line_counts([lambda event, node, arg: None])
+	assert plain == traced, (plain, traced)
+	assert plain[6] == 4 and plain[3] == 3, plain
+
+def raises(error, function):
+	"""Check that calling `function` raises `error`."""
+	try:
+		function()
+	except error:
+		return
+	raise AssertionError('{} was not raised'.format(error.__name__))
+
+def configurations():
+	"""Yields (backend, optimise) for every configuration the programs in tests.txt are run in."""
+	for optimise in (False, True):
+		for backend in vivarium.easy.BACKENDS:
+			yield backend, optimise
+
+RECURSIVE_PROGRAM = '''
+def down(n):
+    if n == 0:
+        return 0
+    return down(n - 1) + 1
+print(down(int(input())))
+'''
+
+@check
+def recursion_depth():
+	"""Recursing without end raises a RecursionDepthExceeded, rather than crashing, with every backend."""
+	for backend, optimise in configurations():
+		raises(vivarium.errors.RecursionDepthExceeded,
+			lambda: vivarium.easy.run(RECURSIVE_PROGRAM, ['1000000'], do_print = False, backend = backend, optimise = optimise))
+		output = vivarium.easy.run(RECURSIVE_PROGRAM, ['40'], do_print = False, backend = backend, optimise = optimise)
+		assert output == ['40'], (backend, optimise, output)
+
+@check
+def max_depth():
+	"""The VM limits how deeply calls are nested to `max_depth`."""
+	for optimise in (False, True):
+		output = vivarium.easy.run(RECURSIVE_PROGRAM, ['40'], do_print = False, backend = 'vm', optimise = optimise, max_depth = 50)
+		assert output == ['40'], output
+		raises(vivarium.errors.RecursionDepthExceeded,
+			lambda: vivarium.easy.run(RECURSIVE_PROGRAM, ['60'], do_print = False, backend = 'vm', optimise = optimise, max_depth = 50))
+
+LOOPING_PROGRAM = '''
+n = int(input())
+i = 0
+while i < n:
+    i = i + 1
+print(i)
+'''
+
+@check
+def out_of_fuel():
+	"""Running out of fuel raises an OutOfFuel with every backend, and having enough doesn't."""
+	for backend, optimise in configurations():
+		raises(vivarium.errors.OutOfFuel,
+			lambda: vivarium.easy.run(LOOPING_PROGRAM, ['100000'], do_print = False, backend = backend, optimise = optimise, max_steps = 10000))
+		output = vivarium.easy.run(LOOPING_PROGRAM, ['10'], do_print = False, backend = backend, optimise = optimise, max_steps = 10000)
+		assert output == ['10'], (backend, optimise, output)
+
+# Each of these builds a value of several kilobytes
+BIG_VALUE_PROGRAMS = [
+	'x = 10 ** 3000\ny = x * x\n',
+	'x = 10 ** 3000\ny = x ** 4\n',
+	's = "a"\ni = 0\nwhile i < 14:\n    s = s + s\n    i = i + 1\n',
+	# Built by adding to a value too small to count, and by the other operators
+	'x = 10 ** 1300\nx = x * x\na = x + 1\nb = x - 1\nc = x // 3\nd = x % (x - 1)\n',
+	# Built by converting Integers too small to count to Strings
+	's = str(10 ** 1500)\nt = str(10 ** 1600)\nu = str(10 ** 1700)\n',
+]
+
+@check
+def memory_limit():
+	"""Building values bigger than the memory limit raises a MemoryLimitExceeded with every backend."""
+	for backend, optimise in configurations():
+		for code in BIG_VALUE_PROGRAMS:
+			raises(vivarium.errors.MemoryLimitExceeded,
+				lambda: vivarium.easy.run(code, do_print = False, backend = backend, optimise = optimise, max_memory = 3000))
+			quota = vivarium.quota.MemoryQuota(10 ** 6)
+			vivarium.easy.run(code, do_print = False, backend = backend, optimise = optimise, max_memory = quota)
+			assert 3000 < quota.peak <= 10 ** 6, (backend, optimise, code, quota.peak)
+
+ECHO_PROGRAM = '''
+n = int(input())
+while n != 0:
+    print(n)
+    n = int(input())
+print('done')
+'''
+
+@check
+def scheduler_interleaving():
+	"""The scheduler takes turns between programs, pauses those waiting for input, and keeps going when one fails."""
+	scheduler = vivarium.scheduler.Scheduler(slice_steps = 20)
+	looping = scheduler.add(LOOPING_PROGRAM, ['2000'])
+	echo = scheduler.add(ECHO_PROGRAM, ['1'], interactive = True)
+	failing = scheduler.add('print(1 + "a")\n')
+	scheduler.run_round()
+	assert looping.status == vivarium.scheduler.READY, looping
+	assert scheduler.run() == [echo]
+	assert looping.output == ['2000'] and looping.slices > 10, looping
+	assert echo.output == ['1'], echo.output
+	assert failing.status == vivarium.scheduler.FAILED and failing.error is not None, failing
+	echo.feed('2', '0')
+	assert scheduler.run() == []
+	assert echo.output == ['1', '2', 'done'] and echo.done, echo.output
+
+def test_programs():
+	"""Yields (name, code, cases) for each of the programs in tests.txt."""
+	directory = os.path.dirname(__file__)
+	with open(os.path.join(directory, 'tests.txt')) as f:
+		names = [i.strip() for i in f if i.strip()]
+	for name in names:
+		with open(os.path.join(directory, name + '.py')) as f:
+			code = f.read()
+		with open(os.path.join(directory, name + '.json')) as f:
+			cases = json.loads(f.read())
+		yield name, code, cases
+
+@check
+def memoised_output():
+	"""Memoising a program's pure functions doesn't change its output."""
+	memoised = set()
+	for name, code, cases in test_programs():
+		for optimise in (False, True):
+			for case in cases:
+				memoiser = vivarium.memoise.Memoiser()
+				output = vivarium.easy.run(code, case['input'], do_print = False, optimise = optimise, memoise = memoiser)
+				plain = vivarium.easy.run(code, case['input'], do_print = False, optimise = optimise)
+				assert output == plain == case['output'], (name, optimise, output, plain)
+				if memoiser.functions:
+					memoised.add(name)
+	# Make sure something was actually memoised
+	assert 'fibonacci' in memoised, memoised
+
+@check
+def memoise_impure():
+	"""Functions that print, use globals or assign to them aren't memoised."""
+	code = 'k = 1\ndef a(x):\n    print(x)\ndef b(x):\n    return x + k\ndef c(x):\n    k = x\n    return x\ndef d(x):\n    return x * 2\n' \
+		'a(1)\na(1)\nprint(b(1), c(2), d(3), d(3))\nk = 5\nprint(b(1))\n'
+	memoiser = vivarium.memoise.Memoiser()
+	output = vivarium.easy.run(code, do_print = False, memoise = memoiser)
+	assert output == vivarium.easy.run(code, do_print = False) == ['1', '1', '2 2 6 6', '6'], output
+	assert sorted(memoiser.impure) == ['a', 'b', 'c'], memoiser.impure
+	stats = [(i.name, i.hits, i.misses) for i in memoiser.functions.values()]
+	assert stats == [('d', 1, 1)], stats
+
+@check
+def run_from_file_instrumented():
+	"""`run_from_file` takes the same profiling, hooks and memoisation arguments as `run`."""
+	directory = tempfile.mkdtemp()
+	try:
+		filename = os.path.join(directory, 'fibonacci.py')
+		with open(os.path.join(os.path.dirname(__file__), 'fibonacci.py')) as f, open(filename, 'w') as g:
+			g.write(f.read())
+		for i in range(2):
+			# The second time, the program comes from the cache on disk
+			events = []
+			memoiser = vivarium.memoise.Memoiser()
+			profiler = vivarium.profiler.Profiler()
+			output = vivarium.easy.run_from_file(filename, ['10'], do_print = False,
+				profile = profiler, hooks = [lambda event, node, arg: events.append(event)], memoise = memoiser)
+			assert output == ['144'], output
+			assert 'call' in events and memoiser.functions and profiler.functions, (events, memoiser.functions)
+	finally:
+		shutil.rmtree(directory)
+
+@check
+def corrupt_cache():
+	"""A damaged file in the cache on disk is treated as missing: the program is compiled again, and the file replaced."""
+	directory = tempfile.mkdtemp()
+	try:
+		filename = os.path.join(directory, 'fibonacci.py')
+		with open(os.path.join(os.path.dirname(__file__), 'fibonacci.py')) as f, open(filename, 'w') as g:
+			g.write(f.read())
+		path = vivarium.cache.cache_path(filename)
+		# Make sure the program isn't taken from the cache in memory instead, here and below
+		vivarium.easy.program_cache.clear()
+		vivarium.easy.run_from_file(filename, ['10'], do_print = False)
+		with open(path) as f:
+			text = f.read()
+		data = json.loads(text)
+		damaged = [text[:len(text) // 2], '[]']
+		for tree in ([], ['node'], ['node', 'Nope', None], ['node', 'Statements', None], ['node', 'Statements', None, ['list', [[]]]]):
+			damaged.append(json.dumps(dict(data, tree = tree)))
+		for text in damaged:
+			with open(path, 'w') as f:
+				f.write(text)
+			vivarium.easy.program_cache.clear()
+			output = vivarium.easy.run_from_file(filename, ['10'], do_print = False)
+			assert output == ['144'], (text, output)
+			with open(path) as f:
+				assert json.load(f)['tree'] == data['tree'], text
+	finally:
+		shutil.rmtree(directory)
+
+# The most Python function calls each backend may make for each call to a function in a program,
+# as (calls for a function with no arguments, extra calls for each argument)
+CALL_BUDGET = {
+	'tree': (13, 6),
+	'closure': (9, 6),
+	'vm': (4, 4),
+}
+
+def python_calls(bytecode):
+	"""Returns the number of Python functions called while evaluating a compiled program."""
+	calls = [0]
+	def count(frame, event, arg):
+		if event == 'call':
+			calls[0] += 1
+	scope = vivarium.scope.Scope(vivarium.scope.builtin_scope())
+	sys.setprofile(count)
+	try:
+		bytecode.evaluate(scope)
+	finally:
+		sys.setprofile(None)
+	return calls[0]
+
+@check
+def call_overhead():
+	"""Calling a function doesn't take more Python function calls than CALL_BUDGET allows, with any backend.
+
+	This is a steadier measure of call overhead than timing (see benchmarks/calls.py), so it's checked here."""
+	loop = 'def f({}):\n    return 0\ni = 0\nwhile i < 100:\n    x = {}\n    i = i + 1\n'
+	for backend, (base, per_argument) in CALL_BUDGET.items():
+		for arity in range(4):
+			names = ', '.join('abcd'[:arity])
+			calls = python_calls(vivarium.easy.compile(loop.format(names, 'f({})'.format(', '.join(['i'] * arity))), backend))
+			constant = python_calls(vivarium.easy.compile(loop.format(names, '1'), backend))
+			per_call = (calls - constant) / 100
+			assert per_call <= base + per_argument * arity, (backend, arity, per_call)
+
+# Reads a count, then that many numbers, printing the running total after each
+TOTAL_PROGRAM = '''
+n = int(input())
+total = 0
+while n > 0:
+    total = total + int(input())
+    print(total)
+    n = n - 1
+'''
+
+@check
+def input_sources():
+	"""Input can come from an iterator, a file or a memory-mapped file, and is only read as the program asks for it."""
+	taken = []
+	def numbers():
+		yield '3'
+		i = 1
+		while True:
+			taken.append(i)
+			yield str(i)
+			i += 1
+	output = vivarium.easy.run(TOTAL_PROGRAM, numbers(), do_print = False)
+	assert output == ['1', '3', '6'] and taken == [1, 2, 3], (output, taken)
+	with tempfile.TemporaryFile() as f:
+		f.write(b'3\r\n1\n2\n3')
+		f.flush()
+		f.seek(0)
+		output = vivarium.easy.run(TOTAL_PROGRAM, f, do_print = False)
+		assert output == ['1', '3', '6'], output
+		assert f.readline() == b'', 'Lines were left unread'
+		with mmap.mmap(f.fileno(), 0) as m:
+			output = vivarium.easy.run(TOTAL_PROGRAM, m, do_print = False)
+			assert output == ['1', '3', '6'], output
+	with tempfile.TemporaryFile('w+') as f:
+		f.write('2\n5\n6\n')
+		f.seek(0)
+		output = vivarium.easy.run(TOTAL_PROGRAM, f, do_print = False)
+		assert output == ['5', '11'], output
+
+@check
+def output_options():
+	"""Output keeps only the last `keep` lines, passes each line to `callback` and writes them all to `fd`."""
+	lines = [str(i) for i in range(5)]
+	for keep, kept in ((None, lines), (2, lines[3:]), (0, [])):
+		called = []
+		read, write = os.pipe()
+		try:
+			output = vivarium.pipes.Output(False, keep = keep, fd = write, callback = called.append)
+			for i in lines:
+				output(vivarium.data.string.String(i))
+			output.flush()
+			os.close(write)
+			write = None
+			with os.fdopen(read, 'rb') as f:
+				read = None
+				written = f.read()
+		finally:
+			for fd in (read, write):
+				if fd is not None:
+					os.close(fd)
+		assert output.get_data() == kept, (keep, output.get_data())
+		assert called == lines, called
+		assert written == b'0\n1\n2\n3\n4\n', written
+
+@check
+def output_limit():
+	"""Printing more than `max_output` characters raises an OutputLimitExceeded, with every backend."""
+	code = 'i = 0\nwhile i < 100:\n    print(i)\n    i = i + 1\n'
+	# 10 lines of one digit, then 90 of two, each with a newline
+	size = 10 * 2 + 90 * 3
+	for backend, optimise in configurations():
+		output = vivarium.easy.run(code, do_print = False, backend = backend, optimise = optimise, max_output = size)
+		assert len(output) == 100, (backend, optimise, output)
+		raises(vivarium.errors.OutputLimitExceeded,
+			lambda: vivarium.easy.run(code, do_print = False, backend = backend, optimise = optimise, max_output = size - 1))
+
+@check
+def serve_pipe():
+	"""`python -m vivarium serve` answers each line on stdin, including lines that aren't valid JSON, and carries on."""
+	requests = [
+		json.dumps({'id': 1, 'code': 'print(int(input()) * 2)', 'input': ['21']}),
+		'{"id": 2, "code": ',
+		json.dumps({'id': 3, 'code': 'print(1'}),
+		json.dumps({'id': 4, 'code': 'print(2)', 'backend': 'vm'}),
+	]
+	process = subprocess.Popen([sys.executable, '-m', 'vivarium', 'serve'], stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+		cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__))), universal_newlines = True)
+	try:
+		out, _ = process.communicate(''.join(i + '\n' for i in requests), timeout = 30)
+	finally:
+		if process.poll() is None:
+			process.kill()
+			process.wait()
+	responses = [json.loads(i) for i in out.splitlines()]
+	assert process.returncode == 0 and len(responses) == 4, (process.returncode, out)
+	assert responses[0] == {'id': 1, 'output': ['42'], 'error': None}, responses[0]
+	assert responses[1]['id'] is None and responses[1]['output'] is None and responses[1]['error'], responses[1]
+	assert responses[2]['id'] == 3 and responses[2]['error'].startswith('SyntaxError'), responses[2]
+	assert responses[3] == {'id': 4, 'output': ['2'], 'error': None}, responses[3]
+
+@check
+def program_cache():
+	"""ProgramCache evicts the least recently used programs once over `max_entries` or `max_bytes`, and counts its use."""
+	built = []
+	def build(key):
+		def make():
+			built.append(key)
+			return [key] * 10
+		return make
+	cache = vivarium.cache.ProgramCache(max_entries = 2)
+	for key in ('a', 'b', 'a', 'c', 'b', 'a'):
+		assert cache.fetch(key, build(key)) == [key] * 10, key
+	# 'a' was used more recently than 'b' when 'c' came in, so 'b' went; then 'b' pushed out 'a', and 'a' pushed out 'c'
+	assert built == ['a', 'b', 'c', 'b', 'a'], built
+	assert list(cache.entries) == ['b', 'a'], list(cache.entries)
+	stats = cache.stats()
+	size = vivarium.cache.approximate_size(['a'] * 10)
+	assert stats == {'hits': 1, 'misses': 5, 'evictions': 3, 'entries': 2, 'bytes': 2 * size}, stats
+	# Room for two programs by size, however many entries are allowed
+	cache.set_limits(max_entries = None, max_bytes = 2 * size)
+	for key in ('c', 'b', 'd'):
+		cache.fetch(key, build(key))
+	assert list(cache.entries) == ['b', 'd'] and cache.bytes == 2 * size, (list(cache.entries), cache.bytes)
+	cache.set_limits(max_entries = 1)
+	assert list(cache.entries) == ['d'], list(cache.entries)
+	cache.clear()
+	assert len(cache) == 0 and cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}, cache.stats()
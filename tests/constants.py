@@ -0,0 +1,14 @@
+x = 2 ** 10 + 3 * 4
+print(x)
+if 1 < 2:
+    print('yes')
+else:
+    print('no')
+while 1 > 2:
+    print('never')
+def square(n):
+    pass
+    return n ** 2
+print(square(7))
+print(square(1.5))
+print('ab' + 'cd')
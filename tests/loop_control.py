@@ -0,0 +1,27 @@
+def first_multiple(n, k):
+    i = 1
+    while True:
+        if i % k == 0:
+            if i >= n:
+                return i
+        i = i + 1
+
+def count_odd(n):
+    i = 0
+    total = 0
+    while i < n:
+        i = i + 1
+        if i % 2 == 0:
+            continue
+        total = total + 1
+    return total
+
+n = int(input())
+i = 0
+while True:
+    if i * i > n:
+        break
+    i = i + 1
+print(i)
+print(first_multiple(n, 7))
+print(count_odd(n))
@@ -0,0 +1,10 @@
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    if i % 2 == 0:
+        total = total + i
+    else:
+        total = total - 1
+    i = i + 1
+print(total)
@@ -7,7 +7,13 @@ You can invoke the vivarium shell from the command line by running `python -m vi
 """
 
 import vivarium.transform
+import vivarium.resolve
 import vivarium.core
+import vivarium.closure
+import vivarium.vm
 import vivarium.scope
 import vivarium.easy
 import vivarium.data
+import vivarium.errors
+import vivarium.fuel
+import vivarium.quota
@@ -1,6 +1,6 @@
 if __name__ == '__main__':
 
-	import vivarium.transform
+	import vivarium.easy
 	import vivarium.scope
 	import vivarium.data.function
 	import sys
@@ -15,10 +15,10 @@ if __name__ == '__main__':
 		print(text[:-1])
 		print((' ' * off) + '^')
 
-	def proc_code(code, the_scope, show_line_nums = True):
+	def proc_code(code, the_scope, show_line_nums = True, filename = None):
 		result = None
 		try:
-			bytecode = vivarium.transform.transform(code)
+			bytecode = vivarium.easy.compile(code, filename = filename)
 		except SyntaxError as e:
 			display_syntax_error(e, show_line_nums)
 			return None
@@ -36,7 +36,19 @@ if __name__ == '__main__':
 		else:
 			print('Help on \'{}\' has not been implemented.'.format(topic))
 
-	if len(sys.argv) == 1:
+	if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+		import argparse
+		import vivarium.serve
+		parser = argparse.ArgumentParser(prog = 'python -m vivarium serve',
+			description = 'Run programs sent as JSON lines, writing a JSON line back for each.')
+		parser.add_argument('--socket', help = 'Listen on a Unix socket at this path, rather than reading stdin')
+		arguments = parser.parse_args(sys.argv[2:])
+		vivarium.serve.warm_up()
+		if arguments.socket is None:
+			vivarium.serve.serve_stream(sys.stdin, sys.stdout)
+		else:
+			vivarium.serve.serve_socket(arguments.socket)
+	elif len(sys.argv) == 1:
 		print('Vivarium development version.')
 		globs = vivarium.scope.global_scope()
 		globs.set('help').set(vivarium.data.function.FunctionBuiltin(help_func))
@@ -58,4 +70,4 @@ if __name__ == '__main__':
 			the_scope = vivarium.scope.Scope(vivarium.scope.global_scope())
 			with open(i) as f:
 				code = f.read()
-			proc_code(code, the_scope)
\ No newline at end of file
+			proc_code(code, the_scope, filename = i)
\ No newline at end of file
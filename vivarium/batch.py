@@ -0,0 +1,180 @@
+"""Runs large batches of programs across a pool of worker processes.
+
+Each program is compiled once, in the parent process, and sent to the workers as plain data
+(see `vivarium.serialise`), so workers never parse any Python. A worker keeps the programs it has been sent,
+so running the same program again (with different input) only sends the input.
+
+Results are produced as each job finishes, which isn't necessarily the order they were given in.
+A job that takes longer than its timeout has its worker killed, and a new worker takes its place.
+
+	for result in vivarium.batch.run_many([(code, ['1']), (code, ['2'])], timeout = 5):
+		print(result.index, result.output, result.error)"""
+
+import collections
+import multiprocessing
+import multiprocessing.connection
+import time
+import vivarium.cache
+import vivarium.easy
+import vivarium.errors
+import vivarium.serialise
+
+# The most compiled programs that the parent, and each worker, hold on to. Once there are more, they're all dropped.
+MAX_PROGRAMS = 1024
+
+# The result of a single job.
+# index -- The job's position in the list of jobs.
+# output -- The lines the program printed, or None if it didn't finish.
+# error -- None if the program finished, otherwise a description of what went wrong, such as
+#	'OutOfFuel: Program ran out of fuel after 1000 steps'.
+# time -- The number of seconds the program ran for, or None if it never started.
+JobResult = collections.namedtuple('JobResult', ('index', 'output', 'error', 'time'))
+
+def describe(error):
+	"""Describe an exception as a string, since the exception itself may not survive being sent between processes."""
+	return '{}: {}'.format(type(error).__name__, error)
+
+def work(connection, backend, limits):
+	"""The main loop of a worker process. Runs jobs sent through `connection` until it's sent None."""
+	programs = {}
+	while True:
+		message = connection.recv()
+		if message is None:
+			break
+		index, key, data, input_data = message
+		if data is not None:
+			if len(programs) >= MAX_PROGRAMS:
+				programs.clear()
+			programs[key] = vivarium.easy.BACKENDS[backend](vivarium.serialise.loads(data))
+		start = time.perf_counter()
+		try:
+			output = vivarium.easy.execute(programs[key], input_data, False, *limits)
+			connection.send(JobResult(index, output, None, time.perf_counter() - start))
+		except Exception as e:
+			connection.send(JobResult(index, None, describe(e), time.perf_counter() - start))
+
+class Worker:
+	"""A worker process, as seen from the parent process."""
+
+	def __init__(self, context, backend, limits):
+		self.connection, child = context.Pipe()
+		self.process = context.Process(target = work, args = (child, backend, limits), daemon = True)
+		self.process.start()
+		child.close()
+		# The keys of the programs this worker has been sent
+		self.programs = set()
+		# The index of the job it's running, and when it has to be done by
+		self.job = None
+		self.expires = None
+
+	def send(self, index, key, data, input_data, timeout):
+		if key in self.programs:
+			data = None
+		elif len(self.programs) >= MAX_PROGRAMS:
+			# The worker does the same when it's sent the program
+			self.programs.clear()
+		self.connection.send((index, key, data, input_data))
+		self.programs.add(key)
+		self.job = index
+		self.expires = None if timeout is None else time.monotonic() + timeout
+
+	def stop(self):
+		try:
+			self.connection.send(None)
+		except OSError:
+			pass
+		self.process.join(1)
+		self.kill()
+
+	def kill(self):
+		if self.process.is_alive():
+			self.process.terminate()
+			self.process.join()
+		self.connection.close()
+
+def run_many(jobs, backend = 'vm', optimise = False, workers = None, timeout = None, max_depth = None, max_steps = None, max_memory = None,
+		max_output = None):
+	"""Run each of a number of programs in a pool of worker processes, yielding a JobResult as each one finishes.
+
+	Arguments:
+	jobs -- An iterable of (code, input_data) pairs. It's only read as workers become free, so it can be a generator.
+
+	Keyword arguments:
+	backend, optimise -- How to compile the programs. See `vivarium.easy.compile`.
+	workers -- The number of worker processes. Defaults to the number of CPUs.
+	timeout -- If given, the number of seconds each job may take. The worker running a job
+		that takes any longer is killed and replaced, and the job's error is a DeadlineExceeded.
+	max_depth, max_steps, max_memory, max_output -- Limits for each job. See `vivarium.easy.run`.
+	"""
+	if backend not in vivarium.easy.BACKENDS:
+		raise ValueError('Unknown backend ' + repr(backend))
+	if max_depth is not None and backend != 'vm':
+		raise ValueError("max_depth is only supported by the 'vm' backend")
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+	limits = (max_depth, max_steps, max_memory, max_output)
+	metered = max_steps is not None
+	context = multiprocessing.get_context()
+	# Compiled programs, as sent to the workers
+	compiled = {}
+	jobs = enumerate(jobs)
+	pool = []
+	idle = []
+	try:
+		for i in range(workers):
+			worker = Worker(context, backend, limits)
+			pool.append(worker)
+			idle.append(worker)
+		while True:
+			# Give every idle worker a job
+			while idle:
+				job = next(jobs, None)
+				if job is None:
+					break
+				index, (code, input_data) = job
+				key = vivarium.cache.source_key(code, optimise, metered)
+				if key not in compiled:
+					if len(compiled) >= MAX_PROGRAMS:
+						compiled.clear()
+					try:
+						compiled[key] = vivarium.serialise.dumps(vivarium.easy.compile_tree(code, optimise = optimise, metered = metered))
+					except Exception as e:
+						# The program can't be compiled, so there's nothing to send
+						yield JobResult(index, None, describe(e), None)
+						continue
+				idle.pop().send(index, key, compiled[key], input_data, timeout)
+			busy = [i for i in pool if i.job is not None]
+			if not busy:
+				break
+			# Wait for a result, or for the next job to run out of time
+			wait = None
+			expires = [i.expires for i in busy if i.expires is not None]
+			if expires:
+				wait = max(0, min(expires) - time.monotonic())
+			ready = multiprocessing.connection.wait([i.connection for i in busy], wait)
+			now = time.monotonic()
+			for worker in busy:
+				replace = False
+				if worker.connection in ready:
+					try:
+						result = worker.connection.recv()
+					except EOFError:
+						result = JobResult(worker.job, None, 'WorkerDied: The worker process running the program exited', None)
+						replace = True
+				elif worker.expires is not None and now >= worker.expires:
+					result = JobResult(worker.job, None, describe(vivarium.errors.DeadlineExceeded(timeout)), timeout)
+					replace = True
+				else:
+					continue
+				if replace:
+					# It's stuck (or dead), so start again with a fresh worker
+					worker.kill()
+					pool.remove(worker)
+					worker = Worker(context, backend, limits)
+					pool.append(worker)
+				worker.job = None
+				idle.append(worker)
+				yield result
+	finally:
+		for worker in pool:
+			worker.stop()
@@ -0,0 +1,222 @@
+"""Caching of compiled programs.
+
+Compiled programs don't hold any state from the runs that use them
+(everything a run creates lives in its own Scopes and Frames),
+so a single compiled program can safely be evaluated any number of times.
+
+`ProgramCache` keeps programs in memory. `load_tree` keeps them on disk, much like Python's `__pycache__`."""
+
+import collections
+import hashlib
+import json
+import os
+import sys
+import threading
+import types
+import vivarium.transform
+import vivarium.optimise
+import vivarium.resolve
+import vivarium.serialise
+
+# Compiled programs are stored in a directory with this name, next to their source
+CACHE_DIRECTORY_NAME = '__vivcache__'
+
+# If set, compiled programs are stored in this directory instead
+cache_directory = None
+
+def source_key(code, *options):
+	"""Returns a key identifying some source code, compiled with the given options."""
+	digest = hashlib.sha256()
+	for i in options:
+		digest.update(str(i).encode('utf-8'))
+		digest.update(b'\0')
+	digest.update(code.encode('utf-8'))
+	return digest.hexdigest()
+
+def approximate_size(obj):
+	"""Estimate the number of bytes used by an object and everything reachable from it.
+
+	Follows instance attributes, containers, bound methods and closures. Types, modules and code are ignored."""
+	seen = set()
+	pending = [obj]
+	total = 0
+	while pending:
+		i = pending.pop()
+		if id(i) in seen or isinstance(i, (type, types.ModuleType, types.CodeType)):
+			continue
+		seen.add(id(i))
+		total += sys.getsizeof(i)
+		if isinstance(i, (list, tuple, set, frozenset)):
+			pending.extend(i)
+		elif isinstance(i, dict):
+			pending.extend(i.keys())
+			pending.extend(i.values())
+		elif isinstance(i, types.FunctionType):
+			for cell in i.__closure__ or ():
+				pending.append(cell.cell_contents)
+		elif isinstance(i, types.MethodType):
+			pending.append(i.__self__)
+		else:
+			if hasattr(i, '__dict__'):
+				pending.append(i.__dict__)
+			for cls in type(i).__mro__:
+				for name in cls.__dict__.get('__slots__', ()):
+					if hasattr(i, name):
+						pending.append(getattr(i, name))
+	return total
+
+class ProgramCache:
+	"""A thread-safe, least-recently-used cache of compiled programs.
+
+	Entries are evicted once there are more than `max_entries` of them,
+	or their combined (approximate) size goes over `max_bytes`."""
+
+	def __init__(self, max_entries = 1024, max_bytes = None):
+		"""Create a cache.
+
+		Arguments:
+		max_entries -- The maximum number of programs to keep. None for no limit.
+		max_bytes -- The maximum combined size of the programs, in bytes. None for no limit."""
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.entries = collections.OrderedDict()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.lock = threading.Lock()
+
+	def fetch(self, key, build):
+		"""Returns the program stored under `key`.
+
+		If it isn't in the cache, `build()` is called to create it, and the result is stored."""
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is not None:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return entry[0]
+			self.misses += 1
+		# Built outside of the lock so that other threads aren't held up
+		program = build()
+		size = approximate_size(program)
+		with self.lock:
+			if key not in self.entries:
+				self.entries[key] = (program, size)
+				self.bytes += size
+				self.evict()
+		return program
+
+	def evict(self):
+		"""Remove the least recently used entries until the cache is within its limits. Call with the lock held."""
+		while self.entries and (
+			(self.max_entries is not None and len(self.entries) > self.max_entries) or
+			(self.max_bytes is not None and self.bytes > self.max_bytes)
+		):
+			key, (program, size) = self.entries.popitem(last = False)
+			self.bytes -= size
+			self.evictions += 1
+
+	def set_limits(self, max_entries = 1024, max_bytes = None):
+		"""Change the limits of the cache, evicting entries if necessary."""
+		with self.lock:
+			self.max_entries = max_entries
+			self.max_bytes = max_bytes
+			self.evict()
+
+	def clear(self):
+		"""Remove every entry and reset the statistics."""
+		with self.lock:
+			self.entries.clear()
+			self.bytes = 0
+			self.hits = 0
+			self.misses = 0
+			self.evictions = 0
+
+	def stats(self):
+		"""Returns a dictionary of statistics about the cache's use."""
+		with self.lock:
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'entries': len(self.entries),
+				'bytes': self.bytes,
+			}
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __repr__(self):
+		return 'CACHE({} entries, {} bytes)'.format(len(self.entries), self.bytes)
+
+def cache_path(filename, optimise = False):
+	"""Returns the path of the file that the compiled form of a source file is stored in."""
+	filename = os.path.abspath(filename)
+	base = os.path.basename(filename)
+	if optimise:
+		base += '.opt'
+	if cache_directory is None:
+		return os.path.join(os.path.dirname(filename), CACHE_DIRECTORY_NAME, base + '.json')
+	tag = hashlib.sha256(filename.encode('utf-8')).hexdigest()[:16]
+	return os.path.join(cache_directory, '{}-{}.json'.format(base, tag))
+
+def read_cached_tree(path, stat, digest):
+	"""Load a compiled program from disk. Returns None if it's missing, unreadable or out of date."""
+	try:
+		with open(path) as f:
+			data = json.load(f)
+		if type(data) is not dict:
+			return None
+		if (data.get('version') != vivarium.serialise.FORMAT_VERSION or
+			data.get('mtime') != stat.st_mtime or
+			data.get('size') != stat.st_size or
+			data.get('hash') != digest):
+			return None
+		return vivarium.serialise.decode_node(data['tree'])
+	except (OSError, ValueError, KeyError, TypeError):
+		return None
+
+def write_cached_tree(path, stat, digest, tree):
+	"""Store a compiled program on disk. Failure (such as the directory being read-only) is ignored."""
+	try:
+		data = {
+			'version': vivarium.serialise.FORMAT_VERSION,
+			'mtime': stat.st_mtime,
+			'size': stat.st_size,
+			'hash': digest,
+			'tree': vivarium.serialise.encode_node(tree),
+		}
+		os.makedirs(os.path.dirname(path), exist_ok = True)
+		# Write to a temporary file first, so that other processes never see half a file
+		temporary = '{}.{}.tmp'.format(path, os.getpid())
+		with open(temporary, 'w') as f:
+			json.dump(data, f)
+		os.replace(temporary, path)
+	except (OSError, ValueError):
+		pass
+
+def load_tree(filename, code = None, optimise = False):
+	"""Returns the resolved structure for a source file.
+
+	If the compiled copy on disk is up to date (the source's modification time, size and hash all match),
+	it is loaded from there. Otherwise the source is compiled, and the result is written to disk for next time.
+
+	Arguments:
+	filename -- The path to the source file.
+	code -- The contents of the file, if they have already been read.
+	optimise -- Whether to run the structure through `vivarium.optimise`. Optimised structures are cached separately."""
+	stat = os.stat(filename)
+	if code is None:
+		with open(filename) as f:
+			code = f.read()
+	digest = source_key(code)
+	path = cache_path(filename, optimise)
+	tree = read_cached_tree(path, stat, digest)
+	if tree is None:
+		tree = vivarium.transform.transform(code)
+		if optimise:
+			tree = vivarium.optimise.optimise(tree)
+		tree = vivarium.resolve.resolve(tree)
+		write_cached_tree(path, stat, digest, tree)
+	return tree
@@ -0,0 +1,401 @@
+"""Compiles the structure produced by `vivarium.transform` into nested Python closures.
+
+The tree is walked once, ahead of time. Operator selection, constant unwrapping
+and references to child nodes are all bound into the closures, so running the
+program doesn't have to look any of them up again.
+
+	program = vivarium.closure.compile(vivarium.transform.transform(code))
+	program.evaluate(scope)
+
+Node types that the compiler doesn't know about fall back to their own `evaluate` method."""
+
+import operator
+import vivarium.core
+import vivarium.data
+import vivarium.errors
+import vivarium.fuel
+import vivarium.signal
+
+Store = vivarium.data.store.Store
+Completion = vivarium.signal.Completion
+assert_datatype = vivarium.data.datatype.assert_datatype
+
+# Nodes whose `evaluate` never produces a Store, so their result doesn't need unwrapping.
+VALUE_NODES = (
+	vivarium.core.Constant,
+	vivarium.core.Variable,
+	vivarium.core.LocalVariable,
+	vivarium.core.OuterVariable,
+	vivarium.core.GlobalVariable,
+	vivarium.core.BinOp,
+	vivarium.core.Comparison,
+	vivarium.core.List,
+	vivarium.core.Tuple,
+)
+
+COMPARISONS = {
+	'==': operator.eq,
+	'!=': operator.ne,
+	'<=': operator.le,
+	'>=': operator.ge,
+	'<':  operator.lt,
+	'>':  operator.gt,
+}
+
+class Program:
+	"""A compiled piece of code.
+
+	Behaves like the structure it was compiled from: call `evaluate(scope)` to run it."""
+
+	__slots__ = ('evaluate', 'node')
+
+	def __init__(self, function, node):
+		"""function -- The compiled closure. Takes a scope.
+		node -- The structure the closure was compiled from."""
+		self.evaluate = function
+		self.node = node
+
+	def __repr__(self):
+		return 'COMPILED({})'.format(self.node)
+
+def may_complete(node):
+	"""Whether evaluating a statement might produce a Completion (see `vivarium.signal`).
+
+	Blocks that can't don't need to check the result of each statement."""
+	t = type(node)
+	if t in (vivarium.core.Return, vivarium.core.Break, vivarium.core.Continue):
+		return True
+	if t is vivarium.core.Statements:
+		return any(may_complete(i) for i in node.statements)
+	if t is vivarium.core.IfBranch:
+		return may_complete(node.if_block) or (node.else_block is not None and may_complete(node.else_block))
+	if t is vivarium.core.WhileLoop:
+		return may_complete(node.block)
+	return False
+
+def compile(node):
+	"""Compile a structure produced by `vivarium.transform.transform` into a Program."""
+	return Program(compile_node(node), node)
+
+def compile_node(node):
+	"""Compile a single node into a closure that takes a scope."""
+	compiler = COMPILERS.get(type(node))
+	if compiler is None:
+		return node.evaluate
+	return compiler(node)
+
+def compile_value(node):
+	"""Like compile_node, but the closure's result is unwrapped if it might be a Store."""
+	function = compile_node(node)
+	if isinstance(node, VALUE_NODES):
+		return function
+	def unwrapped(scope):
+		value = function(scope)
+		if type(value) is Store:
+			return value.get()
+		return value
+	return unwrapped
+
+def c_set_statement(node):
+	expression = compile_node(node.expression)
+	if type(node.reference) is vivarium.core.VariableReference:
+		name = node.reference.name
+		def set_variable(scope):
+			value = expression(scope)
+			scope.set(name).set(value)
+		return set_variable
+	reference = compile_node(node.reference)
+	def set_statement(scope):
+		value = expression(scope)
+		reference(scope).set(value)
+	return set_statement
+
+def c_variable(node):
+	name = node.name
+	def variable(scope):
+		return scope.get(name).get()
+	return variable
+
+def c_variable_reference(node):
+	name = node.name
+	def variable_reference(scope):
+		return scope.set(name)
+	return variable_reference
+
+def c_local_variable(node):
+	slot = node.slot
+	fallback = compile_node(node.fallback)
+	def local_variable(frame):
+		value = frame.slots[slot]
+		if value is None:
+			return fallback(frame)
+		return value
+	return local_variable
+
+def c_outer_variable(node):
+	depth = node.depth
+	slot = node.slot
+	fallback = compile_node(node.fallback)
+	def outer_variable(frame):
+		value = frame.outer(depth).slots[slot]
+		if value is None:
+			return fallback(frame)
+		return value
+	return outer_variable
+
+def c_global_variable(node):
+	name = node.name
+	def global_variable(frame):
+		return frame.scope.get(name).get()
+	return global_variable
+
+def c_set_local(node):
+	name = node.name
+	slot = node.slot
+	expression = compile_node(node.expression)
+	def set_local(frame):
+		value = expression(frame)
+		root = frame.root
+		if name in root:
+			root[name].set(value)
+		else:
+			assert_datatype(value)
+			frame.slots[slot] = value.copy()
+	return set_local
+
+def c_statements(node):
+	statements = tuple(compile_node(i) for i in node.statements)
+	if len(statements) == 0:
+		def no_statements(scope):
+			return None
+		return no_statements
+	if len(statements) == 1:
+		return statements[0]
+	if not may_complete(node):
+		def run_statements(scope):
+			last_value = None
+			for i in statements:
+				last_value = i(scope)
+			return last_value
+		return run_statements
+	def run_statements_until_completion(scope):
+		last_value = None
+		for i in statements:
+			last_value = i(scope)
+			if type(last_value) is Completion:
+				return last_value
+		return last_value
+	return run_statements_until_completion
+
+def c_constant(node):
+	value = node.value
+	def constant(scope):
+		return value
+	return constant
+
+def c_list(node):
+	elements = tuple(compile_node(i) for i in node.elements)
+	def make_list(scope):
+		return [i(scope) for i in elements]
+	return make_list
+
+def c_tuple(node):
+	elements = tuple(compile_node(i) for i in node.elements)
+	def make_tuple(scope):
+		return tuple(i(scope) for i in elements)
+	return make_tuple
+
+def c_if_branch(node):
+	condition = compile_value(node.condition)
+	if_block = compile_node(node.if_block)
+	if may_complete(node):
+		else_block = compile_node(node.else_block) if node.else_block is not None else None
+		def if_branch_until_completion(scope):
+			if condition(scope):
+				result = if_block(scope)
+			elif else_block is not None:
+				result = else_block(scope)
+			else:
+				return None
+			if type(result) is Completion:
+				return result
+		return if_branch_until_completion
+	if node.else_block is None:
+		def if_branch(scope):
+			if condition(scope):
+				if_block(scope)
+		return if_branch
+	else_block = compile_node(node.else_block)
+	def if_else_branch(scope):
+		if condition(scope):
+			if_block(scope)
+		else:
+			else_block(scope)
+	return if_else_branch
+
+def c_function_call(node):
+	function_expression = compile_value(node.function_expression)
+	arguments = tuple(compile_value(i) for i in node.arguments_expression.args)
+	if len(arguments) == 0:
+		def call_0(scope):
+			return function_expression(scope).call([])
+		return call_0
+	if len(arguments) == 1:
+		argument, = arguments
+		def call_1(scope):
+			function = function_expression(scope)
+			return function.call([argument(scope)])
+		return call_1
+	def call_n(scope):
+		function = function_expression(scope)
+		return function.call([i(scope) for i in arguments])
+	return call_n
+
+def c_function_definition(node):
+	function_name = node.function_name
+	argument_names = node.argument_names
+	block = compile(node.block)
+	Function = vivarium.data.function.Function
+	def function_definition(scope):
+		new_function = Function(argument_names, block, scope)
+		scope.set(function_name).set(new_function)
+		return new_function
+	return function_definition
+
+def c_frame_function_definition(node):
+	function_name = node.function_name
+	argument_names = node.argument_names
+	frame_size = node.frame_size
+	slot = node.slot
+	block = compile(node.block)
+	FrameFunction = vivarium.data.function.FrameFunction
+	if slot is None:
+		def top_level_definition(scope):
+			new_function = FrameFunction(argument_names, block, frame_size, None, scope)
+			scope.set(function_name).set(new_function)
+			return new_function
+		return top_level_definition
+	assign_slot = vivarium.core.assign_slot
+	def nested_definition(frame):
+		new_function = FrameFunction(argument_names, block, frame_size, frame, frame.scope)
+		assign_slot(frame, function_name, slot, new_function)
+		return new_function
+	return nested_definition
+
+def c_return(node):
+	expression = compile_value(node.expression)
+	RETURN = vivarium.signal.RETURN
+	def return_statement(scope):
+		return Completion(RETURN, expression(scope))
+	return return_statement
+
+def c_break(node):
+	BREAK_COMPLETION = vivarium.signal.BREAK_COMPLETION
+	def break_statement(scope):
+		return BREAK_COMPLETION
+	return break_statement
+
+def c_continue(node):
+	CONTINUE_COMPLETION = vivarium.signal.CONTINUE_COMPLETION
+	def continue_statement(scope):
+		return CONTINUE_COMPLETION
+	return continue_statement
+
+def c_while_loop(node):
+	condition = compile_value(node.condition)
+	block = compile_node(node.block)
+	if not may_complete(node.block):
+		def while_loop(scope):
+			while condition(scope):
+				block(scope)
+		return while_loop
+	BREAK = vivarium.signal.BREAK
+	CONTINUE = vivarium.signal.CONTINUE
+	def while_loop_until_completion(scope):
+		while condition(scope):
+			result = block(scope)
+			if type(result) is Completion:
+				if result.kind is BREAK:
+					break
+				if result.kind is not CONTINUE:
+					return result
+	return while_loop_until_completion
+
+def c_print_keyword(node):
+	variable = compile_node(node.variable)
+	def print_keyword(scope):
+		print(variable(scope))
+	return print_keyword
+
+def binary(function, left, right):
+	"""Build a closure applying `function` to two operands, binding constant operands directly."""
+	if type(right) is vivarium.core.Constant and type(right.value) is not Store:
+		l = compile_value(left)
+		r = right.value
+		def constant_right(scope):
+			return function(l(scope), r)
+		return constant_right
+	if type(left) is vivarium.core.Constant and type(left.value) is not Store:
+		l = left.value
+		r = compile_value(right)
+		def constant_left(scope):
+			return function(l, r(scope))
+		return constant_left
+	l = compile_value(left)
+	r = compile_value(right)
+	def operation(scope):
+		return function(l(scope), r(scope))
+	return operation
+
+def c_comparison(node):
+	function = COMPARISONS.get(node.operator)
+	if function is None:
+		return node.evaluate
+	return binary(function, node.left, node.right)
+
+def c_bin_op(node):
+	return binary(node.operator, node.left, node.right)
+
+def c_charge(node):
+	cost = node.cost
+	find = vivarium.fuel.find
+	OutOfFuel = vivarium.errors.OutOfFuel
+	def charge(scope):
+		# Fuel.charge, inlined
+		fuel = find(scope)
+		fuel.remaining -= cost
+		if fuel.remaining < 0:
+			raise OutOfFuel(fuel.limit)
+	return charge
+
+def c_pass(node):
+	def pass_statement(scope):
+		pass
+	return pass_statement
+
+COMPILERS = {
+	vivarium.core.SetStatement: c_set_statement,
+	vivarium.core.Variable: c_variable,
+	vivarium.core.VariableReference: c_variable_reference,
+	vivarium.core.LocalVariable: c_local_variable,
+	vivarium.core.OuterVariable: c_outer_variable,
+	vivarium.core.GlobalVariable: c_global_variable,
+	vivarium.core.SetLocal: c_set_local,
+	vivarium.core.Statements: c_statements,
+	vivarium.core.Constant: c_constant,
+	vivarium.core.List: c_list,
+	vivarium.core.Tuple: c_tuple,
+	vivarium.core.IfBranch: c_if_branch,
+	vivarium.core.FunctionCall: c_function_call,
+	vivarium.core.FunctionDefinition: c_function_definition,
+	vivarium.core.FrameFunctionDefinition: c_frame_function_definition,
+	vivarium.core.Return: c_return,
+	vivarium.core.Break: c_break,
+	vivarium.core.Continue: c_continue,
+	vivarium.core.WhileLoop: c_while_loop,
+	vivarium.core.PrintKeyword: c_print_keyword,
+	vivarium.core.Comparison: c_comparison,
+	vivarium.core.BinOp: c_bin_op,
+	vivarium.core.Charge: c_charge,
+	vivarium.core.Pass: c_pass,
+}
@@ -2,10 +2,14 @@
 
 Most of these implemnt the `evaluate` method."""
 
+import copy
 import operator
 import vivarium.data
+import vivarium.fuel
 import vivarium.signal
 
+Completion = vivarium.signal.Completion
+
 def unwrap(d):
 	"""Retreives the datum object within a Store.
 
@@ -14,11 +18,94 @@ def unwrap(d):
 		return d.get()
 	return d
 
-class SetStatement:
+class Node:
+	"""Base class for the nodes in a structure.
+
+	Nodes made by `vivarium.transform` remember where they came from in the source,
+	as `lineno` (starting from 1) and `col` (starting from 0). Other nodes don't have them (see `position`)."""
+
+	__slots__ = ('lineno', 'col')
+
+def locate(node, lineno, col):
+	"""Record where a node came from in the source. Returns the node."""
+	node.lineno = lineno
+	node.col = col
+	return node
+
+def position(node):
+	"""Returns the (lineno, col) that a node came from, or None if it isn't known."""
+	try:
+		return (node.lineno, node.col)
+	except AttributeError:
+		return None
+
+# The fields of each type of node, as found by `fields`
+FIELDS = {}
+
+def fields(node):
+	"""Returns the names of a node's fields, including those declared by the types of node it extends.
+
+	`lineno` and `col` aren't included. Code that walks a structure should use this rather than `__slots__`,
+	which only lists the fields a type adds to the type it extends."""
+	t = type(node)
+	result = FIELDS.get(t)
+	if result is None:
+		names = []
+		for base in reversed(t.__mro__):
+			if base is not Node and issubclass(base, Node):
+				names.extend(base.__dict__.get('__slots__', ()))
+		result = FIELDS[t] = tuple(names)
+	return result
+
+def children(node, exclude = ()):
+	"""Yields the nodes held in a node's fields, including those in lists, skipping the fields named in `exclude`."""
+	for name in fields(node):
+		if name in exclude:
+			continue
+		yield from nodes_in(getattr(node, name, None))
+
+def nodes_in(value):
+	if isinstance(value, Node):
+		yield value
+	elif type(value) is list:
+		for i in value:
+			yield from nodes_in(i)
+
+def map_children(node, function, result = None):
+	"""Returns a copy of a node, in which each node held in its fields (including those in lists) is replaced by `function(child)`.
+
+	Passing `result` fills in that node's fields instead of a copy's, for building a node of a different type
+	(such as a subclass) from the original. Fields that don't hold nodes are copied across unchanged."""
+	if result is None:
+		result = copy.copy(node)
+	for name in fields(node):
+		if not hasattr(node, name):
+			continue
+		setattr(result, name, map_value(getattr(node, name), function))
+	return result
+
+def map_value(value, function):
+	if isinstance(value, Node):
+		return function(value)
+	if type(value) is list:
+		return [map_value(i, function) for i in value]
+	return value
+
+def copy_position(new, old):
+	"""Give a node made from another one the same position, if it doesn't have one of its own. Returns the new node."""
+	if new is not old and isinstance(new, Node) and not hasattr(new, 'lineno'):
+		where = position(old)
+		if where is not None:
+			locate(new, *where)
+	return new
+
+class SetStatement(Node):
 	"""Python assignment statement.
 
 	e.g. `x = 7`"""
 
+	__slots__ = ('reference', 'expression')
+
 	def __init__(self, reference, expression):
 		"""reference -- A VariableReference object.
 		expression -- Any object that implements the evaluate function."""
@@ -35,11 +122,13 @@ class SetStatement:
 	def __repr__(self):
 		return 'SET({}, {})'.format(self.reference, self.expression)
 
-class Variable:
+class Variable(Node):
 	"""Python variable access.
 
 	e.g. the `y` in `x = y`"""
 
+	__slots__ = ('name',)
+
 	def __init__(self, name):
 		self.name = name
 
@@ -50,11 +139,13 @@ class Variable:
 	def __repr__(self):
 		return self.name
 
-class VariableReference:
+class VariableReference(Node):
 	"""Python variable reference.
 
 	e.g. the `x` in `x = y`"""
 
+	__slots__ = ('name',)
+
 	def __init__(self, name):
 		self.name = name
 
@@ -65,12 +156,98 @@ class VariableReference:
 	def __repr__(self):
 		return '&' + self.name
 
-class Attribute:
-	pass
+def assign_slot(frame, name, slot, value):
+	"""Assign a value to a slot in a Frame.
+
+	Like Scope.set, variables that exist in the outermost scope are written there instead."""
+	if name in frame.root:
+		frame.root[name].set(value)
+	else:
+		vivarium.data.datatype.assert_datatype(value)
+		frame.slots[slot] = value.copy()
+
+class LocalVariable(Node):
+	"""Access to a variable in the current function's Frame. Created by `vivarium.resolve`.
+
+	If the slot hasn't been assigned to yet, `fallback` is evaluated instead."""
+
+	__slots__ = ('name', 'slot', 'fallback')
+
+	def __init__(self, name, slot, fallback):
+		self.name = name
+		self.slot = slot
+		self.fallback = fallback
+
+	def evaluate(self, frame):
+		value = frame.slots[self.slot]
+		if value is None:
+			return self.fallback.evaluate(frame)
+		return value
+
+	def __repr__(self):
+		return '{}@{}'.format(self.name, self.slot)
+
+class OuterVariable(Node):
+	"""Access to a variable in the Frame of an enclosing function. Created by `vivarium.resolve`.
+
+	If the slot hasn't been assigned to yet, `fallback` is evaluated instead."""
+
+	__slots__ = ('name', 'depth', 'slot', 'fallback')
+
+	def __init__(self, name, depth, slot, fallback):
+		self.name = name
+		self.depth = depth
+		self.slot = slot
+		self.fallback = fallback
+
+	def evaluate(self, frame):
+		value = frame.outer(self.depth).slots[self.slot]
+		if value is None:
+			return self.fallback.evaluate(frame)
+		return value
+
+	def __repr__(self):
+		return '{}@{}:{}'.format(self.name, self.depth, self.slot)
+
+class GlobalVariable(Node):
+	"""Access, from within a function, to a variable that doesn't belong to any function.
+	Created by `vivarium.resolve`."""
+
+	__slots__ = ('name',)
 
-class Statements:
+	def __init__(self, name):
+		self.name = name
+
+	def evaluate(self, frame):
+		return frame.scope.get(self.name).get()
+
+	def __repr__(self):
+		return self.name
+
+class SetLocal(Node):
+	"""Assignment to a variable in the current function's Frame. Created by `vivarium.resolve`."""
+
+	__slots__ = ('name', 'slot', 'expression')
+
+	def __init__(self, name, slot, expression):
+		self.name = name
+		self.slot = slot
+		self.expression = expression
+
+	def evaluate(self, frame):
+		assign_slot(frame, self.name, self.slot, self.expression.evaluate(frame))
+
+	def __repr__(self):
+		return 'SET({}@{}, {})'.format(self.name, self.slot, self.expression)
+
+class Attribute(Node):
+	__slots__ = ()
+
+class Statements(Node):
 	"""List of Python statements."""
 
+	__slots__ = ('statements',)
+
 	def __init__(self, statements):
 		self.statements = statements
 
@@ -81,20 +258,25 @@ class Statements:
 	def evaluate(self, scope):
 		"""Execute the statements.
 
-		Return the output value of the last one."""
+		Return the output value of the last one.
+		If one of them produces a Completion (see `vivarium.signal`), stop and return that instead."""
 		last_value = None
 		for i in self.statements:
 			last_value = i.evaluate(scope)
+			if type(last_value) is Completion:
+				return last_value
 		return last_value
 
 	def __repr__(self):
 		return 'STMTS({})'.format(', '.join(str(i) for i in self.statements))
 
-class Constant:
+class Constant(Node):
 	"""A constant value.
 
 	e.g. `12`"""
 
+	__slots__ = ('value',)
+
 	def __init__(self, value):
 		self.value = value
 
@@ -104,7 +286,9 @@ class Constant:
 	def __repr__(self):
 		return str(self.value)
 
-class List:
+class List(Node):
+
+	__slots__ = ('elements',)
 
 	def __init__(self, elements):
 		self.elements = elements
@@ -115,7 +299,9 @@ class List:
 	def __repr__(self):
 		return '[{}]'.format(', '.join(str(i) for i in self.elements))
 
-class Tuple:
+class Tuple(Node):
+
+	__slots__ = ('elements',)
 
 	def __init__(self, elements):
 		self.elements = elements
@@ -126,9 +312,11 @@ class Tuple:
 	def __repr__(self):
 		return '({},)'.format(', '.join(str(i) for i in self.elements))
 
-class IfBranch:
+class IfBranch(Node):
 	"""An if (and possible else) statement."""
 
+	__slots__ = ('condition', 'if_block', 'else_block')
+
 	def __init__(self, condition, if_block, else_block = None):
 		"""Create an if statement.
 
@@ -141,22 +329,29 @@ class IfBranch:
 		self.else_block = else_block
 
 	def evaluate(self, scope):
+		"""Returns a Completion if the block that runs ends early, and None otherwise."""
 		if unwrap(self.condition.evaluate(scope)):
-			self.if_block.evaluate(scope)
+			result = self.if_block.evaluate(scope)
+		elif self.else_block != None:
+			result = self.else_block.evaluate(scope)
 		else:
-			if self.else_block != None:
-				self.else_block.evaluate(scope)
+			return None
+		if type(result) is Completion:
+			return result
+		return None
 
 	def __repr__(self):
 		if self.else_block:
 			return 'IF({}, {}, {})'.format(self.condition, self.if_block, self.else_block)
 		return 'IF({}, {})'.format(self.condition, self.if_block)
 
-class FunctionCall:
+class FunctionCall(Node):
 	"""A call to a function.
 
 	e.g. `max(1, 2, 3)`"""
 
+	__slots__ = ('function_expression', 'arguments_expression')
+
 	def __init__(self, function_expression, arguments_expression = None):
 		"""Create a function call.
 
@@ -177,11 +372,13 @@ class FunctionCall:
 	def __repr__(self):
 		return '{}({})'.format(self.function_expression, self.arguments_expression)
 
-class FunctionDefinition:
+class FunctionDefinition(Node):
 	"""The definition of a function.
 
 	e.g. `def f(a, b): return a + b`"""
 
+	__slots__ = ('function_name', 'argument_names', 'block')
+
 	def __init__(self, function_name, argument_names, block):
 		"""Create a function definition.
 
@@ -201,10 +398,46 @@ class FunctionDefinition:
 	def __repr__(self):
 		return 'DEF({}; {}; {})'.format(self.function_name, ', '.join(self.argument_names), self.block)
 
-class ArgumentList:
+class FrameFunctionDefinition(Node):
+	"""The definition of a function whose variables have been assigned slots. Created by `vivarium.resolve`."""
+
+	__slots__ = ('function_name', 'argument_names', 'block', 'frame_size', 'slot')
+
+	def __init__(self, function_name, argument_names, block, frame_size, slot):
+		"""Create a function definition.
+
+		Arguments:
+		function_name -- The name of the function, as a string.
+		arguments_names -- The names of the arguments. A list of strings.
+		block -- The resolved statements within the function.
+		frame_size -- The number of slots the function's Frame needs.
+		slot -- The slot to store the function in, if it's defined within another function.
+			None if it's defined at the top level, in which case it's stored in the scope."""
+		self.function_name = function_name
+		self.argument_names = argument_names
+		self.block = block
+		self.frame_size = frame_size
+		self.slot = slot
+
+	def evaluate(self, scope):
+		FrameFunction = vivarium.data.function.FrameFunction
+		if self.slot is None:
+			new_function = FrameFunction(self.argument_names, self.block, self.frame_size, None, scope)
+			scope.set(self.function_name).set(new_function)
+		else:
+			new_function = FrameFunction(self.argument_names, self.block, self.frame_size, scope, scope.scope)
+			assign_slot(scope, self.function_name, self.slot, new_function)
+		return new_function
+
+	def __repr__(self):
+		return 'DEF({}; {}; {})'.format(self.function_name, ', '.join(self.argument_names), self.block)
+
+class ArgumentList(Node):
 	"""A list of arguments to be evaluated. Used to create a FunctionCall."""
 	# The implementation of this is pretty awkward at the moment...
 
+	__slots__ = ('args',)
+
 	def __init__(self, first = None):
 		self.args = []
 		if first:
@@ -227,22 +460,26 @@ class ArgumentList:
 	def __repr__(self):
 		return ', '.join(str(i) for i in self.args)
 
-class Return:
+class Return(Node):
 	"""The `return` statement."""
 
+	__slots__ = ('expression',)
+
 	def __init__(self, expression):
 		self.expression = expression
 
 	def evaluate(self, scope):
 		data = unwrap(self.expression.evaluate(scope))
-		raise vivarium.signal.ReturnSignal(data)
+		return Completion(vivarium.signal.RETURN, data)
 
 	def __repr__(self):
 		return 'RETURN({})'.format(self.expression)
 
-class WhileLoop:
+class WhileLoop(Node):
 	"""The `while` loop."""
 
+	__slots__ = ('condition', 'block')
+
 	def __init__(self, condition, block):
 		"""Construct a while loop.
 
@@ -253,13 +490,44 @@ class WhileLoop:
 		self.block = block
 
 	def evaluate(self, scope):
+		"""Run the loop. Returns a Completion if a `return` within it ends it early, and None otherwise."""
 		while unwrap(self.condition.evaluate(scope)):
-			self.block.evaluate(scope)
+			result = self.block.evaluate(scope)
+			if type(result) is Completion:
+				if result.kind is vivarium.signal.BREAK:
+					break
+				if result.kind is not vivarium.signal.CONTINUE:
+					return result
+		return None
 
 	def __repr__(self):
 		return 'WHILE({}, {})'.format(self.condition, self.block)
 
-class PrintKeyword:
+class Break(Node):
+	"""The `break` statement."""
+
+	__slots__ = ()
+
+	def evaluate(self, scope):
+		return vivarium.signal.BREAK_COMPLETION
+
+	def __repr__(self):
+		return 'BREAK'
+
+class Continue(Node):
+	"""The `continue` statement."""
+
+	__slots__ = ()
+
+	def evaluate(self, scope):
+		return vivarium.signal.CONTINUE_COMPLETION
+
+	def __repr__(self):
+		return 'CONTINUE'
+
+class PrintKeyword(Node):
+
+	__slots__ = ('variable',)
 
 	def __init__(self, variable):
 		self.variable = variable
@@ -272,7 +540,9 @@ class PrintKeyword:
 	def __repr__(self):
 		return 'PRINT({})'.format(self.variable)
 
-class Comparison:
+class Comparison(Node):
+
+	__slots__ = ('left', 'right', 'operator')
 
 	def __init__(self, left, operator, right):
 		self.left = left
@@ -298,7 +568,9 @@ class Comparison:
 	def __repr__(self):
 		return '({} {} {})'.format(self.left, self.operator, self.right)
 
-class BinOp:
+class BinOp(Node):
+
+	__slots__ = ('left', 'right', 'op_sym', 'operator')
 
 	def __init__(self, left, right, op):
 		self.left = unwrap(left)
@@ -339,9 +611,24 @@ class BinOp:
 		return self.operator(lv, rv)
 
 	def __repr__(self):
-		return '({} {} {})'.format(self.left, self.op_syn, self.right)
+		return '({} {} {})'.format(self.left, self.op_sym, self.right)
+
+class Charge(Node):
+	"""Uses up some of the program's fuel. Added to the start of each block by `vivarium.fuel.instrument`."""
+
+	__slots__ = ('cost',)
+
+	def __init__(self, cost):
+		self.cost = cost
+
+	def evaluate(self, scope):
+		vivarium.fuel.find(scope).charge(self.cost)
+
+	def __repr__(self):
+		return 'CHARGE({})'.format(self.cost)
 
-class Pass:
+class Pass(Node):
+	__slots__ = ()
 
 	def evaluate(self, scope):
 		pass
@@ -1,6 +1,6 @@
-from vivarium.data.datatype import DataType
-from vivarium.data.boolean import Boolean 
-from vivarium.data.function import Function, FunctionBuiltin
+from vivarium.data.datatype import DataType, Value
+from vivarium.data.boolean import Boolean
+from vivarium.data.function import Function, FrameFunction, FunctionBuiltin
 from vivarium.data.none import NoneType
 from vivarium.data.numeric import Numeric, Integer, Float
 from vivarium.data.store import Store
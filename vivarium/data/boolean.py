@@ -1,13 +1,12 @@
-from vivarium.data.datatype import DataType
+from vivarium.data.datatype import Value
 
-class Boolean(DataType):
+class Boolean(Value):
+
+	__slots__ = ('value',)
 
 	def __init__(self, value = True):
 		self.value = bool(value)
 
-	def copy(self):
-		return Boolean(self.value)
-
 	def __int__(self):
 		return 1 if self.value else 0
 
@@ -16,3 +15,11 @@ class Boolean(DataType):
 
 	def __str__(self):
 		return 'True' if self.value else 'False'
+
+# The only two Booleans that need to exist. Use `boolean` rather than creating more.
+TRUE = Boolean(True)
+FALSE = Boolean(False)
+
+def boolean(value):
+	"""Returns the canonical Boolean for the truthiness of `value`."""
+	return TRUE if value else FALSE
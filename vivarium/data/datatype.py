@@ -7,13 +7,23 @@ class DataType:
 	"""Base class for vivarium data types.
 
 	All data types that vivarium can handle should be derived from this."""
-	
+
+	__slots__ = ()
+
 	def copy(self):
 		"""'Duplicate' the object.
 
-		In most cases, this just returns a reference to itself (as when copying objects).
-		Primitive types, such as ints and strings override this."""
+		Called whenever the object is assigned to something.
+		By default this just returns a reference to itself (as when copying objects).
+		Mutable data types should override this to give them value semantics."""
 		return self
 
 	def __int__(self):
 		raise Exception('{} does not support conversion to an integer.'.format(type(self)))
+
+class Value(DataType):
+	"""Base class for immutable data types, such as numbers and strings.
+
+	Once created, these are never changed, so they are shared by reference rather than copied."""
+
+	__slots__ = ()
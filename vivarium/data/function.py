@@ -1,9 +1,16 @@
-from vivarium.data.datatype import DataType
+from vivarium.data.datatype import DataType, assert_datatype
 import vivarium.signal
 
+Completion = vivarium.signal.Completion
+
+def wrong_arguments(expected, arguments):
+	return Exception('Function takes {} arguments but {} were given'.format(expected, len(arguments)))
+
 class Function(DataType):
 	"""A callable function."""
 
+	__slots__ = ('argument_names', 'block', 'superscope')
+
 	def __init__(self, argument_names, block, superscope):
 		"""Construct a callable function
 
@@ -22,24 +29,77 @@ class Function(DataType):
 		Arguments:
 		arguments -- The values passed to the function. A list of DataTypes.
 		"""
-		assert len(self.argument_names) == len(arguments)
-		scope = vivarium.scope.Scope()
+		result = self.block.evaluate(self.bind(arguments))
+		if type(result) is Completion:
+			return result.data
+		return None
+
+	def bind(self, arguments):
+		"""Create the Scope for a call to the function, containing the arguments."""
+		if len(arguments) != len(self.argument_names):
+			raise wrong_arguments(len(self.argument_names), arguments)
+		scope = vivarium.scope.Scope(self.superscope)
+		# The arguments go straight into the new scope, rather than through Scope.set,
+		# so that they never overwrite variables in the superscope
+		Store = vivarium.data.store.Store
+		values = scope.values
 		for name, value in zip(self.argument_names, arguments):
-			scope.set(name).set(value)
-		# Setting the superscope afterwards avoids arguments
-		# overwritting variables in the superscope
-		# Might add a warning on this or something
-		scope.superscope = self.superscope
-		result = None
-		try:
-			self.block.evaluate(scope)
-		except vivarium.signal.ReturnSignal as signal:
-			result = signal.data
-		return result
+			assert_datatype(value)
+			values[name] = Store(value.copy())
+		return scope
+
+class FrameFunction(DataType):
+	"""A callable function whose variables have been assigned slots by vivarium.resolve."""
+
+	__slots__ = ('argument_names', 'block', 'frame_size', 'superframe', 'scope', 'root', 'arity', 'padding')
+
+	def __init__(self, argument_names, block, frame_size, superframe, scope):
+		"""Construct a callable function
+
+		Arguments:
+		argument_names -- The names of the arguments. They occupy the first slots of the frame.
+		block -- The resolved statements contained within the function.
+		frame_size -- The number of slots the function's frame needs.
+		superframe -- The Frame from which the function was created. None if it was created in a Scope.
+		scope -- The Scope that the outermost function was created in.
+		"""
+		self.argument_names = argument_names
+		self.block = block
+		self.frame_size = frame_size
+		self.superframe = superframe
+		self.scope = scope
+		self.root = scope.root().values
+		# Worked out once here, rather than on every call
+		self.arity = len(argument_names)
+		self.padding = [None] * (frame_size - self.arity)
+
+	def call(self, arguments):
+		"""Execute the function and return the result.
+
+		Arguments:
+		arguments -- The values passed to the function. A list of DataTypes.
+		"""
+		result = self.block.evaluate(self.bind(arguments))
+		if type(result) is Completion:
+			return result.data
+		return None
+
+	def bind(self, arguments):
+		"""Create a Frame for a call to the function, with the arguments in their slots."""
+		if len(arguments) != self.arity:
+			raise wrong_arguments(self.arity, arguments)
+		slots = []
+		for value in arguments:
+			assert_datatype(value)
+			slots.append(value.copy())
+		slots += self.padding
+		return vivarium.scope.Frame(slots, self.superframe, self.scope, self.root)
 
 class FunctionBuiltin(DataType):
 	"""Used as a way to wrap a function implemented in normal python."""
 
+	__slots__ = ('func',)
+
 	def __init__(self, func):
 		"""Create the builtin"""
 		self.func = func
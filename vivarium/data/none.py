@@ -1,6 +1,8 @@
-from vivarium.data.datatype import DataType
+from vivarium.data.datatype import Value
 
-class _NoneType_(DataType):
+class _NoneType_(Value):
+
+	__slots__ = ()
 
 	def __call__(self):
 		return self
@@ -1,23 +1,48 @@
-from vivarium.data.datatype import DataType
-from vivarium.data.boolean import Boolean
+from vivarium.data.datatype import Value
+from vivarium.data.boolean import boolean
 from vivarium.data.none import NoneType
+import math
+import operator
+import vivarium.quota
+
+# Integers in this range are created once and shared, much like CPython's small integer cache
+SMALL_INTEGER_MIN = -5
+SMALL_INTEGER_MAX = 256
+
+def integer(value):
+	"""Returns an Integer with the given value. Small values are shared rather than created each time."""
+	if SMALL_INTEGER_MIN <= value <= SMALL_INTEGER_MAX:
+		return SMALL_INTEGERS[value - SMALL_INTEGER_MIN]
+	return Integer(value)
+
+# Integers at least this big (in magnitude) take up TRACKED_SIZE bytes or more, so count towards the memory quota
+TRACKED_INTEGER = 2 ** (vivarium.quota.TRACKED_SIZE * 8 - 1)
+
+# Multiplying numbers smaller than this (in magnitude) can't produce an Integer big enough to count towards the memory quota
+UNTRACKED_FACTOR = 2 ** (vivarium.quota.TRACKED_SIZE * 4)
+
+def big_integer(function, left, right, size):
+	"""Returns Integer(function(left, right)), which is expected to take up about `size` bytes.
+
+	The current run's quota (see `vivarium.quota`) is checked for room before the result is worked out."""
+	vivarium.quota.check(size)
+	return Integer(function(left, right))
 
 def smart_numeric(value):
 	if type(value) is int:
-		return Integer(value)
+		return integer(value)
 	if type(value) is float:
 		return Float(value)
 	raise TypeError("{} is not numeric".format(value))
 
-class Numeric(DataType):
+class Numeric(Value):
+
+	__slots__ = ('value', '__weakref__')
 
 	def __init__(self, value = 0):
 		assert isinstance(value, int) or isinstance(value, float)
 		self.value = value
 
-	def copy(self):
-		return type(self)(self.value)
-
 	def __add__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Attempted to add an number to something that was not an number.')
@@ -31,7 +56,15 @@ class Numeric(DataType):
 	def __mul__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Attempted multiply an number by a non-number.')
-		return smart_numeric(self.value * other.value)
+		l = self.value
+		r = other.value
+		if -UNTRACKED_FACTOR < l < UNTRACKED_FACTOR and -UNTRACKED_FACTOR < r < UNTRACKED_FACTOR:
+			return smart_numeric(l * r)
+		if type(l) is int and type(r) is int:
+			size = (l.bit_length() + r.bit_length()) // 8
+			if size >= vivarium.quota.TRACKED_SIZE:
+				return big_integer(operator.mul, l, r, size)
+		return smart_numeric(l * r)
 
 	def __truediv__(self, other):
 		if not isinstance(other, Numeric):
@@ -51,41 +84,47 @@ class Numeric(DataType):
 	def __pow__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Attempted (modulus) divide an number by a non-number.')
-		return smart_numeric(self.value ** other.value)
+		l = self.value
+		r = other.value
+		if type(l) is int and type(r) is int and r > 0 and (l > 1 or l < -1):
+			size = int(r * math.log2(abs(l))) // 8
+			if size >= vivarium.quota.TRACKED_SIZE:
+				return big_integer(operator.pow, l, r, size)
+		return smart_numeric(l ** r)
 
 	def __eq__(self, other):
 		if other is None or other is NoneType:
 			return False
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value == other.value)
+		return boolean(self.value == other.value)
 
 	def __ne__(self, other):
 		if other is None or other is NoneType:
 			return True
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value != other.value)
+		return boolean(self.value != other.value)
 
 	def __lt__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value < other.value)
+		return boolean(self.value < other.value)
 
 	def __gt__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value > other.value)
+		return boolean(self.value > other.value)
 
 	def __le__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value <= other.value)
+		return boolean(self.value <= other.value)
 
 	def __ge__(self, other):
 		if not isinstance(other, Numeric):
 			raise TypeError('Comparison of numbers and non-numbers is not allowed.')
-		return Boolean(self.value >= other.value)
+		return boolean(self.value >= other.value)
 
 	def __int__(self):
 		return int(self.value)
@@ -103,7 +142,15 @@ class Numeric(DataType):
 		return str(self.value)
 
 class Integer(Numeric):
-	pass
+	__slots__ = ()
+
+	def __init__(self, value = 0):
+		assert isinstance(value, int) or isinstance(value, float)
+		self.value = value
+		if not -TRACKED_INTEGER < value < TRACKED_INTEGER:
+			vivarium.quota.account(self, value.bit_length() // 8)
 
 class Float(Numeric):
-	pass
+	__slots__ = ()
+
+SMALL_INTEGERS = [Integer(i) for i in range(SMALL_INTEGER_MIN, SMALL_INTEGER_MAX + 1)]
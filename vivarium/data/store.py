@@ -3,6 +3,8 @@ from vivarium.data.datatype import assert_datatype
 class Store:
 	"""Stores a single datum."""
 
+	__slots__ = ('value', 'readonly')
+
 	def __init__(self, value, readonly = False):
 		"""Create a store.
 
@@ -19,7 +21,9 @@ class Store:
 		return self.value
 
 	def set(self, value):
-		"""Set the stored value. Must be a DataType."""
+		"""Set the stored value. Must be a DataType.
+
+		Immutable values are shared. Anything else is copied (see `DataType.copy`)."""
 		assert_datatype(value)
 		if self.readonly:
 			raise Exception('Cannot write to readonly data store ' + str(self))
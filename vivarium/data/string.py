@@ -1,10 +1,15 @@
-from vivarium.data.datatype import DataType
+from vivarium.data.datatype import Value
+import vivarium.quota
 
-class String(DataType):
+class String(Value):
+
+	__slots__ = ('value', '__weakref__')
 
 	def __init__(self, value = ''):
 		assert isinstance(value, str)
 		self.value = value
+		if len(value) >= vivarium.quota.TRACKED_SIZE:
+			vivarium.quota.account(self, len(value))
 
 	def __int__(self):
 		return int(self.value)
@@ -12,9 +17,6 @@ class String(DataType):
 	def __str__(self):
 		return self.value
 
-	def copy(self):
-		return String(self.value)
-
 	def __add__(self, other):
 		if type(other) is not String:
 			raise Exception('Attempted to add a string to something that was not a string')
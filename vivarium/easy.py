@@ -7,15 +7,85 @@ By using these functions, power and control is sacrificed.
 
 
 import vivarium.transform
+import vivarium.resolve
+import vivarium.optimise
 import vivarium.core
+import vivarium.closure
+import vivarium.vm
+import vivarium.cache
+import vivarium.errors
+import vivarium.fuel
 import vivarium.scope
 import vivarium.pipes
+import vivarium.quota
+import vivarium.signal
 
-def run(code, input_data = None, do_print = True):
+def tree_backend(tree):
+	return tree
+
+# Maps backend names to functions that turn the output of `transform` into something that can be evaluated
+BACKENDS = {
+	'tree': tree_backend,
+	'closure': vivarium.closure.compile,
+	'vm': vivarium.vm.compile,
+}
+
+def compile(code, backend = 'tree', filename = None, optimise = False, dump = None, metered = False):
+	"""Compile code into an object that can be `evaluate`d in a scope.
+
+	The variables within functions are assigned slots by `vivarium.resolve` before the backend sees the program.
+
+	Arguments:
+	code -- Python code to compile (as a string)
+
+	Keyword arguments:
+	backend -- How the program should be executed. One of:
+		'tree' -- Walk the structure produced by `vivarium.transform`. This is the default.
+		'closure' -- Compile the structure into Python closures first (see `vivarium.closure`).
+		'vm' -- Compile the structure into bytecode and run it on a virtual machine (see `vivarium.vm`).
+	filename -- The file the code was read from, if any.
+		If given, the compiled structure is cached on disk next to it (see `vivarium.cache.load_tree`).
+	optimise -- Whether to simplify the program with `vivarium.optimise` before running it. False by default.
+	dump -- If given, a file (such as sys.stdout) to write the structure to, before and after optimisation.
+	metered -- Whether the program should use up fuel as it runs (see `vivarium.fuel`). False by default.
+		Metered programs must be given fuel when they are run (see `execute`).
+	"""
+	if backend not in BACKENDS:
+		raise ValueError('Unknown backend ' + repr(backend))
+	return BACKENDS[backend](compile_tree(code, filename, optimise, dump, metered))
+
+def compile_tree(code, filename = None, optimise = False, dump = None, metered = False):
+	"""Returns the structure that `compile` hands to the backend. The arguments are the same as for `compile`.
+
+	The structure can be converted to plain data with `vivarium.serialise`, then compiled with any backend."""
+	if filename is not None and dump is None:
+		tree = vivarium.cache.load_tree(filename, code, optimise)
+	else:
+		tree = vivarium.transform.transform(code)
+		if optimise:
+			tree = vivarium.optimise.optimise(tree, dump)
+		tree = vivarium.resolve.resolve(tree)
+	if metered:
+		tree = vivarium.fuel.instrument(tree)
+	return tree
+
+# Compiled programs used by `run`. Replace, or call `set_limits` on it, to change its size.
+program_cache = vivarium.cache.ProgramCache()
+
+def compile_cached(code, backend = 'tree', filename = None, optimise = False, metered = False):
+	"""Like `compile`, but the result is stored in `program_cache` and reused when the same code is compiled again."""
+	if program_cache is None:
+		return compile(code, backend, filename, optimise, metered = metered)
+	key = vivarium.cache.source_key(code, backend, optimise, metered)
+	return program_cache.fetch(key, lambda: compile(code, backend, filename, optimise, metered = metered))
+
+def run(code, input_data = None, do_print = True, backend = 'tree', optimise = False, max_depth = None, max_steps = None, max_memory = None,
+		max_output = None, profile = None, hooks = None, memoise = None):
 	"""Execute code and return the result.
 
 	By default, the program will be able to read from standard input, through `input` and write to standard output, via `print`.
 	The function will return a list of strings produced by calles to the `print` function.
+	Compiled programs are cached (see `compile_cached`), so running the same code again doesn't recompile it.
 
 	Arguments:
 	code -- Python code to run (as a string)
@@ -23,28 +93,179 @@ def run(code, input_data = None, do_print = True):
 	Keyword arguments:
 	input_data -- A list of strings that will be given to the program as it call the `input` function.
 		If it attempts to read more input than is given, an exception will be thrown and the program will terminate.
+		Any other iterable of strings, an open file or a memory-mapped file can be given instead,
+		in which case lines are only read as the program asks for them (see `vivarium.pipes.Input`).
 	do_print -- A boolean specifying whether calls to `print` should actually print to standard output. True by default. 
+	backend -- The execution backend to use. See `compile`.
+	optimise -- Whether to optimise the program before running it. See `compile`.
+	max_depth -- How deeply function calls may be nested. Only the 'vm' backend supports this,
+		since it keeps calls on a stack of its own (defaulting to `vivarium.vm.MAX_DEPTH` deep).
+		The other backends are limited by Python's own stack.
+		Either way, going too deep raises a `vivarium.errors.RecursionDepthExceeded`.
+	max_steps -- If given, the amount of work the program may do, roughly the number of nodes it may evaluate.
+		Doing more raises a `vivarium.errors.OutOfFuel`. By default, there is no limit.
+	max_memory -- If given, the number of bytes that the program's (large) values may take up at once.
+		Trying to create a value that would go over the limit raises a `vivarium.errors.MemoryLimitExceeded`.
+		To find out the most the program used, pass a `vivarium.quota.MemoryQuota` instead,
+		and look at its `peak` afterwards. By default, there is no limit.
+	max_output -- If given, the most characters (counting a newline per line) the program may print.
+		Printing any more raises a `vivarium.errors.OutputLimitExceeded`. By default, there is no limit.
+	profile -- If given, a `vivarium.profiler.Profiler` to record how long each line and function of the program takes.
+		Only the 'tree' backend supports this. The program is compiled again with timing added, rather than taken from the cache.
+	hooks -- If given, a list of functions to call as the program makes calls, runs loops and assigns to variables.
+		See `vivarium.trace` for the events they receive. Like `profile`, only the 'tree' backend supports this,
+		and the program is compiled again with the hooks added. Without hooks, nothing checks for them.
+	memoise -- If given, a `vivarium.memoise.Memoiser` in which functions that can be shown to be pure keep their results,
+		so calling them again with the same arguments doesn't run them again. The output is the same, but less fuel may be used.
+		Afterwards, `memoise.report()` lists the hits and misses of each function. Only the 'tree' backend supports this.
 	"""
+	bytecode = compile_for_run(code, backend, None, optimise, max_steps is not None, profile, hooks, memoise)
+	return execute(bytecode, input_data, do_print, max_depth, max_steps, max_memory, max_output)
+
+def compile_for_run(code, backend, filename, optimise, metered, profile, hooks, memoise):
+	"""Compile code for `run` or `run_from_file`, adding the profiling, hooks and memoisation asked for, if any.
+
+	Programs without any of those are taken from the cache (see `compile_cached`)."""
+	# Imported here, so that `import vivarium` doesn't load them for programs that don't need them
+	import vivarium.memoise
+	import vivarium.profiler
+	import vivarium.trace
+	if profile is None and not hooks and memoise is None:
+		return compile_cached(code, backend, filename, optimise, metered)
+	if backend != 'tree':
+		raise ValueError("Profiling, hooks and memoisation are only supported by the 'tree' backend")
+	bytecode = compile_tree(code, filename, optimise, metered = metered)
+	if memoise is not None:
+		bytecode = vivarium.memoise.instrument(bytecode, memoise)
+	if hooks:
+		bytecode = vivarium.trace.instrument(bytecode, list(hooks))
+	if profile is not None:
+		profile.lines = code.splitlines()
+		bytecode = vivarium.profiler.instrument(bytecode, profile)
+	return bytecode
+
+def execute(bytecode, input_data = None, do_print = True, max_depth = None, max_steps = None, max_memory = None, max_output = None):
+	"""Evaluate a compiled program in a fresh global scope, and return the result.
+
+	Arguments and result are the same as `run`, except that it takes the output of `compile` rather than code.
+	If max_steps is given, the program must have been compiled with `metered = True`."""
 	# Set up the scope
-	globs = vivarium.scope.global_scope()
-	output = vivarium.pipes.Output(scope = globs)
+	globs = vivarium.scope.builtin_scope()
+	output = vivarium.pipes.Output(display = do_print, scope = globs, max_size = max_output)
 	if input_data is not None:
 		vivarium.pipes.Input(input_data, globs)
+	if max_steps is not None:
+		vivarium.fuel.Fuel(max_steps, globs)
 	program_scpe = vivarium.scope.Scope(globs)
-	globs.lockdown()
-	# Compile and run
-	bytecode = vivarium.transform.transform(code)
-	bytecode.evaluate(program_scpe)
+	# Run
+	if max_depth is not None and type(bytecode) is not vivarium.vm.Program:
+		raise ValueError("max_depth is only supported by the 'vm' backend")
+	if max_memory is None:
+		evaluate(bytecode, program_scpe, max_depth)
+	else:
+		quota = max_memory
+		if not isinstance(quota, vivarium.quota.MemoryQuota):
+			quota = vivarium.quota.MemoryQuota(max_memory)
+		with quota:
+			evaluate(bytecode, program_scpe, max_depth)
 	# Return output
 	return output.get_data()
 
-def run_from_file(filename, input_data = None, do_print = True):
+# The most lines `run_async` holds on to before the program has to wait for `output_sink` to take them
+MAX_PENDING_OUTPUT = 100
+
+async def run_async(code, input_stream = None, output_sink = None, optimise = False, max_depth = None, max_steps = None, max_memory = None,
+		slice_steps = 1000):
+	"""Execute code without blocking the event loop. This is a coroutine.
+
+	The program is run on the 'vm' backend, `slice_steps` steps (jumps and calls) at a time,
+	letting other tasks on the event loop run in between.
+
+	Arguments:
+	code -- Python code to run (as a string)
+
+	Keyword arguments:
+	input_stream -- An asynchronous iterable of strings, read from whenever the program calls `input`.
+		The program waits (without blocking the event loop) until the next line arrives.
+		Reading past the end raises an exception, as does reading any input if there's no stream.
+	output_sink -- A coroutine function, awaited with each line the program prints.
+		If the sink is slow, the program is made to wait once it has printed `MAX_PENDING_OUTPUT` lines that the sink hasn't taken.
+		If not given, the output is returned as a list of strings, like `run`.
+	optimise, max_depth, max_steps, max_memory -- The same as for `run`.
+	"""
+	import asyncio
+	bytecode = compile_cached(code, 'vm', optimise = optimise, metered = max_steps is not None)
+	globs = vivarium.scope.builtin_scope()
+	output = vivarium.pipes.BufferedOutput(MAX_PENDING_OUTPUT, globs)
+	pipe = vivarium.pipes.StreamInput([], globs)
+	pipe.closed = input_stream is None
+	if max_steps is not None:
+		vivarium.fuel.Fuel(max_steps, globs)
+	program_scope = vivarium.scope.Scope(globs)
+	quota = max_memory
+	if max_memory is not None and not isinstance(quota, vivarium.quota.MemoryQuota):
+		quota = vivarium.quota.MemoryQuota(max_memory)
+	if input_stream is not None:
+		lines = input_stream.__aiter__()
+	execution = vivarium.vm.Execution(bytecode.code, program_scope, vivarium.vm.MAX_DEPTH if max_depth is None else max_depth)
+	result = []
+	finished = False
+	while not finished:
+		pipe.waiting = False
+		try:
+			if quota is None:
+				finished = vivarium.vm.resume(execution, slice_steps)
+			else:
+				with quota:
+					finished = vivarium.vm.resume(execution, slice_steps)
+		except vivarium.signal.WouldBlock:
+			pass
+		# Pass on what's been printed, whether or not that's what the program is waiting for
+		if output_sink is None:
+			result.extend(output.take())
+		else:
+			for line in output.take():
+				await output_sink(line)
+		# The program may also have been waiting for room to print, in which case it can carry on now
+		if pipe.waiting and pipe.empty() and not pipe.closed:
+			try:
+				pipe.lines.append(await lines.__anext__())
+			except StopAsyncIteration:
+				pipe.closed = True
+		elif not finished:
+			await asyncio.sleep(0)
+	if output_sink is None:
+		return result
+
+def run_many(jobs, backend = 'vm', optimise = False, workers = None, timeout = None, max_depth = None, max_steps = None, max_memory = None,
+		max_output = None):
+	"""Run many programs across a pool of worker processes, yielding a `vivarium.batch.JobResult` as each one finishes.
+
+	`jobs` is an iterable of (code, input_data) pairs. See `vivarium.batch.run_many` for the other arguments."""
+	import vivarium.batch
+	return vivarium.batch.run_many(jobs, backend, optimise, workers, timeout, max_depth, max_steps, max_memory, max_output)
+
+def evaluate(bytecode, scope, max_depth = None):
+	"""Evaluate a compiled program in the given scope, turning the host running out of stack into a vivarium error."""
+	try:
+		if max_depth is None:
+			return bytecode.evaluate(scope)
+		return bytecode.evaluate(scope, max_depth)
+	except RecursionError:
+		# Python's stack ran out first (only possible with the 'tree' and 'closure' backends)
+		raise vivarium.errors.RecursionDepthExceeded() from None
+
+def run_from_file(filename, input_data = None, do_print = True, backend = 'tree', optimise = False, max_depth = None, max_steps = None, max_memory = None,
+		max_output = None, profile = None, hooks = None, memoise = None):
 	"""Execute code from a file and return the result.
 
 	`filename` should be the path to the file which contains the code.
+	The compiled program is also cached on disk, so later processes don't need to compile it again.
 
 	Functionality and keyword arguments are the same as `run`.
 	"""
 	with open(filename) as f:
 		code = f.read()
-	return run(code, input_data = input_data, do_print = do_print)
\ No newline at end of file
+	bytecode = compile_for_run(code, backend, filename, optimise, max_steps is not None, profile, hooks, memoise)
+	return execute(bytecode, input_data = input_data, do_print = do_print, max_depth = max_depth, max_steps = max_steps,
+		max_memory = max_memory, max_output = max_output)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Errors raised when a program goes over one of the limits placed on it.
+
+These are raised in place of whatever the host (Python) would have done,
+so that the code running a program can tell them apart from mistakes in the program itself."""
+
+class LimitExceeded(Exception):
+	"""Base class for errors raised when a program uses more of something than it's allowed."""
+
+class RecursionDepthExceeded(LimitExceeded):
+	"""A program's function calls were nested too deeply."""
+
+	def __init__(self, max_depth = None):
+		if max_depth is None:
+			message = 'Maximum recursion depth exceeded'
+		else:
+			message = 'Maximum recursion depth of {} exceeded'.format(max_depth)
+		super().__init__(message)
+		self.max_depth = max_depth
+
+class OutOfFuel(LimitExceeded):
+	"""A program did more work than it was allowed to (see `vivarium.fuel`)."""
+
+	def __init__(self, limit):
+		super().__init__('Program ran out of fuel after {} steps'.format(limit))
+		self.limit = limit
+
+class MemoryLimitExceeded(LimitExceeded):
+	"""A program tried to create values taking up more memory than it was allowed (see `vivarium.quota`)."""
+
+	def __init__(self, limit, requested):
+		super().__init__('Program tried to use {} bytes of memory, over its limit of {}'.format(requested, limit))
+		self.limit = limit
+		self.requested = requested
+
+class DeadlineExceeded(LimitExceeded):
+	"""A program was still running when its time was up (see `vivarium.scheduler`)."""
+
+	def __init__(self, deadline):
+		super().__init__('Program did not finish within {} seconds'.format(deadline))
+		self.deadline = deadline
+
+class OutputLimitExceeded(LimitExceeded):
+	"""A program printed more than it was allowed to (see `vivarium.pipes.Output`)."""
+
+	def __init__(self, limit):
+		super().__init__('Program printed more than {} characters'.format(limit))
+		self.limit = limit
@@ -0,0 +1,107 @@
+"""Limits how much work a program can do.
+
+A program compiled with metering (see `instrument`) uses up fuel as it runs.
+Rather than paying for each node as it's evaluated, each block starts with a Charge node
+that pays for all the nodes within it at once. Every loop iteration and every function call
+runs a block, so a program can't run forever without paying for it.
+Once the fuel runs out, a `vivarium.errors.OutOfFuel` is raised.
+
+	tree = vivarium.fuel.instrument(vivarium.resolve.resolve(vivarium.transform.transform(code)))
+	vivarium.fuel.Fuel(10000, global_scope)
+	tree.evaluate(vivarium.scope.Scope(global_scope))
+
+Programs compiled without metering don't contain any Charge nodes, so they don't pay anything."""
+
+import vivarium.core
+import vivarium.data
+import vivarium.errors
+import vivarium.scope
+
+# The name that a run's Fuel is stored under, in its outermost scope. Programs can't refer to it.
+FUEL_NAME = '<fuel>'
+
+# Attributes of nodes that hold blocks. These are charged for when they run, not by the node containing them.
+BLOCK_FIELDS = ('block', 'if_block', 'else_block')
+
+class Fuel(vivarium.data.DataType):
+	"""The amount of work a single run of a program has left."""
+
+	__slots__ = ('limit', 'remaining')
+
+	def __init__(self, limit, scope = None):
+		"""Create a fuel tank.
+
+		Arguments
+		limit -- The amount of fuel. Roughly, the number of nodes the program can evaluate.
+		scope -- The scope in which to use the fuel. Usually the program's global scope.
+			Defaults to None, in which case the fuel will not assign itself."""
+		self.limit = limit
+		self.remaining = limit
+		if scope:
+			scope.bind(FUEL_NAME, self)
+
+	def charge(self, cost):
+		"""Use up some fuel, raising an OutOfFuel if there isn't enough left."""
+		self.remaining -= cost
+		if self.remaining < 0:
+			raise vivarium.errors.OutOfFuel(self.limit)
+
+	def used(self):
+		"""Returns the amount of fuel used so far."""
+		return min(self.limit, self.limit - self.remaining)
+
+	def __repr__(self):
+		return 'FUEL({}/{})'.format(self.remaining, self.limit)
+
+def find(scope):
+	"""Returns the Fuel of the run that a Scope or Frame belongs to."""
+	if type(scope) is vivarium.scope.Frame:
+		root = scope.root
+	else:
+		root = scope.root().values
+	store = root.get(FUEL_NAME)
+	if store is None:
+		raise Exception('The program was compiled with metering, but not given any fuel')
+	return store.value
+
+def cost(node):
+	"""The number of nodes in a statement or expression, not counting any blocks within it."""
+	if type(node) is list:
+		return sum(cost(i) for i in node)
+	if not hasattr(node, 'evaluate') or isinstance(node, vivarium.data.DataType):
+		return 0
+	return 1 + sum(cost(i) for i in vivarium.core.children(node, BLOCK_FIELDS))
+
+def instrument_block(node, extra = 0):
+	"""Returns an instrumented copy of a block, starting with a Charge for the nodes within it.
+
+	`extra` is added to the cost, for things evaluated each time the block runs (like a loop's condition)."""
+	if type(node) is not vivarium.core.Statements:
+		node = vivarium.core.Statements([node])
+	statements = [vivarium.core.Charge(cost(node.statements) + extra)]
+	statements.extend(instrument(i) for i in node.statements)
+	return vivarium.core.Statements(statements)
+
+def instrument(node):
+	"""Returns a copy of a structure in which every block pays for the nodes within it, each time it runs.
+
+	The structure can come from `vivarium.transform`, `vivarium.optimise` or `vivarium.resolve`.
+	Nodes without any blocks in them are shared with the original."""
+	t = type(node)
+	if t is vivarium.core.Statements:
+		return instrument_block(node)
+	if t is vivarium.core.IfBranch:
+		else_block = None
+		if node.else_block is not None:
+			else_block = instrument_block(node.else_block)
+		result = vivarium.core.IfBranch(node.condition, instrument_block(node.if_block), else_block)
+	elif t is vivarium.core.WhileLoop:
+		result = vivarium.core.WhileLoop(node.condition, instrument_block(node.block, cost(node.condition)))
+	elif t is vivarium.core.FunctionDefinition:
+		result = vivarium.core.FunctionDefinition(node.function_name, node.argument_names, instrument_block(node.block))
+	elif t is vivarium.core.FrameFunctionDefinition:
+		result = vivarium.core.FrameFunctionDefinition(node.function_name, node.argument_names,
+			instrument_block(node.block), node.frame_size, node.slot)
+	else:
+		return node
+	return vivarium.core.copy_position(result, node)
@@ -0,0 +1,264 @@
+"""Remembers the results of calls to functions that can be shown to be pure.
+
+A function defined at the top level of a program is pure if the only things its body does are:
+- Read its own variables, or call (or read) other pure functions and the builtins in PURE_BUILTINS.
+- Assign to its own variables. Names assigned anywhere at the top level are off limits, since assigning to them inside
+	a function changes the global instead.
+- Use constants, arithmetic, comparisons, `if`, `while`, `break`, `continue`, `pass` and `return`.
+A function is only called by name if it's defined exactly once and never assigned to, so the name always means that function.
+Anything else (printing, reading input, calling a function it was passed, defining functions, ...) makes a function impure.
+
+A pure function given the same arguments always returns the same result, so `instrument` makes pure functions
+keep their results in a Memoiser, and return them straight away when called with the same arguments again.
+Only calls whose arguments and result are all small immutable Values (see `vivarium.quota.TRACKED_SIZE`) are remembered,
+and a call that raises an exception is never remembered, so the program's output is the same either way.
+It may use less fuel, since remembered calls don't run.
+
+	memoiser = vivarium.memoise.Memoiser()
+	tree = vivarium.memoise.instrument(vivarium.easy.compile_tree(code), memoiser)
+	tree.evaluate(scope)
+	print(memoiser.report())
+
+Memoised structures can only be run by walking them (the 'tree' backend)."""
+
+import collections
+import vivarium.core
+import vivarium.data
+import vivarium.profiler
+import vivarium.quota
+import vivarium.scope
+
+# Builtins that only work out a value from their arguments
+PURE_BUILTINS = ('int', 'str', 'max', 'min')
+
+# Nodes that are pure as long as the nodes within them are
+PURE_NODES = (
+	vivarium.core.Statements,
+	vivarium.core.Constant,
+	vivarium.core.IfBranch,
+	vivarium.core.Return,
+	vivarium.core.WhileLoop,
+	vivarium.core.Break,
+	vivarium.core.Continue,
+	vivarium.core.Pass,
+	vivarium.core.Comparison,
+	vivarium.core.BinOp,
+	vivarium.core.ArgumentList,
+	vivarium.core.Charge,
+)
+
+# The most results kept by a Memoiser by default
+MAX_ENTRIES = 100000
+
+# Returned by `key` for arguments whose calls can't be remembered
+UNCACHEABLE = object()
+
+def walk(node):
+	"""Yields a node and every node within it."""
+	yield node
+	for i in vivarium.core.children(node):
+		yield from walk(i)
+
+def definitions(tree):
+	"""Returns the top level definitions of functions that are defined once and never assigned to, by name,
+	and the names assigned to at the top level."""
+	defined = collections.defaultdict(list)
+	top_level = set()
+	# Names that are assigned to other than by a top level function definition
+	assigned = set()
+	for node in walk(tree):
+		t = type(node)
+		if t is vivarium.core.FrameFunctionDefinition and node.slot is None:
+			defined[node.function_name].append(node)
+			top_level.add(node.function_name)
+		elif t is vivarium.core.SetStatement and type(node.reference) is vivarium.core.VariableReference:
+			top_level.add(node.reference.name)
+			assigned.add(node.reference.name)
+		elif t in (vivarium.core.FrameFunctionDefinition, vivarium.core.FunctionDefinition):
+			assigned.add(node.function_name)
+		elif t is vivarium.core.SetLocal:
+			assigned.add(node.name)
+	functions = {}
+	for name, nodes in defined.items():
+		if len(nodes) == 1 and name not in assigned and name not in vivarium.scope.BUILTINS:
+			functions[name] = nodes[0]
+	return functions, top_level
+
+def impurity(node, pure, top_level, arity):
+	"""Returns the reason that a function's body isn't pure, or None if it is.
+
+	Arguments
+	pure -- The names of the functions assumed to be pure.
+	top_level -- The names assigned to at the top level of the program.
+	arity -- The number of arguments the function takes."""
+	t = type(node)
+	if t is vivarium.core.GlobalVariable:
+		if node.name in pure or (node.name in PURE_BUILTINS and node.name not in top_level):
+			return None
+		# Nothing else can define the variable, so reading it always fails
+		if node.name not in top_level and node.name not in vivarium.scope.BUILTINS:
+			return None
+		return 'uses ' + node.name
+	if t is vivarium.core.LocalVariable:
+		# Arguments are always assigned, but other variables are looked for outside the function until they are
+		if node.slot < arity:
+			return None
+		return impurity(node.fallback, pure, top_level, arity)
+	if t is vivarium.core.SetLocal:
+		if node.name in top_level or node.name in vivarium.scope.BUILTINS:
+			return 'assigns to ' + node.name
+		return impurity(node.expression, pure, top_level, arity)
+	if t is vivarium.core.FunctionCall:
+		if type(node.function_expression) is not vivarium.core.GlobalVariable:
+			return 'calls {}'.format(node.function_expression)
+	elif t not in PURE_NODES:
+		return 'contains {}'.format(type(node).__name__)
+	for i in vivarium.core.children(node):
+		reason = impurity(i, pure, top_level, arity)
+		if reason is not None:
+			return reason
+	return None
+
+def pure_functions(tree):
+	"""Returns the names of the pure functions in a program, and {name: reason} for the functions that aren't.
+
+	`tree` is the structure made by `vivarium.resolve` (or `vivarium.fuel`, which works on it)."""
+	functions, top_level = definitions(tree)
+	pure = set(functions)
+	impure = {}
+	# Assume every function is pure, then rule out the ones that do something impure (such as calling an impure function)
+	# until none are left to rule out
+	changed = True
+	while changed:
+		changed = False
+		for name in sorted(pure):
+			function = functions[name]
+			reason = impurity(function.block, pure, top_level, len(function.argument_names))
+			if reason is not None:
+				pure.discard(name)
+				impure[name] = reason
+				changed = True
+	return pure, impure
+
+def key(arguments):
+	"""Returns a key identifying a list of arguments, or UNCACHEABLE if a call with them can't be remembered."""
+	result = []
+	for i in arguments:
+		if not cacheable(i):
+			return UNCACHEABLE
+		value = getattr(i, 'value', None)
+		# -0.0 and 0.0 are equal, but print differently
+		if type(value) is float:
+			value = value.hex()
+		result.append((type(i), value))
+	return tuple(result)
+
+def cacheable(value):
+	"""Whether a value can be kept in a Memoiser. Big values aren't, so they can be given back to the run's memory quota."""
+	if not isinstance(value, vivarium.data.datatype.Value):
+		return False
+	if type(value) is vivarium.data.string.String:
+		return len(value.value) < vivarium.quota.TRACKED_SIZE
+	if type(value) is vivarium.data.numeric.Integer:
+		return value.value.bit_length() // 8 < vivarium.quota.TRACKED_SIZE
+	return True
+
+class FunctionStats:
+	"""How many calls to a single function were answered from the Memoiser (hits), and how many ran (misses)."""
+
+	__slots__ = ('name', 'lineno', 'col', 'hits', 'misses', 'uncached')
+
+	def __init__(self, name, lineno, col):
+		self.name = name
+		self.lineno = lineno
+		self.col = col
+		self.hits = 0
+		self.misses = 0
+		# Calls that ran without being looked up, because their arguments couldn't be remembered
+		self.uncached = 0
+
+	def __repr__(self):
+		return 'MEMO({}, {} hits, {} misses, {} uncached)'.format(self.name, self.hits, self.misses, self.uncached)
+
+class Memoiser:
+	"""Keeps the results of calls to pure functions, for a single run, and counts how often they're used."""
+
+	def __init__(self, max_entries = MAX_ENTRIES):
+		"""Create a memoiser.
+
+		Arguments
+		max_entries -- The most results to keep at once. Once full, the least recently used result is forgotten."""
+		self.max_entries = max_entries
+		self.results = collections.OrderedDict()
+		self.functions = {}
+		# {name: reason} for the functions that couldn't be memoised
+		self.impure = {}
+
+	def function_stats(self, name, node):
+		return vivarium.profiler.function_stats(self.functions, name, node, FunctionStats)
+
+	def report(self):
+		"""Returns the number of hits and misses for each memoised function, and why the others weren't memoised, as a string."""
+		result = ['{:>20} {:>6} {:>10} {:>10} {:>10}'.format('function', 'line', 'hits', 'misses', 'uncached')]
+		for i in sorted(self.functions.values(), key = lambda i: (i.lineno is None, i.lineno, i.name)):
+			line = '' if i.lineno is None else i.lineno
+			result.append('{:>20} {:>6} {:10} {:10} {:10}'.format(i.name, line, i.hits, i.misses, i.uncached))
+		for name, reason in sorted(self.impure.items()):
+			result.append('{:>20} not memoised: {}'.format(name, reason))
+		return '\n'.join(result)
+
+class MemoisedFunction(vivarium.data.function.FrameFunction):
+	"""A pure function that looks up its results in a Memoiser before running."""
+
+	__slots__ = ('memoiser', 'stats')
+
+	def call(self, arguments):
+		stats = self.stats
+		arguments_key = key(arguments)
+		if arguments_key is UNCACHEABLE:
+			stats.uncached += 1
+			return super().call(arguments)
+		results = self.memoiser.results
+		call_key = (stats, arguments_key)
+		result = results.get(call_key, UNCACHEABLE)
+		if result is not UNCACHEABLE:
+			stats.hits += 1
+			results.move_to_end(call_key)
+			return result
+		stats.misses += 1
+		result = super().call(arguments)
+		if result is None or cacheable(result):
+			results[call_key] = result
+			if len(results) > self.memoiser.max_entries:
+				results.popitem(last = False)
+		return result
+
+class MemoisedFunctionDefinition(vivarium.core.FrameFunctionDefinition):
+	"""The definition of a pure function, which creates a MemoisedFunction."""
+
+	__slots__ = ('memoiser', 'stats')
+
+	def evaluate(self, scope):
+		new_function = MemoisedFunction(self.argument_names, self.block, self.frame_size, None, scope)
+		new_function.memoiser = self.memoiser
+		new_function.stats = self.stats
+		scope.set(self.function_name).set(new_function)
+		return new_function
+
+def instrument(tree, memoiser):
+	"""Returns a copy of a structure in which the pure functions keep their results in `memoiser`.
+
+	Purity is worked out from frame slots, so `tree` must have been through `vivarium.resolve` (fuel charges are fine).
+	Any results the memoiser is already holding are forgotten, since they may be from a different program."""
+	pure, memoiser.impure = pure_functions(tree)
+	memoiser.results.clear()
+	return instrument_node(tree, pure, memoiser)
+
+def instrument_node(node, pure, memoiser):
+	if type(node) is vivarium.core.FrameFunctionDefinition and node.slot is None and node.function_name in pure:
+		# Pure functions contain nothing else that needs replacing
+		result = MemoisedFunctionDefinition(node.function_name, node.argument_names, node.block, node.frame_size, node.slot)
+		result.memoiser = memoiser
+		result.stats = memoiser.function_stats(node.function_name, node)
+		return vivarium.core.copy_position(result, node)
+	return vivarium.core.map_children(node, lambda i: instrument_node(i, pure, memoiser))
@@ -0,0 +1,195 @@
+"""Simplifies the structure produced by `vivarium.transform` before it is run.
+
+	tree = vivarium.optimise.optimise(vivarium.transform.transform(code))
+
+The optimised structure behaves exactly like the original, but does less work when evaluated:
+- Operations on constants are worked out ahead of time, unless the result would be huge.
+- Branches that can never run are removed, as are loops that never run.
+- `pass` statements are removed, and nested lists of statements are flattened.
+
+The original structure isn't modified."""
+
+import operator
+import vivarium.core
+import vivarium.data
+
+Constant = vivarium.core.Constant
+Statements = vivarium.core.Statements
+Integer = vivarium.data.numeric.Integer
+String = vivarium.data.string.String
+
+# Integers with more bits than this, and strings longer than this, aren't created at compile time
+MAX_FOLDED_BITS = 4096
+MAX_FOLDED_LENGTH = 4096
+
+COMPARISONS = {
+	'==': operator.eq,
+	'!=': operator.ne,
+	'<=': operator.le,
+	'>=': operator.ge,
+	'<':  operator.lt,
+	'>':  operator.gt,
+}
+
+# Nodes that evaluate to None, regardless of what's in them
+NO_VALUE_NODES = (
+	vivarium.core.SetStatement,
+	vivarium.core.IfBranch,
+	vivarium.core.WhileLoop,
+	vivarium.core.PrintKeyword,
+	vivarium.core.Pass,
+)
+
+def constant_value(node):
+	"""Returns the value of a Constant node, or None if the node isn't one."""
+	if type(node) is Constant and isinstance(node.value, vivarium.data.DataType):
+		return node.value
+	return None
+
+def too_big(symbol, left, right):
+	"""Whether the result of an operation might be too big to compute at compile time."""
+	if type(left) is Integer and type(right) is Integer:
+		if symbol == '**':
+			return right.value > 0 and left.value.bit_length() * right.value > MAX_FOLDED_BITS
+		if symbol == '*':
+			return left.value.bit_length() + right.value.bit_length() > MAX_FOLDED_BITS
+	return False
+
+def fold(function, symbol, left, right):
+	"""Returns the result of an operation on two constant values.
+
+	Returns None if it shouldn't be done at compile time: the operation fails
+	(in which case it should fail at run time instead), or the result is too big."""
+	if too_big(symbol, left, right):
+		return None
+	try:
+		result = function(left, right)
+	except Exception:
+		return None
+	if not isinstance(result, vivarium.data.DataType):
+		return None
+	if type(result) is Integer and result.value.bit_length() > MAX_FOLDED_BITS:
+		return None
+	if type(result) is String and len(result) > MAX_FOLDED_LENGTH:
+		return None
+	return result
+
+def o_bin_op(node):
+	left = optimise_node(node.left)
+	right = optimise_node(node.right)
+	l = constant_value(left)
+	r = constant_value(right)
+	if l is not None and r is not None:
+		result = fold(node.operator, node.op_sym, l, r)
+		if result is not None:
+			return Constant(result)
+	return vivarium.core.BinOp(left, right, node.op_sym)
+
+def o_comparison(node):
+	left = optimise_node(node.left)
+	right = optimise_node(node.right)
+	l = constant_value(left)
+	r = constant_value(right)
+	if l is not None and r is not None and node.operator in COMPARISONS:
+		result = fold(COMPARISONS[node.operator], node.operator, l, r)
+		if result is not None:
+			return Constant(result)
+	return vivarium.core.Comparison(left, node.operator, right)
+
+def o_statements(node, keep_value = False):
+	"""Flatten and optimise a list of statements.
+
+	If keep_value is set, the result evaluates to the same thing as the original.
+	Otherwise only its effects are kept (which is all that matters for blocks within other statements)."""
+	statements = []
+	for i in node.statements:
+		optimised = optimise_node(i)
+		if type(optimised) is Statements:
+			statements.extend(optimised.statements)
+		elif type(optimised) is not vivarium.core.Pass:
+			statements.append(optimised)
+	if keep_value and node.statements and isinstance(node.statements[-1], NO_VALUE_NODES):
+		if not statements or not isinstance(statements[-1], NO_VALUE_NODES):
+			statements.append(vivarium.core.Pass())
+	return Statements(statements)
+
+def o_if_branch(node):
+	condition = optimise_node(node.condition)
+	if_block = optimise_node(node.if_block)
+	else_block = None
+	if node.else_block is not None:
+		else_block = optimise_node(node.else_block)
+		if type(else_block) is Statements and not else_block.statements:
+			else_block = None
+	value = constant_value(condition)
+	if value is not None:
+		if value:
+			return if_block
+		return else_block if else_block is not None else Statements([])
+	return vivarium.core.IfBranch(condition, if_block, else_block)
+
+def o_while_loop(node):
+	condition = optimise_node(node.condition)
+	value = constant_value(condition)
+	if value is not None and not value:
+		return Statements([])
+	return vivarium.core.WhileLoop(condition, optimise_node(node.block))
+
+def o_set_statement(node):
+	return vivarium.core.SetStatement(optimise_node(node.reference), optimise_node(node.expression))
+
+def o_list(node):
+	return vivarium.core.List([optimise_node(i) for i in node.elements])
+
+def o_tuple(node):
+	return vivarium.core.Tuple([optimise_node(i) for i in node.elements])
+
+def o_function_call(node):
+	arguments = vivarium.core.ArgumentList()
+	arguments.add_multiple([optimise_node(i) for i in node.arguments_expression.args])
+	return vivarium.core.FunctionCall(optimise_node(node.function_expression), arguments)
+
+def o_function_definition(node):
+	return vivarium.core.FunctionDefinition(node.function_name, node.argument_names, optimise_node(node.block))
+
+def o_return(node):
+	return vivarium.core.Return(optimise_node(node.expression))
+
+def o_print_keyword(node):
+	return vivarium.core.PrintKeyword(optimise_node(node.variable))
+
+OPTIMISERS = {
+	vivarium.core.BinOp: o_bin_op,
+	vivarium.core.Comparison: o_comparison,
+	vivarium.core.Statements: o_statements,
+	vivarium.core.IfBranch: o_if_branch,
+	vivarium.core.WhileLoop: o_while_loop,
+	vivarium.core.SetStatement: o_set_statement,
+	vivarium.core.List: o_list,
+	vivarium.core.Tuple: o_tuple,
+	vivarium.core.FunctionCall: o_function_call,
+	vivarium.core.FunctionDefinition: o_function_definition,
+	vivarium.core.Return: o_return,
+	vivarium.core.PrintKeyword: o_print_keyword,
+}
+
+def optimise_node(node):
+	optimiser = OPTIMISERS.get(type(node))
+	if optimiser is None:
+		return node
+	return vivarium.core.copy_position(optimiser(node), node)
+
+def optimise(node, dump = None):
+	"""Returns an optimised copy of a structure produced by `vivarium.transform.transform`.
+
+	Arguments:
+	node -- The structure to optimise.
+	dump -- If given, a file (such as sys.stdout) that the structure is written to, before and after optimisation."""
+	if type(node) is Statements:
+		result = o_statements(node, keep_value = True)
+	else:
+		result = optimise_node(node)
+	if dump is not None:
+		dump.write('Before optimisation:\n{}\n'.format(node))
+		dump.write('After optimisation:\n{}\n'.format(result))
+	return result
@@ -1,32 +1,103 @@
 """Used to either send data into the program as input, or to capture the output of the program."""
 
+import collections
+import mmap
+import os
 import vivarium.data.function
+import vivarium.errors
+import vivarium.signal
+
+# Output written to a file descriptor is sent in batches of at least this many characters
+BATCH_SIZE = 1 << 16
 
 class Output:
 	"""Captures and redirects a program's calls to `print`."""
 
-	def __init__(self, display = True, scope = None):
+	def __init__(self, display = True, scope = None, keep = None, max_size = None, fd = None, callback = None):
 		"""Create an output pipe.
 
 		Arguments
 		display -- Whether output should br forwarded to stdio via the real print function.
 			Defaults to True.
 		scope -- The scope in which to use the pipe. Usually the program's global scope.
-			Defaults to None, in which case the pipe will not assign itself."""
-		self.output = []
+			Defaults to None, in which case the pipe will not assign itself.
+		keep -- How many lines to hold on to for `get_data`. Once there are more, the oldest are dropped.
+			Defaults to None, which keeps them all. 0 keeps none, for when the output is only streamed.
+		max_size -- If given, the most characters (counting a newline for each line) the program may print.
+			Printing any more raises a `vivarium.errors.OutputLimitExceeded`, ending the run.
+		fd -- If given, a file descriptor that the output is written to, in batches of BATCH_SIZE characters.
+			Call `flush` once the program has finished, to write the last batch.
+		callback -- If given, a function called with each line as it's printed."""
+		if keep is None:
+			self.output = []
+		elif keep:
+			self.output = collections.deque(maxlen = keep)
+		else:
+			self.output = None
 		self.display = display
+		self.max_size = max_size
+		self.size = 0
+		self.fd = fd
+		self.pending = []
+		self.pending_size = 0
+		self.callback = callback
 		if scope:
-			scope.set('print').set(vivarium.data.function.FunctionBuiltin(self))
+			scope.bind('print', vivarium.data.function.FunctionBuiltin(self))
 
 	def __call__(self, *args):
-		s = ' '.join(str(i) for i in args)
-		self.output.append(s)
+		if len(args) == 1:
+			s = str(args[0])
+		else:
+			s = ' '.join(str(i) for i in args)
+		if self.max_size is not None:
+			self.size += len(s) + 1
+			if self.size > self.max_size:
+				raise vivarium.errors.OutputLimitExceeded(self.max_size)
+		if self.output is not None:
+			self.output.append(s)
+		if self.callback is not None:
+			self.callback(s)
+		if self.fd is not None:
+			self.pending.append(s)
+			self.pending_size += len(s) + 1
+			if self.pending_size >= BATCH_SIZE:
+				self.flush()
 		if self.display:
 			print(*args)
 
+	def flush(self):
+		"""Write any output still waiting to be sent to `fd`."""
+		if self.pending:
+			self.pending.append('')
+			data = '\n'.join(self.pending).encode('utf-8')
+			self.pending = []
+			self.pending_size = 0
+			while data:
+				data = data[os.write(self.fd, data):]
+
 	def get_data(self):
-		"""Return the output of the program as a list of strings."""
-		return self.output
+		"""Return the output of the program as a list of strings (or the last `keep` of them)."""
+		if type(self.output) is list:
+			return self.output
+		return list(self.output or ())
+
+def read_lines(source):
+	"""Returns an iterator over the lines in a file, memory-mapped file or other iterable, without their newlines."""
+	if isinstance(source, mmap.mmap):
+		source = iter(source.readline, b'')
+	elif not hasattr(source, 'readline'):
+		# Already split into lines
+		return iter(source)
+	return (strip_newline(i) for i in source)
+
+def strip_newline(line):
+	if type(line) is bytes:
+		line = line.decode('utf-8')
+	if line.endswith('\n'):
+		line = line[:-1]
+		if line.endswith('\r'):
+			line = line[:-1]
+	return line
 
 class Input:
 	"""Used to send input to a program. Overrides the `input` function."""
@@ -36,17 +107,73 @@ class Input:
 
 		Arguments
 		lines -- A list of strings. Strings will be passed one at a time, whenever `input` is called.
+			This can also be any other iterable of strings, an open file or a memory-mapped file,
+			in which case lines are only read as the program asks for them.
 		scope -- The scope in which to use the pipe. Usually the program's global scope.
 			Defaults to None, in which case the pipe will not assign itself.
 		"""
-		self.lines = lines
+		if type(lines) is list:
+			self.lines = lines
+			self.source = None
+		else:
+			self.lines = None
+			self.source = read_lines(lines)
 		self.current = 0
 		if scope:
-			scope.set('input').set(vivarium.data.function.FunctionBuiltin(self))
+			scope.bind('input', vivarium.data.function.FunctionBuiltin(self))
 
 	def __call__(self, *args):
-		if self.current == len(self.lines):
-			raise Exception('Attempted to read more input than was given.')
-		l = self.lines[self.current]
+		if self.lines is None:
+			l = next(self.source, None)
+			if l is None:
+				raise Exception('Attempted to read more input than was given.')
+		else:
+			if self.current == len(self.lines):
+				raise Exception('Attempted to read more input than was given.')
+			l = self.lines[self.current]
 		self.current += 1
-		return l
\ No newline at end of file
+		return l
+
+class BufferedOutput(Output):
+	"""An output pipe that holds at most `limit` lines, until they're taken away with `take`.
+
+	Printing while it's full raises a `vivarium.signal.WouldBlock`, which pauses a program running on the VM
+	until there's room (see `vivarium.vm.resume`)."""
+
+	def __init__(self, limit, scope = None):
+		super().__init__(False, scope)
+		self.limit = limit
+
+	def __call__(self, *args):
+		if len(self.output) >= self.limit:
+			raise vivarium.signal.WouldBlock()
+		super().__call__(*args)
+
+	def take(self):
+		"""Remove and return the lines printed since the last call."""
+		lines = self.output
+		self.output = []
+		return lines
+
+class StreamInput(Input):
+	"""An input pipe that can be given more lines while the program runs.
+
+	Reading past the last line raises a `vivarium.signal.WouldBlock`, which pauses a program running on the VM
+	until more lines are added (or the pipe is closed, after which reading past the end is an error, as for Input)."""
+
+	def __init__(self, lines, scope = None):
+		super().__init__(list(lines), scope)
+		self.closed = False
+		# Whether the last WouldBlock came from here, rather than from some other pipe
+		self.waiting = False
+
+	def __call__(self, *args):
+		if self.current == len(self.lines) and not self.closed:
+			self.waiting = True
+			raise vivarium.signal.WouldBlock()
+		self.waiting = False
+		return super().__call__(*args)
+
+	def empty(self):
+		"""Whether the program has read every line given so far."""
+		return self.current == len(self.lines)
@@ -0,0 +1,201 @@
+"""Finds out where a program spends its time.
+
+`instrument` returns a copy of a structure in which every node that came from the source
+(see `vivarium.core.position`) is wrapped in a Probe. Each time a Probe is evaluated, it counts the evaluation
+and times it, recording the results in a Profiler. The body of each function (and the program as a whole)
+is also wrapped, so the Profiler knows which functions were running.
+
+	profiler = vivarium.profiler.Profiler(code)
+	tree = vivarium.profiler.instrument(vivarium.easy.compile_tree(code), profiler)
+	tree.evaluate(scope)
+	print(profiler.report())
+
+Only instrumented structures are timed, so programs compiled the usual way don't pay anything.
+Instrumented structures can only be run by walking them (the 'tree' backend)."""
+
+import collections
+import time
+import vivarium.core
+
+# The name used for code outside of any function
+MODULE_NAME = '<module>'
+
+class NodeStats:
+	"""How many times a single node was evaluated, and how long that took."""
+
+	__slots__ = ('node', 'lineno', 'col', 'count', 'total', 'own', 'active')
+
+	def __init__(self, node, lineno, col):
+		self.node = node
+		self.lineno = lineno
+		self.col = col
+		self.count = 0
+		# Time spent evaluating the node, including (total) and excluding (own) the nodes within it, in seconds
+		self.total = 0.0
+		self.own = 0.0
+		# The number of evaluations of the node in progress. Only the outermost one adds to `total`,
+		# so that recursive calls aren't counted more than once.
+		self.active = 0
+
+	def __repr__(self):
+		return 'STATS({}:{} {}, {} times, {:.6f}s total, {:.6f}s self)'.format(
+			self.lineno, self.col, self.node, self.count, self.total, self.own)
+
+def function_stats(functions, name, node, new_stats):
+	"""Returns the stats in `functions` for the function called `name`, defined by `node`, adding them if they're not there.
+
+	Each function is counted once however many times it's defined, as long as it's always defined in the same place.
+	New stats are made with `new_stats(name, lineno, col)`."""
+	where = vivarium.core.position(node) or (None, None)
+	key = (name,) + where
+	if key not in functions:
+		functions[key] = new_stats(name, where[0], where[1])
+	return functions[key]
+
+class Profiler:
+	"""Collects counts and timings from structures instrumented with `instrument`."""
+
+	def __init__(self, code = None):
+		"""Create a profiler.
+
+		Arguments
+		code -- The program's source code, used to show each line in `report`."""
+		self.lines = code.splitlines() if code is not None else []
+		self.nodes = []
+		self.functions = {}
+		# The time spent within each node's children so far, for each node being evaluated
+		self.children = []
+		# The names of the functions being run, outermost first, and the time spent so far in the functions each one called
+		self.calls = []
+		self.callees = []
+		# Time spent in each distinct list of calls (as joined by `;`), not counting the functions they call
+		self.stacks = collections.Counter()
+
+	def node_stats(self, node):
+		stats = NodeStats(node, node.lineno, node.col)
+		self.nodes.append(stats)
+		return stats
+
+	def function_stats(self, name, node):
+		return function_stats(self.functions, name, node, NodeStats)
+
+	def line_stats(self):
+		"""Returns {lineno: (count, total, own)} for each line that was run.
+
+		`count` and `total` are those of the outermost node on the line (usually the statement),
+		while `own` is the time spent in all of the line's nodes, excluding any other lines they run."""
+		lines = {}
+		for i in self.nodes:
+			if i.count == 0:
+				continue
+			count, total, own = lines.get(i.lineno, (0, 0.0, 0.0))
+			lines[i.lineno] = (max(count, i.count), max(total, i.total), own + i.own)
+		return lines
+
+	def report(self):
+		"""Returns a report of the time spent on each line of the source, and in each function, as a string."""
+		lines = self.line_stats()
+		result = ['{:>6} {:>10} {:>10} {:>10}  {}'.format('line', 'count', 'total(s)', 'self(s)', 'source')]
+		for lineno in range(1, max(len(self.lines), max(lines, default = 0)) + 1):
+			text = self.lines[lineno - 1] if lineno <= len(self.lines) else ''
+			if lineno in lines:
+				count, total, own = lines[lineno]
+				result.append('{:6} {:10} {:10.6f} {:10.6f}  {}'.format(lineno, count, total, own, text))
+			else:
+				result.append('{:6} {:10} {:>10} {:>10}  {}'.format(lineno, '', '', '', text))
+		result.append('')
+		result.append('{:>20} {:>6} {:>10} {:>10} {:>10}'.format('function', 'line', 'calls', 'total(s)', 'self(s)'))
+		for i in sorted(self.functions.values(), key = lambda i: -i.total):
+			line = '' if i.lineno is None else i.lineno
+			result.append('{:>20} {:>6} {:10} {:10.6f} {:10.6f}'.format(i.node, line, i.count, i.total, i.own))
+		return '\n'.join(result)
+
+	def collapsed(self):
+		"""Returns the time spent in each stack of function calls, in the 'collapsed' format read by flamegraph tools.
+
+		Each line is the names of the functions being run, outermost first and separated by `;`,
+		then a space and the time spent (in microseconds) with exactly those functions running."""
+		return ''.join('{} {}\n'.format(stack, round(taken * 1000000)) for stack, taken in sorted(self.stacks.items()))
+
+class Probe(vivarium.core.Node):
+	"""Counts and times the evaluations of a node."""
+
+	__slots__ = ('node', 'stats', 'profiler')
+
+	def __init__(self, node, stats, profiler):
+		self.node = node
+		self.stats = stats
+		self.profiler = profiler
+
+	def evaluate(self, scope):
+		stats = self.stats
+		children = self.profiler.children
+		stats.count += 1
+		stats.active += 1
+		children.append(0.0)
+		start = time.perf_counter()
+		try:
+			return self.node.evaluate(scope)
+		finally:
+			taken = time.perf_counter() - start
+			stats.active -= 1
+			if not stats.active:
+				stats.total += taken
+			stats.own += taken - children.pop()
+			if children:
+				children[-1] += taken
+
+	def __repr__(self):
+		return 'PROBE({})'.format(self.node)
+
+class FunctionProbe(Probe):
+	"""Counts and times calls to a function, by wrapping its body. Also keeps track of which functions are running."""
+
+	__slots__ = ('name',)
+
+	def __init__(self, node, stats, profiler, name):
+		super().__init__(node, stats, profiler)
+		self.name = name
+
+	def evaluate(self, scope):
+		profiler = self.profiler
+		stats = self.stats
+		stats.count += 1
+		stats.active += 1
+		profiler.calls.append(self.name)
+		profiler.callees.append(0.0)
+		# The body's nodes are on other lines to the call, so none of this counts towards the call's own time
+		profiler.children.append(0.0)
+		start = time.perf_counter()
+		try:
+			return self.node.evaluate(scope)
+		finally:
+			taken = time.perf_counter() - start
+			stats.active -= 1
+			if not stats.active:
+				stats.total += taken
+			own = taken - profiler.callees.pop()
+			stats.own += own
+			profiler.stacks[';'.join(profiler.calls)] += own
+			profiler.calls.pop()
+			profiler.children.pop()
+			if profiler.children:
+				profiler.children[-1] += taken
+			if profiler.callees:
+				profiler.callees[-1] += taken
+
+def instrument(node, profiler):
+	"""Returns a copy of a structure in which each node from the source, and each function, records its timings in `profiler`.
+
+	Any stage of compiling will do, but nodes made up by later stages (such as fuel charges) have no position,
+	so their time is counted towards the node around them."""
+	return FunctionProbe(instrument_node(node, profiler), profiler.function_stats(MODULE_NAME, node), profiler, MODULE_NAME)
+
+def instrument_node(node, profiler):
+	result = vivarium.core.map_children(node, lambda i: instrument_node(i, profiler))
+	if isinstance(node, (vivarium.core.FunctionDefinition, vivarium.core.FrameFunctionDefinition)):
+		stats = profiler.function_stats(node.function_name, node)
+		result.block = FunctionProbe(result.block, stats, profiler, node.function_name)
+	if vivarium.core.position(node) is None:
+		return result
+	return Probe(result, profiler.node_stats(node), profiler)
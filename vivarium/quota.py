@@ -0,0 +1,89 @@
+"""Limits how much memory a program's values can take up.
+
+Only values big enough to matter are counted: Strings and Integers of at least TRACKED_SIZE bytes.
+A program can only hold a fixed number of smaller values at once (one per variable, per call),
+so those are already limited by the size of the program and `max_depth`.
+
+Every big String and Integer reserves its size from the run's quota as it's created (see `account`),
+however it was made, and gives it back once it's no longer in use. If that would take the run over its limit,
+a `vivarium.errors.MemoryLimitExceeded` is raised instead. Multiplying and raising Integers to a power can build
+values far bigger than their operands, so those work out how big the result will be and `check` there's room
+for it first, and the value is never built.
+
+	quota = vivarium.quota.MemoryQuota(10 ** 6)
+	with quota:
+		program.evaluate(scope)
+	print(quota.peak)"""
+
+import threading
+import weakref
+import vivarium.errors
+
+# Values smaller than this (in bytes) aren't counted
+TRACKED_SIZE = 1024
+
+class Current(threading.local):
+	"""The quota of the run taking place on each thread."""
+	quota = None
+
+current = Current()
+
+class MemoryQuota:
+	"""Keeps track of the memory used by a single run of a program."""
+
+	def __init__(self, limit = None):
+		"""Create a quota.
+
+		Arguments
+		limit -- The maximum number of bytes that the run's values may take up at once. None for no limit."""
+		self.limit = limit
+		self.used = 0
+		self.peak = 0
+		# The quotas that were current before each `with` block this quota is used in
+		self.outer = []
+
+	def check(self, size):
+		"""Raise a MemoryLimitExceeded if there isn't room for another `size` bytes. Returns the bytes that would be used."""
+		used = self.used + size
+		if self.limit is not None and used > self.limit:
+			raise vivarium.errors.MemoryLimitExceeded(self.limit, used)
+		return used
+
+	def reserve(self, size):
+		"""Set aside `size` bytes, raising a MemoryLimitExceeded if there isn't enough room."""
+		used = self.check(size)
+		self.used = used
+		if used > self.peak:
+			self.peak = used
+
+	def release(self, size):
+		self.used -= size
+
+	def track(self, value, size):
+		"""Give back the `size` bytes reserved for `value` once it's no longer in use."""
+		weakref.finalize(value, self.release, size)
+
+	def __enter__(self):
+		"""Make this the quota of everything run on the current thread, until the `with` block ends."""
+		self.outer.append(current.quota)
+		current.quota = self
+		return self
+
+	def __exit__(self, *args):
+		current.quota = self.outer.pop()
+
+	def __repr__(self):
+		return 'QUOTA({}/{}, peak {})'.format(self.used, self.limit, self.peak)
+
+def check(size):
+	"""Raise a MemoryLimitExceeded if the current run's quota (if any) doesn't have room for a value of `size` bytes."""
+	quota = current.quota
+	if quota is not None:
+		quota.check(size)
+
+def account(value, size):
+	"""Reserve `size` bytes for a new value from the current run's quota (if any), until the value is no longer in use."""
+	quota = current.quota
+	if quota is not None:
+		quota.reserve(size)
+		quota.track(value, size)
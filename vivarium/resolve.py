@@ -0,0 +1,147 @@
+"""Assigns the variables inside functions to slots.
+
+`resolve` takes the structure produced by `vivarium.transform` and returns a new one
+in which the variables of each function live in a fixed-size Frame (see `vivarium.scope.Frame`).
+Reading or writing a variable then indexes straight into the right frame,
+instead of searching up a chain of Scopes by name.
+
+Variables at the top level of the program are left alone,
+since that scope is provided by whoever runs the program (and may persist between runs, as in the shell).
+Functions look them up by name in the scope they were defined in."""
+
+import vivarium.core
+
+class Layout:
+	"""The slots of a single function's Frame."""
+
+	def __init__(self, names, parent):
+		"""names -- The name of the variable in each slot. Arguments come first.
+		parent -- The Layout of the enclosing function, or None."""
+		self.names = names
+		self.parent = parent
+
+def assigned_names(node, names):
+	"""Add the names of variables assigned to within a block to `names`.
+
+	Doesn't look inside nested functions."""
+	t = type(node)
+	if t is vivarium.core.Statements:
+		for i in node.statements:
+			assigned_names(i, names)
+	elif t is vivarium.core.SetStatement:
+		if type(node.reference) is vivarium.core.VariableReference and node.reference.name not in names:
+			names.append(node.reference.name)
+	elif t is vivarium.core.FunctionDefinition:
+		if node.function_name not in names:
+			names.append(node.function_name)
+	elif t is vivarium.core.IfBranch:
+		assigned_names(node.if_block, names)
+		if node.else_block is not None:
+			assigned_names(node.else_block, names)
+	elif t is vivarium.core.WhileLoop:
+		assigned_names(node.block, names)
+	return names
+
+def read(name, layout, depth = 0):
+	"""Returns a node that reads the variable `name`, from within the function described by `layout`."""
+	if layout is None:
+		return vivarium.core.GlobalVariable(name)
+	if name not in layout.names:
+		return read(name, layout.parent, depth + 1)
+	slot = layout.names.index(name)
+	# Until the slot is assigned to, the variable is searched for further out
+	fallback = read(name, layout.parent, depth + 1)
+	if depth == 0:
+		return vivarium.core.LocalVariable(name, slot, fallback)
+	return vivarium.core.OuterVariable(name, depth, slot, fallback)
+
+def r_variable(node, layout):
+	if layout is None:
+		return node
+	return read(node.name, layout)
+
+def r_variable_reference(node, layout):
+	if layout is None:
+		return node
+	raise Exception('Unable to resolve a reference to ' + node.name + ' outside of an assignment')
+
+def r_set_statement(node, layout):
+	expression = resolve(node.expression, layout)
+	if layout is not None and type(node.reference) is vivarium.core.VariableReference:
+		name = node.reference.name
+		return vivarium.core.SetLocal(name, layout.names.index(name), expression)
+	return vivarium.core.SetStatement(resolve(node.reference, layout), expression)
+
+def r_statements(node, layout):
+	return vivarium.core.Statements([resolve(i, layout) for i in node.statements])
+
+def r_list(node, layout):
+	return vivarium.core.List([resolve(i, layout) for i in node.elements])
+
+def r_tuple(node, layout):
+	return vivarium.core.Tuple([resolve(i, layout) for i in node.elements])
+
+def r_if_branch(node, layout):
+	else_block = None
+	if node.else_block is not None:
+		else_block = resolve(node.else_block, layout)
+	return vivarium.core.IfBranch(resolve(node.condition, layout), resolve(node.if_block, layout), else_block)
+
+def r_function_call(node, layout):
+	arguments = vivarium.core.ArgumentList()
+	arguments.add_multiple([resolve(i, layout) for i in node.arguments_expression.args])
+	return vivarium.core.FunctionCall(resolve(node.function_expression, layout), arguments)
+
+def r_function_definition(node, layout):
+	names = assigned_names(node.block, list(node.argument_names))
+	inner = Layout(names, layout)
+	block = resolve(node.block, inner)
+	slot = None
+	if layout is not None:
+		slot = layout.names.index(node.function_name)
+	return vivarium.core.FrameFunctionDefinition(node.function_name, node.argument_names, block, len(names), slot)
+
+def r_return(node, layout):
+	return vivarium.core.Return(resolve(node.expression, layout))
+
+def r_while_loop(node, layout):
+	return vivarium.core.WhileLoop(resolve(node.condition, layout), resolve(node.block, layout))
+
+def r_print_keyword(node, layout):
+	return vivarium.core.PrintKeyword(resolve(node.variable, layout))
+
+def r_comparison(node, layout):
+	return vivarium.core.Comparison(resolve(node.left, layout), node.operator, resolve(node.right, layout))
+
+def r_bin_op(node, layout):
+	return vivarium.core.BinOp(resolve(node.left, layout), resolve(node.right, layout), node.op_sym)
+
+RESOLVERS = {
+	vivarium.core.Variable: r_variable,
+	vivarium.core.VariableReference: r_variable_reference,
+	vivarium.core.SetStatement: r_set_statement,
+	vivarium.core.Statements: r_statements,
+	vivarium.core.List: r_list,
+	vivarium.core.Tuple: r_tuple,
+	vivarium.core.IfBranch: r_if_branch,
+	vivarium.core.FunctionCall: r_function_call,
+	vivarium.core.FunctionDefinition: r_function_definition,
+	vivarium.core.Return: r_return,
+	vivarium.core.WhileLoop: r_while_loop,
+	vivarium.core.PrintKeyword: r_print_keyword,
+	vivarium.core.Comparison: r_comparison,
+	vivarium.core.BinOp: r_bin_op,
+}
+
+def resolve(node, layout = None):
+	"""Returns a copy of the structure with the variables inside functions assigned to slots.
+
+	Nodes without any variables in them (such as Constant and Pass) are shared with the original.
+
+	Arguments:
+	node -- A structure produced by `vivarium.transform.transform`.
+	layout -- Internal use only."""
+	resolver = RESOLVERS.get(type(node))
+	if resolver is None:
+		return node
+	return vivarium.core.copy_position(resolver(node, layout), node)
@@ -0,0 +1,176 @@
+"""Runs many programs in one process, taking turns.
+
+Each program is compiled for the VM, which can pause a program partway through and carry on later
+(see `vivarium.vm.resume`). A Scheduler gives its tasks a slice of `slice_steps` steps each, round-robin,
+so that one busy program can't hold up the others. A step is a jump or a function call,
+so every loop iteration and every call counts towards the slice.
+
+A task that calls `input` when there's nothing left to read is put aside until it's given more,
+rather than holding up the other tasks. A task that hasn't finished by its deadline is stopped
+with a `vivarium.errors.DeadlineExceeded`.
+
+	scheduler = vivarium.scheduler.Scheduler()
+	task = scheduler.add(code, ['1', '2'], deadline = 1.0)
+	scheduler.run()
+	print(task.status, task.output)"""
+
+import collections
+import time
+import vivarium.easy
+import vivarium.errors
+import vivarium.fuel
+import vivarium.pipes
+import vivarium.quota
+import vivarium.scope
+import vivarium.signal
+import vivarium.vm
+
+# The number of steps a task may take before the next task gets a turn, by default
+SLICE_STEPS = 1000
+
+# Task statuses
+READY = 'ready'        # Waiting for its next slice
+WAITING = 'waiting'    # Waiting for more input
+FINISHED = 'finished'  # Ran to the end
+FAILED = 'failed'      # Stopped by an error, which is in `task.error`
+
+class Task:
+	"""A program being run by a Scheduler. Create these with `Scheduler.add`."""
+
+	def __init__(self, scheduler, program, input_data, interactive, deadline, max_depth, max_steps, max_memory):
+		self.scheduler = scheduler
+		self.status = READY
+		self.error = None
+		self.deadline = deadline
+		self.expires = None if deadline is None else time.monotonic() + deadline
+		self.slices = 0
+		# Set up the scope, like `vivarium.easy.execute`
+		globs = vivarium.scope.builtin_scope()
+		self.pipe = vivarium.pipes.Output(display = False, scope = globs)
+		self.input = vivarium.pipes.StreamInput(input_data or [], globs)
+		self.input.closed = not interactive
+		if max_steps is not None:
+			vivarium.fuel.Fuel(max_steps, globs)
+		program_scope = vivarium.scope.Scope(globs)
+		self.quota = max_memory
+		if max_memory is not None and not isinstance(max_memory, vivarium.quota.MemoryQuota):
+			self.quota = vivarium.quota.MemoryQuota(max_memory)
+		if max_depth is None:
+			max_depth = vivarium.vm.MAX_DEPTH
+		self.execution = vivarium.vm.Execution(program.code, program_scope, max_depth)
+
+	@property
+	def output(self):
+		"""The lines printed by the program so far."""
+		return self.pipe.get_data()
+
+	@property
+	def done(self):
+		return self.status == FINISHED or self.status == FAILED
+
+	def feed(self, *lines):
+		"""Give the program more lines of input. If it was waiting for them, it's given its next slice."""
+		self.input.lines.extend(lines)
+		self.wake()
+
+	def close(self):
+		"""Mark the end of the program's input. Reading past it raises an exception, like `vivarium.easy.run`."""
+		self.input.closed = True
+		self.wake()
+
+	def wake(self):
+		if self.status == WAITING:
+			self.status = READY
+			self.scheduler.ready.append(self)
+
+	def fail(self, error):
+		self.status = FAILED
+		self.error = error
+
+	def run_slice(self, steps):
+		"""Run the program for up to `steps` steps."""
+		execution = self.execution
+		try:
+			if self.quota is None:
+				finished = vivarium.vm.resume(execution, steps)
+			else:
+				with self.quota:
+					finished = vivarium.vm.resume(execution, steps)
+		except vivarium.signal.WouldBlock:
+			self.status = WAITING
+		except Exception as e:
+			self.fail(e)
+		else:
+			self.slices += 1
+			if finished:
+				self.status = FINISHED
+
+	def __repr__(self):
+		return 'TASK({}, {} slices)'.format(self.status, self.slices)
+
+class Scheduler:
+	"""Shares a single thread between many programs, giving each of them a slice of `slice_steps` steps in turn."""
+
+	def __init__(self, slice_steps = SLICE_STEPS):
+		self.slice_steps = slice_steps
+		self.tasks = []
+		# Tasks waiting for their next slice, in the order they get one
+		self.ready = collections.deque()
+
+	def add(self, code, input_data = None, interactive = False, deadline = None, max_depth = None, max_steps = None, max_memory = None):
+		"""Add a program to be run, and return its Task.
+
+		Arguments:
+		code -- Python code to run (as a string), or a program compiled with the 'vm' backend.
+
+		Keyword arguments:
+		input_data -- A list of strings that will be given to the program as it calls `input`.
+		interactive -- Whether more input may come later, through `Task.feed`. False by default.
+			If True, a program that has read everything it's been given waits until it's given more (or `Task.close` is called).
+			If False, reading more input than was given raises an exception, like `vivarium.easy.run`.
+		deadline -- If given, the number of seconds (from now) that the program has to finish.
+			If it hasn't finished by then, it fails with a `vivarium.errors.DeadlineExceeded`.
+		max_depth, max_steps, max_memory -- Limits, as for `vivarium.easy.run`.
+		"""
+		if isinstance(code, str):
+			program = vivarium.easy.compile_cached(code, 'vm', metered = max_steps is not None)
+		else:
+			program = code
+		if type(program) is not vivarium.vm.Program:
+			raise ValueError("The scheduler can only run programs compiled with the 'vm' backend")
+		task = Task(self, program, input_data, interactive, deadline, max_depth, max_steps, max_memory)
+		self.tasks.append(task)
+		self.ready.append(task)
+		return task
+
+	def run_round(self):
+		"""Give each task that's ready one slice. Returns False if there weren't any."""
+		if not self.ready:
+			return False
+		for i in range(len(self.ready)):
+			task = self.ready.popleft()
+			if task.status != READY:
+				continue
+			if task.expires is not None and time.monotonic() > task.expires:
+				task.fail(vivarium.errors.DeadlineExceeded(task.deadline))
+				continue
+			task.run_slice(self.slice_steps)
+			if task.status == READY:
+				self.ready.append(task)
+		return True
+
+	def run(self):
+		"""Run tasks until each of them has either finished, failed or is waiting for input.
+
+		Waiting tasks whose deadline has passed are failed. Returns the tasks still waiting."""
+		while self.run_round():
+			pass
+		now = time.monotonic()
+		waiting = []
+		for task in self.tasks:
+			if task.status == WAITING:
+				if task.expires is not None and now > task.expires:
+					task.fail(vivarium.errors.DeadlineExceeded(task.deadline))
+				else:
+					waiting.append(task)
+		return waiting
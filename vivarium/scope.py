@@ -6,6 +6,8 @@ import vivarium.data.datatype
 class Scope:
 	"""Stores program state. Includes variables and not much else."""
 
+	__slots__ = ('values', 'superscope')
+
 	def __init__(self, superscope = None):
 		"""Create a scope.
 
@@ -18,41 +20,51 @@ class Scope:
 		"""Returns the Store containing the variable called `name`.
 
 		Searches in order to obtain the value of the variable."""
-		if name in self.values:
-			return self.values[name]
-		if self.superscope is None:
-			raise Exception('no variable ' + str(name))
-		return self.superscope.get(name)
+		scope = self
+		while scope is not None:
+			values = scope.values
+			if name in values:
+				return values[name]
+			scope = scope.superscope
+		raise Exception('no variable ' + str(name))
 
 	def set(self, name, is_first = True):
 		"""Returns the Store containing the variable called `name`.
 
-		Searches in order to set the value of the variable.
-		If the variable doesn't exists within the current scope,
-		or any superscope, it will be created in the current scope.
+		If the variable exists in the outermost scope, that Store is returned.
+		Otherwise, it will be (re)created in the current scope.
 
 		Arguments
 		name -- The name of the variable.
 		is_first -- Internal use only."""
-		result = None
-		# If we have the variable, set it
-		if name in self.values:
-			result = self.values[name]
-		# Look for it in the superscope
-		if self.superscope is not None:
-			result = self.superscope.set(name, is_first = False)
-		# If variable was not found in the superscope, and we are the immidiate scope,
-		# create the variable
-		if result is None and is_first:
-			result = vivarium.data.store.Store(vivarium.data.none.NoneType)
-			self.values[name] = result
+		values = self.root().values
+		if name in values:
+			return values[name]
+		if not is_first:
+			return None
+		result = vivarium.data.store.Store(vivarium.data.none.NoneType)
+		self.values[name] = result
 		return result
 
+	def root(self):
+		"""Returns the outermost scope."""
+		scope = self
+		while scope.superscope is not None:
+			scope = scope.superscope
+		return scope
+
 	def lockdown(self):
 		"""Makes all the values contained within the scope read-only"""
 		for k, v in self.values.items():
 			v.readonly = True
 
+	def bind(self, name, value):
+		"""Put `value` in a new read-only Store called `name`, in this scope.
+
+		Any Store already called `name` here is replaced rather than changed, so this is safe to use
+		on scopes that share their Stores with others (see `builtin_scope`)."""
+		self.values[name] = vivarium.data.store.Store(value, True)
+
 	def unset(self, name):
 		"""Remove a variable. Doesn't search superscopes.
 		Usefull when modifying the global scope given by global_scope(), if you don't
@@ -63,12 +75,43 @@ class Scope:
 		l = ['{}: {}'.format(k, v) for k, v in self.values.items()]
 		return '{' + ', '.join(l) + '}'
 
+class Frame:
+	"""Stores the variables of a single function call, in the slots assigned by `vivarium.resolve`.
+
+	Slots are indexed directly instead of being looked up by name.
+	Slots that haven't been assigned to yet contain None."""
+
+	__slots__ = ('slots', 'superframe', 'scope', 'root')
+
+	def __init__(self, slots, superframe, scope, root):
+		"""Create a frame.
+
+		Arguments
+		slots -- The initial contents of the slots. A list, which the frame takes ownership of.
+		superframe -- The frame that the function was defined in. None if the function was defined at the top level.
+		scope -- The scope that the outermost function was defined in. Variables not found in any frame are searched for here.
+		root -- The `values` of the outermost scope. Assigning to a variable that exists there writes to it instead of the slot."""
+		self.slots = slots
+		self.superframe = superframe
+		self.scope = scope
+		self.root = root
+
+	def outer(self, depth):
+		"""Returns the frame `depth` levels up."""
+		frame = self
+		for i in range(depth):
+			frame = frame.superframe
+		return frame
+
+	def __repr__(self):
+		return 'FRAME({})'.format(', '.join(str(i) for i in self.slots))
+
 def print_function(*args):
 	print(*args)
 
 def int_function(v):
 	try:
-		return vivarium.data.numeric.Integer(int(v))
+		return vivarium.data.numeric.integer(int(v))
 	except Exception:
 		msg = 'Cannot convert "{}" to an integer'.format(v)
 		raise Exception(msg)
@@ -80,10 +123,21 @@ def input_function(prompt = ''):
 	return vivarium.data.string.String(input(str(prompt)))
 
 def max_function(*args):
-	return vivarium.data.numeric.Integer(max(int(i) for i in args))
+	return vivarium.data.numeric.integer(max(int(i) for i in args))
 
 def min_function(*args):
-	return vivarium.data.numeric.Integer(min(int(i) for i in args))
+	return vivarium.data.numeric.integer(min(int(i) for i in args))
+
+# The builtin functions, by name. Built once, and shared by every scope made by `builtin_scope`.
+# The Stores are read-only, so no program can change them.
+BUILTINS = {
+	'print': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(print_function), True),
+	'input': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(input_function), True),
+	'int': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(int_function), True),
+	'str': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(str_function), True),
+	'max': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(max_function), True),
+	'min': vivarium.data.store.Store(vivarium.data.function.FunctionBuiltin(min_function), True),
+}
 
 def global_scope():
 	"""Returns a pre-made 'global' scope containing some basic functions.
@@ -91,10 +145,16 @@ def global_scope():
 	Note that these are writeable, so you might wanted to called `lockdown` on it
 	fore it's passed to the program."""
 	globs = Scope()
-	globs.set('print').set(vivarium.data.function.FunctionBuiltin(print_function))
-	globs.set('input').set(vivarium.data.function.FunctionBuiltin(input_function))
-	globs.set('int').set(vivarium.data.function.FunctionBuiltin(int_function))
-	globs.set('str').set(vivarium.data.function.FunctionBuiltin(str_function))
-	globs.set('max').set(vivarium.data.function.FunctionBuiltin(max_function))
-	globs.set('min').set(vivarium.data.function.FunctionBuiltin(min_function))
-	return globs
\ No newline at end of file
+	for name, store in BUILTINS.items():
+		globs.set(name).set(store.value)
+	return globs
+
+def builtin_scope():
+	"""Returns a 'global' scope containing the builtin functions, for a single run of a program.
+
+	Unlike `global_scope`, the builtins are already read-only and are shared with every other run,
+	so making one of these costs little more than copying a small dict.
+	Use `bind` (not `set`) to add things such as pipes, since the shared Stores can't be changed."""
+	globs = Scope()
+	globs.values = BUILTINS.copy()
+	return globs
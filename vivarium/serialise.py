@@ -0,0 +1,138 @@
+"""Converts the structure produced by `vivarium.transform` (or `vivarium.resolve`) to and from plain data.
+
+The plain data only contains lists, strings, numbers, booleans and None, so it can be stored as JSON.
+Loading it rebuilds the structure without going anywhere near Python's `ast` module.
+
+	string = vivarium.serialise.dumps(tree)
+	tree = vivarium.serialise.loads(string)"""
+
+import json
+import vivarium.core
+import vivarium.data
+
+# Bumped whenever the serialised layout, or the structure produced by transform or resolve, changes
+FORMAT_VERSION = 3
+
+# The arguments each node's constructor takes, in order. These are also the names of its attributes.
+NODE_FIELDS = {
+	vivarium.core.SetStatement: ('reference', 'expression'),
+	vivarium.core.Variable: ('name',),
+	vivarium.core.VariableReference: ('name',),
+	vivarium.core.LocalVariable: ('name', 'slot', 'fallback'),
+	vivarium.core.OuterVariable: ('name', 'depth', 'slot', 'fallback'),
+	vivarium.core.GlobalVariable: ('name',),
+	vivarium.core.SetLocal: ('name', 'slot', 'expression'),
+	vivarium.core.Statements: ('statements',),
+	vivarium.core.Constant: ('value',),
+	vivarium.core.List: ('elements',),
+	vivarium.core.Tuple: ('elements',),
+	vivarium.core.IfBranch: ('condition', 'if_block', 'else_block'),
+	vivarium.core.FunctionCall: ('function_expression', 'arguments_expression'),
+	vivarium.core.FunctionDefinition: ('function_name', 'argument_names', 'block'),
+	vivarium.core.FrameFunctionDefinition: ('function_name', 'argument_names', 'block', 'frame_size', 'slot'),
+	vivarium.core.ArgumentList: ('args',),
+	vivarium.core.Return: ('expression',),
+	vivarium.core.WhileLoop: ('condition', 'block'),
+	vivarium.core.PrintKeyword: ('variable',),
+	vivarium.core.Comparison: ('left', 'operator', 'right'),
+	vivarium.core.BinOp: ('left', 'right', 'op_sym'),
+	vivarium.core.Pass: (),
+	vivarium.core.Break: (),
+	vivarium.core.Continue: (),
+	vivarium.core.Charge: ('cost',),
+}
+
+NODE_TYPES = dict((cls.__name__, cls) for cls in NODE_FIELDS)
+
+def encode_constant(value):
+	"""Encode a vivarium data value (or Python's None)."""
+	if value is None:
+		return ['null']
+	if value is vivarium.data.none.NoneType:
+		return ['None']
+	t = type(value)
+	if t is vivarium.data.boolean.Boolean:
+		return ['bool', value.value]
+	if t is vivarium.data.numeric.Integer:
+		return ['int', value.value]
+	if t is vivarium.data.numeric.Float:
+		return ['float', value.value]
+	if t is vivarium.data.string.String:
+		return ['str', value.value]
+	raise ValueError('Unable to serialise constant {} (of type {})'.format(value, t))
+
+def decode_constant(data):
+	if type(data) is not list or not data:
+		raise ValueError('Expected a constant, found ' + repr(data))
+	kind = data[0]
+	if kind not in ('null', 'None') and len(data) != 2:
+		raise ValueError('Expected a constant, found ' + repr(data))
+	if kind == 'null':
+		return None
+	if kind == 'None':
+		return vivarium.data.none.NoneType
+	if kind == 'bool':
+		return vivarium.data.boolean.boolean(data[1])
+	if kind == 'int':
+		return vivarium.data.numeric.integer(data[1])
+	if kind == 'float':
+		return vivarium.data.numeric.Float(data[1])
+	if kind == 'str':
+		return vivarium.data.string.String(data[1])
+	raise ValueError('Unknown constant kind ' + repr(kind))
+
+def encode_value(value):
+	"""Encode an attribute of a node."""
+	if value is None or type(value) in (str, int, bool):
+		return value
+	if type(value) is list:
+		return ['list', [encode_value(i) for i in value]]
+	if type(value) in NODE_FIELDS:
+		return encode_node(value)
+	return ['constant', encode_constant(value)]
+
+def decode_value(data):
+	if type(data) is not list:
+		return data
+	if len(data) == 2 and data[0] == 'list' and type(data[1]) is list:
+		return [decode_value(i) for i in data[1]]
+	if len(data) == 2 and data[0] == 'constant':
+		return decode_constant(data[1])
+	return decode_node(data)
+
+def encode_node(node):
+	"""Encode a node, and everything within it."""
+	t = type(node)
+	if t not in NODE_FIELDS:
+		raise ValueError('Unable to serialise node of type ' + str(t))
+	where = vivarium.core.position(node)
+	return ['node', t.__name__, list(where) if where else None] + [encode_value(getattr(node, i)) for i in NODE_FIELDS[t]]
+
+def decode_node(data):
+	"""Rebuild a node encoded by `encode_node`. Raises a ValueError if the data isn't a node."""
+	if type(data) is not list or len(data) < 3 or data[0] != 'node':
+		raise ValueError('Expected a node, found ' + repr(data))
+	cls = NODE_TYPES.get(data[1])
+	if cls is None:
+		raise ValueError('Unknown node type ' + repr(data[1]))
+	if len(data) != 3 + len(NODE_FIELDS[cls]):
+		raise ValueError('Wrong number of fields for a node of type ' + data[1])
+	fields = [decode_value(i) for i in data[3:]]
+	if cls is vivarium.core.ArgumentList:
+		node = vivarium.core.ArgumentList().add_multiple(fields[0])
+	else:
+		node = cls(*fields)
+	if data[2] is not None:
+		vivarium.core.locate(node, *data[2])
+	return node
+
+def dumps(node):
+	"""Serialise a structure into a string."""
+	return json.dumps({'version': FORMAT_VERSION, 'tree': encode_node(node)})
+
+def loads(string):
+	"""Load a structure from a string produced by `dumps`."""
+	data = json.loads(string)
+	if data.get('version') != FORMAT_VERSION:
+		raise ValueError('Unsupported format version ' + repr(data.get('version')))
+	return decode_node(data['tree'])
@@ -0,0 +1,143 @@
+"""A long-lived server that runs programs sent to it as JSON lines.
+
+Start it with `python -m vivarium serve` to read requests from stdin and write results to stdout,
+or `python -m vivarium serve --socket PATH` to accept connections on a Unix socket.
+Each request is a JSON object on a line of its own:
+
+	{"id": 1, "code": "print(int(input()) * 2)", "input": ["21"], "max_steps": 100000, "timeout": 5}
+
+and gets back a single line:
+
+	{"id": 1, "output": ["42"], "error": null}
+
+Apart from "code", every field is optional: "id" is passed back as it is, "input" is a list of strings,
+"backend" and "optimise" are as for `vivarium.easy.compile`, and "max_depth", "max_steps", "max_memory"
+and "max_output" are as for `vivarium.easy.run`. "timeout" is the number of seconds the program may take.
+
+The server imports and warms up vivarium once, then forks a child for each request, so every run
+is isolated from the others without paying to start Python again. Programs are compiled (and cached,
+see `vivarium.easy.compile_cached`) before forking, so each program is only compiled once."""
+
+import json
+import os
+import select
+import signal
+import socketserver
+import time
+import vivarium.batch
+import vivarium.easy
+import vivarium.errors
+
+# A small program, run once at startup so that the code paths used by every request are already loaded
+WARMUP_CODE = '''
+def f(n):
+    if n < 2:
+        return n
+    return f(n - 1) + f(n - 2)
+i = 0
+while i < 3:
+    print(f(i))
+    i = i + 1
+'''
+
+def warm_up():
+	for backend in vivarium.easy.BACKENDS:
+		vivarium.easy.run(WARMUP_CODE, do_print = False, backend = backend)
+
+def run_request(bytecode, request):
+	"""Run the compiled program for a request (already parsed from JSON) in this process, and return the result."""
+	try:
+		output = vivarium.easy.execute(bytecode, request.get('input') or [], False,
+			request.get('max_depth'), request.get('max_steps'), request.get('max_memory'), request.get('max_output'))
+	except Exception as e:
+		return {'output': None, 'error': vivarium.batch.describe(e)}
+	return {'output': output, 'error': None}
+
+def run_forked(bytecode, request, timeout = None):
+	"""Run the compiled program for a request in a child process, and return the result.
+
+	If the child takes longer than `timeout` seconds, it's killed and the result's error is a DeadlineExceeded."""
+	read_end, write_end = os.pipe()
+	pid = os.fork()
+	if pid == 0:
+		# The child: run the program, send back the result and leave without any of the parent's cleanup
+		status = 0
+		try:
+			os.close(read_end)
+			data = json.dumps(run_request(bytecode, request)).encode('utf-8')
+			while data:
+				data = data[os.write(write_end, data):]
+		except BaseException:
+			status = 1
+		finally:
+			os._exit(status)
+	os.close(write_end)
+	expires = None if timeout is None else time.monotonic() + timeout
+	chunks = []
+	try:
+		while True:
+			wait = None if expires is None else max(0, expires - time.monotonic())
+			ready, _, _ = select.select([read_end], [], [], wait)
+			if not ready:
+				os.kill(pid, signal.SIGKILL)
+				return {'output': None, 'error': vivarium.batch.describe(vivarium.errors.DeadlineExceeded(timeout))}
+			chunk = os.read(read_end, 65536)
+			if not chunk:
+				break
+			chunks.append(chunk)
+	finally:
+		os.close(read_end)
+		os.waitpid(pid, 0)
+	if not chunks:
+		return {'output': None, 'error': 'WorkerDied: The process running the program exited'}
+	return json.loads(b''.join(chunks).decode('utf-8'))
+
+def handle(line):
+	"""Respond to a single line of JSON. Returns the response, as a line of JSON."""
+	request_id = None
+	try:
+		request = json.loads(line)
+		request_id = request.get('id')
+		backend = request.get('backend', 'tree')
+		if request.get('max_depth') is not None and backend != 'vm':
+			raise ValueError("max_depth is only supported by the 'vm' backend")
+		# Compile before forking, so that the compiled program stays in the cache for later requests
+		bytecode = vivarium.easy.compile_cached(request['code'], backend, optimise = request.get('optimise', False),
+			metered = request.get('max_steps') is not None)
+	except Exception as e:
+		result = {'output': None, 'error': vivarium.batch.describe(e)}
+	else:
+		if hasattr(os, 'fork'):
+			result = run_forked(bytecode, request, request.get('timeout'))
+		else:
+			result = run_request(bytecode, request)
+	result['id'] = request_id
+	return json.dumps(result) + '\n'
+
+def serve_stream(reader, writer):
+	"""Answer each line read from `reader` by writing a line to `writer`, until `reader` runs out."""
+	for line in reader:
+		if line.strip():
+			writer.write(handle(line))
+			writer.flush()
+
+class ConnectionHandler(socketserver.StreamRequestHandler):
+
+	def handle(self):
+		for line in self.rfile:
+			if line.strip():
+				self.wfile.write(handle(line.decode('utf-8')).encode('utf-8'))
+				self.wfile.flush()
+
+class UnixServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+	"""Forks a process for each connection. Each connection's requests are answered in order."""
+
+def serve_socket(path):
+	"""Accept connections on a Unix socket at `path`, until interrupted."""
+	if os.path.exists(path):
+		os.unlink(path)
+	with UnixServer(path, ConnectionHandler) as server:
+		try:
+			server.serve_forever()
+		finally:
+			os.unlink(path)
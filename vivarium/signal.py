@@ -1,4 +1,35 @@
-class ReturnSignal(Exception):
+"""How statements end a block early.
 
-	def __init__(self, data):
+A `return`, `break` or `continue` doesn't raise an exception. Instead, evaluating it produces a Completion,
+which is returned in place of the statement's usual value. Statements, IfBranch and WhileLoop pass a Completion
+straight back up, without evaluating anything else, until it reaches what it's meant for:
+loops consume BREAK and CONTINUE, and function calls consume RETURN.
+
+`vivarium.transform` rejects any of these that appear outside a function or loop, so they always have somewhere to go."""
+
+RETURN = 'return'
+BREAK = 'break'
+CONTINUE = 'continue'
+
+class Completion:
+	"""The result of a statement that ends the enclosing block early."""
+
+	__slots__ = ('kind', 'data')
+
+	def __init__(self, kind, data = None):
+		"""kind -- RETURN, BREAK or CONTINUE.
+		data -- The returned value, for RETURN."""
+		self.kind = kind
 		self.data = data
+
+	def __repr__(self):
+		return 'COMPLETION({}, {})'.format(self.kind, self.data)
+
+# `break` and `continue` carry no data, so they can share a single Completion each
+BREAK_COMPLETION = Completion(BREAK)
+CONTINUE_COMPLETION = Completion(CONTINUE)
+
+class WouldBlock(Exception):
+	"""Raised by a builtin function that can't finish yet, such as `input` while there's nothing to read.
+
+	The VM leaves the program just before the call, so that it can be resumed later (see `vivarium.vm.resume`)."""
@@ -0,0 +1,102 @@
+"""Lets other code watch a program as it runs, much like `sys.settrace`.
+
+A hook is a function called as `hook(event, node, arg)`, where `node` is the node that fired the event. The events are:
+	'call' -- A function written in the program is about to be called. `arg` is (function, arguments).
+	'return' -- That function has returned. `arg` is the value it returned.
+	'builtin' -- A builtin function (such as `print`) is about to be called. `arg` is (function, arguments).
+	'loop' -- A while loop is about to run its body again. `arg` is None.
+	'assign' -- A variable has been assigned to. `arg` is (name, value).
+
+`instrument` returns a copy of a structure in which the nodes that fire events are replaced with traced versions:
+
+	tree = vivarium.trace.instrument(vivarium.easy.compile_tree(code), [hook])
+	tree.evaluate(scope)
+
+Only the copy calls the hooks, so programs compiled the usual way don't check for hooks at all.
+Traced structures can only be run by walking them (the 'tree' backend)."""
+
+import vivarium.core
+import vivarium.data
+import vivarium.signal
+
+unwrap = vivarium.core.unwrap
+FunctionBuiltin = vivarium.data.function.FunctionBuiltin
+
+def fire(hooks, event, node, arg):
+	for hook in hooks:
+		hook(event, node, arg)
+
+class TracedFunctionCall(vivarium.core.FunctionCall):
+
+	__slots__ = ('hooks',)
+
+	def evaluate(self, scope):
+		function = unwrap(self.function_expression.evaluate(scope))
+		arguments = self.arguments_expression.evaluate(scope)
+		if type(function) is FunctionBuiltin:
+			fire(self.hooks, 'builtin', self, (function, arguments))
+			return function.call(arguments)
+		fire(self.hooks, 'call', self, (function, arguments))
+		result = function.call(arguments)
+		fire(self.hooks, 'return', self, unwrap(result))
+		return result
+
+class TracedWhileLoop(vivarium.core.WhileLoop):
+
+	__slots__ = ('hooks',)
+
+	def evaluate(self, scope):
+		while unwrap(self.condition.evaluate(scope)):
+			fire(self.hooks, 'loop', self, None)
+			result = self.block.evaluate(scope)
+			if type(result) is vivarium.core.Completion:
+				if result.kind is vivarium.signal.BREAK:
+					break
+				if result.kind is not vivarium.signal.CONTINUE:
+					return result
+		return None
+
+class TracedSetStatement(vivarium.core.SetStatement):
+
+	# The name is kept apart from the reference, which other instrumentation (such as the profiler) may wrap
+	__slots__ = ('hooks', 'name')
+
+	def evaluate(self, scope):
+		value = self.expression.evaluate(scope)
+		storage = self.reference.evaluate(scope)
+		storage.set(value)
+		fire(self.hooks, 'assign', self, (self.name, unwrap(value)))
+
+class TracedSetLocal(vivarium.core.SetLocal):
+
+	__slots__ = ('hooks',)
+
+	def evaluate(self, frame):
+		value = self.expression.evaluate(frame)
+		vivarium.core.assign_slot(frame, self.name, self.slot, value)
+		fire(self.hooks, 'assign', self, (self.name, unwrap(value)))
+
+# The traced version of each node that fires events
+TRACED = {
+	vivarium.core.FunctionCall: TracedFunctionCall,
+	vivarium.core.WhileLoop: TracedWhileLoop,
+	vivarium.core.SetStatement: TracedSetStatement,
+	vivarium.core.SetLocal: TracedSetLocal,
+}
+
+def instrument(node, hooks):
+	"""Returns a copy of a structure that calls each of `hooks` (a list of functions) as events happen.
+
+	Calls, loops and assignments are swapped for the traced versions in TRACED, whether or not they've been resolved
+	to frame slots; everything else is copied as it is."""
+	t = type(node)
+	result = None
+	if t in TRACED:
+		result = TRACED[t].__new__(TRACED[t])
+		result.hooks = hooks
+		if t is vivarium.core.SetStatement:
+			result.name = node.reference.name
+		where = vivarium.core.position(node)
+		if where is not None:
+			vivarium.core.locate(result, *where)
+	return vivarium.core.map_children(node, lambda i: instrument(i, hooks), result)
@@ -17,7 +17,7 @@ def t_name_constant(node):
 	if node.value is None:
 		return vivarium.core.Constant(vivarium.data.none.NoneType)
 	else:
-		return vivarium.core.Constant(vivarium.data.boolean.Boolean(node.value))
+		return vivarium.core.Constant(vivarium.data.boolean.boolean(node.value))
 
 def t_list(node):
 	assert type(node.ctx) is ast.Load
@@ -129,10 +129,50 @@ def t_arguments(node):
 def t_return(node):
 	return vivarium.core.Return(transform(node.value))
 
+def t_pass(node):
+	return vivarium.core.Pass()
+
+def t_break(node):
+	return vivarium.core.Break()
+
+def t_continue(node):
+	return vivarium.core.Continue()
+
+def check_control_flow(node, lines, in_function = False, in_loop = False):
+	"""Raise a SyntaxError if a `return`, `break` or `continue` appears somewhere Python wouldn't allow it.
+
+	`ast.parse` doesn't check this itself, it's left to Python's compiler."""
+	t = type(node)
+	message = None
+	if t is ast.Return and not in_function:
+		message = "'return' outside function"
+	elif t is ast.Break and not in_loop:
+		message = "'break' outside loop"
+	elif t is ast.Continue and not in_loop:
+		message = "'continue' not properly in loop"
+	if message is not None:
+		text = lines[node.lineno - 1] + '\n' if node.lineno <= len(lines) else None
+		raise SyntaxError(message, ('<string>', node.lineno, node.col_offset + 1, text))
+	if t is ast.FunctionDef:
+		in_function = True
+		in_loop = False
+	elif t is ast.While:
+		in_loop = True
+	for i in ast.iter_child_nodes(node):
+		check_control_flow(i, lines, in_function, in_loop)
+
 def transform(node):
+	if type(node) is str:
+		tree = ast.parse(node)
+		check_control_flow(tree, node.splitlines())
+		return transform(tree)
+	result = transform_node(node)
+	if isinstance(result, vivarium.core.Node) and hasattr(node, 'lineno'):
+		vivarium.core.locate(result, node.lineno, node.col_offset)
+	return result
+
+def transform_node(node):
 	t = type(node)
-	if t is str:
-		return transform(ast.parse(node))
 	if t is list:
 		return t_statement_list(node)
 	if t is ast.NameConstant:
@@ -169,4 +209,10 @@ def transform(node):
 		return t_function_def(node)
 	if t is ast.arguments:
 		return t_arguments(node)
+	if t is ast.Pass:
+		return t_pass(node)
+	if t is ast.Break:
+		return t_break(node)
+	if t is ast.Continue:
+		return t_continue(node)
 	raise Exception('Unable to process node of type ' + str(t))
\ No newline at end of file
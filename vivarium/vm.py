@@ -0,0 +1,718 @@
+"""A bytecode compiler and virtual machine.
+
+`compile` flattens the structure produced by `vivarium.transform` into a CodeObject:
+an array of instructions along with a pool of constants and a table of names.
+Loops and branches become jumps, so the machine runs a program with a single dispatch loop
+instead of recursing through nodes.
+
+	program = vivarium.vm.compile(vivarium.transform.transform(code))
+	program.evaluate(scope)
+
+Each instruction takes up two slots in the array: the opcode, then its argument.
+Programs can be converted to and from a string with `dumps` and `loads`."""
+
+import json
+import operator
+import vivarium.core
+import vivarium.data
+import vivarium.errors
+import vivarium.fuel
+import vivarium.scope
+import vivarium.serialise
+import vivarium.signal
+
+Store = vivarium.data.store.Store
+Function = vivarium.data.function.Function
+FrameFunction = vivarium.data.function.FrameFunction
+Frame = vivarium.scope.Frame
+Completion = vivarium.signal.Completion
+assert_datatype = vivarium.data.datatype.assert_datatype
+find_fuel = vivarium.fuel.find
+
+# The deepest that calls between functions compiled by the VM can be nested, by default
+MAX_DEPTH = 10000
+
+# Bumped whenever the instruction set or serialised layout changes
+FORMAT_VERSION = 4
+
+# Opcodes
+LOAD_CONST = 0         # Push constants[arg]
+LOAD_NAME = 1          # Push the value of the variable names[arg]
+STORE_NAME = 2         # Pop a value and assign it to the variable names[arg]
+LOAD_REF = 3           # Push the Store for the variable names[arg]
+STORE_REF = 4          # Pop a Store, then a value, and put the value in the Store
+BINARY = 5             # Pop two values and push OPERATORS[arg](left, right)
+POP_JUMP_IF_FALSE = 6  # Pop a value and jump to arg if it's falsy
+JUMP = 7               # Jump to arg
+CALL = 8               # Pop arg arguments, then a function, and push the result of the call
+RETURN_VALUE = 9       # Pop a value and return it from the current function
+# 10 is unused (it raised an exception for `return`, see `vivarium.signal`)
+POP_TOP = 11           # Discard the top of the stack
+UNWRAP = 12            # Replace a Store on top of the stack with its value
+MAKE_FUNCTION = 13     # Push a new Function built from the CodeObject in constants[arg]
+BUILD_LIST = 14        # Pop arg values and push them as a list
+BUILD_TUPLE = 15       # Pop arg values and push them as a tuple
+PRINT = 16             # Pop a value and print it (the `print` keyword)
+EVALUATE = 17          # Push the result of constants[arg].evaluate(scope), for nodes the compiler doesn't know
+LOAD_FAST = 18         # Push the value in slot arg of the frame, or look it up with fallbacks[arg] if it's unassigned
+STORE_FAST = 19        # Pop a value and assign it to slot arg of the frame
+LOAD_DEREF = 20        # Push the value of the variable described by derefs[arg], in an enclosing frame
+LOAD_GLOBAL = 21       # Push the value of the variable names[arg], from the scope the function was defined in
+MAKE_FRAME_FUNCTION = 22  # Push a new FrameFunction built from the CodeObject in constants[arg]
+DUP_TOP = 23           # Push another reference to the top of the stack
+CHARGE = 24            # Use up arg units of the run's fuel (see `vivarium.fuel`)
+
+OPCODE_NAMES = {
+	LOAD_CONST: 'LOAD_CONST',
+	LOAD_NAME: 'LOAD_NAME',
+	STORE_NAME: 'STORE_NAME',
+	LOAD_REF: 'LOAD_REF',
+	STORE_REF: 'STORE_REF',
+	BINARY: 'BINARY',
+	POP_JUMP_IF_FALSE: 'POP_JUMP_IF_FALSE',
+	JUMP: 'JUMP',
+	CALL: 'CALL',
+	RETURN_VALUE: 'RETURN_VALUE',
+	POP_TOP: 'POP_TOP',
+	UNWRAP: 'UNWRAP',
+	MAKE_FUNCTION: 'MAKE_FUNCTION',
+	BUILD_LIST: 'BUILD_LIST',
+	BUILD_TUPLE: 'BUILD_TUPLE',
+	PRINT: 'PRINT',
+	EVALUATE: 'EVALUATE',
+	LOAD_FAST: 'LOAD_FAST',
+	STORE_FAST: 'STORE_FAST',
+	LOAD_DEREF: 'LOAD_DEREF',
+	LOAD_GLOBAL: 'LOAD_GLOBAL',
+	MAKE_FRAME_FUNCTION: 'MAKE_FRAME_FUNCTION',
+	DUP_TOP: 'DUP_TOP',
+	CHARGE: 'CHARGE',
+}
+
+# The argument of a BINARY instruction is an index into this list.
+# Only append to it, the indices are part of the serialised format.
+OPERATOR_SYMBOLS = ['+', '-', '*', '/', '//', '%', '**', '==', '!=', '<', '>', '<=', '>=']
+OPERATORS = [
+	operator.add,
+	operator.sub,
+	operator.mul,
+	operator.truediv,
+	operator.floordiv,
+	operator.mod,
+	operator.pow,
+	operator.eq,
+	operator.ne,
+	operator.lt,
+	operator.gt,
+	operator.le,
+	operator.ge,
+]
+
+# Nodes whose `evaluate` never produces a Store, so their result doesn't need unwrapping.
+VALUE_NODES = (
+	vivarium.core.Constant,
+	vivarium.core.Variable,
+	vivarium.core.LocalVariable,
+	vivarium.core.OuterVariable,
+	vivarium.core.GlobalVariable,
+	vivarium.core.BinOp,
+	vivarium.core.Comparison,
+	vivarium.core.List,
+	vivarium.core.Tuple,
+)
+
+# Nodes that don't produce a value when evaluated
+STATEMENT_NODES = (
+	vivarium.core.SetStatement,
+	vivarium.core.SetLocal,
+	vivarium.core.IfBranch,
+	vivarium.core.WhileLoop,
+	vivarium.core.PrintKeyword,
+	vivarium.core.Pass,
+	vivarium.core.Charge,
+)
+
+# Statements that leave the current block
+CONTROL_NODES = (
+	vivarium.core.Return,
+	vivarium.core.Break,
+	vivarium.core.Continue,
+)
+
+class CodeObject:
+	"""A compiled block of code. Either a whole program or the body of a function."""
+
+	__slots__ = ('name', 'argument_names', 'instructions', 'constants', 'names', 'is_function', 'slot_names', 'fallbacks', 'derefs')
+
+	def __init__(self, name, argument_names, instructions, constants, names, is_function, slot_names = None, fallbacks = None, derefs = None):
+		"""Arguments:
+		name -- The name of the function, or '<module>'.
+		argument_names -- The names of the function's arguments. A list of strings.
+		instructions -- A flat list of integers. Opcodes alternate with their arguments.
+		constants -- The values referred to by LOAD_CONST, MAKE_FUNCTION, MAKE_FRAME_FUNCTION and EVALUATE.
+		names -- The variable names referred to by LOAD_NAME, STORE_NAME, LOAD_REF and LOAD_GLOBAL.
+		is_function -- Whether this is the body of a function, rather than a whole program.
+		slot_names -- The name of the variable in each slot of the frame, if the code runs in a Frame. None otherwise.
+		fallbacks -- For each slot, where to look for the variable before the slot is assigned (see `load_chain`).
+		derefs -- The variables referred to by LOAD_DEREF (see `load_chain`)."""
+		self.name = name
+		self.argument_names = argument_names
+		self.instructions = instructions
+		self.constants = constants
+		self.names = names
+		self.is_function = is_function
+		self.slot_names = slot_names
+		self.fallbacks = fallbacks
+		self.derefs = derefs if derefs is not None else []
+
+	@property
+	def frame_size(self):
+		return len(self.slot_names)
+
+	def evaluate(self, scope):
+		"""Run the code in the given scope.
+
+		This allows CodeObjects to be used as the block of a vivarium.data.function.Function,
+		in which case the returned value is passed back in a Completion."""
+		result = execute(self, scope)
+		if self.is_function:
+			return Completion(vivarium.signal.RETURN, result)
+		return result
+
+	def __repr__(self):
+		return 'CODE({})'.format(self.name)
+
+class Program:
+	"""A compiled program. Call `evaluate(scope)` to run it."""
+
+	__slots__ = ('code',)
+
+	def __init__(self, code):
+		self.code = code
+
+	def evaluate(self, scope, max_depth = MAX_DEPTH):
+		"""Run the program. Calls nested more than `max_depth` deep raise a RecursionDepthExceeded."""
+		return execute(self.code, scope, max_depth)
+
+	def __repr__(self):
+		return 'PROGRAM({})'.format(self.code)
+
+class Compiler:
+	"""Builds a single CodeObject."""
+
+	def __init__(self, name, argument_names, is_function, frame_size = None):
+		self.name = name
+		self.argument_names = argument_names
+		self.is_function = is_function
+		self.instructions = []
+		self.constants = []
+		self.names = []
+		self.slot_names = None
+		self.fallbacks = None
+		self.derefs = []
+		# The start of each loop being compiled, and the `break` jumps to patch once its end is known
+		self.loops = []
+		if frame_size is not None:
+			self.slot_names = list(argument_names) + [None] * (frame_size - len(argument_names))
+			self.fallbacks = [None] * frame_size
+
+	def emit(self, opcode, argument = 0):
+		"""Add an instruction. Returns its position, so that jumps can be patched later."""
+		position = len(self.instructions)
+		self.instructions.append(opcode)
+		self.instructions.append(argument)
+		return position
+
+	def here(self):
+		"""The position that the next instruction will be placed at."""
+		return len(self.instructions)
+
+	def patch(self, position, target):
+		"""Set the target of the jump at `position`."""
+		self.instructions[position + 1] = target
+
+	def constant(self, value):
+		"""Returns the index of a value in the constant pool, adding it if necessary."""
+		for k, v in enumerate(self.constants):
+			if v is value:
+				return k
+		self.constants.append(value)
+		return len(self.constants) - 1
+
+	def name_index(self, name):
+		"""Returns the index of a name in the name table, adding it if necessary."""
+		if name not in self.names:
+			self.names.append(name)
+		return self.names.index(name)
+
+	def slot(self, name, slot):
+		"""Record the name of the variable in a slot, and return the slot."""
+		self.slot_names[slot] = name
+		return slot
+
+	def code(self):
+		return CodeObject(self.name, self.argument_names, self.instructions, self.constants, self.names, self.is_function,
+			self.slot_names, self.fallbacks, self.derefs)
+
+	def statement(self, node):
+		"""Compile a node, leaving nothing on the stack."""
+		t = type(node)
+		if t is vivarium.core.Statements:
+			for i in node.statements:
+				self.statement(i)
+		elif t is vivarium.core.SetStatement:
+			self.set_statement(node)
+		elif t is vivarium.core.SetLocal:
+			self.expression(node.expression)
+			self.emit(STORE_FAST, self.slot(node.name, node.slot))
+		elif t is vivarium.core.IfBranch:
+			self.if_branch(node)
+		elif t is vivarium.core.WhileLoop:
+			self.while_loop(node)
+		elif t is vivarium.core.Return:
+			self.value(node.expression)
+			self.emit(RETURN_VALUE)
+		elif t is vivarium.core.Break:
+			self.loops[-1][1].append(self.emit(JUMP))
+		elif t is vivarium.core.Continue:
+			self.emit(JUMP, self.loops[-1][0])
+		elif t is vivarium.core.PrintKeyword:
+			self.expression(node.variable)
+			self.emit(PRINT)
+		elif t is vivarium.core.FunctionDefinition:
+			self.function_definition(node)
+		elif t is vivarium.core.FrameFunctionDefinition:
+			self.frame_function_definition(node)
+		elif t is vivarium.core.Pass:
+			pass
+		elif t is vivarium.core.Charge:
+			self.emit(CHARGE, node.cost)
+		else:
+			self.expression(node)
+			self.emit(POP_TOP)
+
+	def result(self, node):
+		"""Compile a node, leaving the result of its `evaluate` on the stack."""
+		t = type(node)
+		if t is vivarium.core.Statements:
+			if not node.statements:
+				self.emit(LOAD_CONST, self.constant(None))
+				return
+			for i in node.statements[:-1]:
+				self.statement(i)
+			self.result(node.statements[-1])
+		elif t in STATEMENT_NODES or t in CONTROL_NODES:
+			self.statement(node)
+			self.emit(LOAD_CONST, self.constant(None))
+		else:
+			self.expression(node)
+
+	def expression(self, node):
+		"""Compile an expression, leaving its value on the stack."""
+		t = type(node)
+		if t is vivarium.core.Constant:
+			self.emit(LOAD_CONST, self.constant(node.value))
+		elif t is vivarium.core.Variable:
+			self.emit(LOAD_NAME, self.name_index(node.name))
+		elif t is vivarium.core.LocalVariable:
+			slot = self.slot(node.name, node.slot)
+			self.fallbacks[slot] = chain(node.fallback)
+			self.emit(LOAD_FAST, slot)
+		elif t is vivarium.core.OuterVariable:
+			self.derefs.append(chain(node))
+			self.emit(LOAD_DEREF, len(self.derefs) - 1)
+		elif t is vivarium.core.GlobalVariable:
+			self.emit(LOAD_GLOBAL, self.name_index(node.name))
+		elif t is vivarium.core.VariableReference:
+			self.emit(LOAD_REF, self.name_index(node.name))
+		elif t is vivarium.core.BinOp:
+			self.binary(node.left, node.right, node.op_sym)
+		elif t is vivarium.core.Comparison and node.operator in OPERATOR_SYMBOLS:
+			self.binary(node.left, node.right, node.operator)
+		elif t is vivarium.core.FunctionCall:
+			self.value(node.function_expression)
+			for i in node.arguments_expression.args:
+				self.value(i)
+			self.emit(CALL, len(node.arguments_expression.args))
+		elif t is vivarium.core.FunctionDefinition:
+			# Function definitions return the new function
+			self.function_definition(node, True)
+		elif t is vivarium.core.FrameFunctionDefinition:
+			self.frame_function_definition(node, True)
+		elif t is vivarium.core.List:
+			for i in node.elements:
+				self.expression(i)
+			self.emit(BUILD_LIST, len(node.elements))
+		elif t is vivarium.core.Tuple:
+			for i in node.elements:
+				self.expression(i)
+			self.emit(BUILD_TUPLE, len(node.elements))
+		elif t is vivarium.core.Statements or t in CONTROL_NODES or t in STATEMENT_NODES:
+			self.result(node)
+		else:
+			self.emit(EVALUATE, self.constant(node))
+
+	def value(self, node):
+		"""Compile an expression, leaving its unwrapped value on the stack."""
+		self.expression(node)
+		if not isinstance(node, VALUE_NODES):
+			self.emit(UNWRAP)
+
+	def binary(self, left, right, symbol):
+		if symbol == '!':
+			# BinOp uses '!' for inequality
+			symbol = '!='
+		self.value(left)
+		self.value(right)
+		self.emit(BINARY, OPERATOR_SYMBOLS.index(symbol))
+
+	def set_statement(self, node):
+		self.expression(node.expression)
+		if type(node.reference) is vivarium.core.VariableReference:
+			self.emit(STORE_NAME, self.name_index(node.reference.name))
+		else:
+			self.expression(node.reference)
+			self.emit(STORE_REF)
+
+	def if_branch(self, node):
+		self.value(node.condition)
+		jump_to_else = self.emit(POP_JUMP_IF_FALSE)
+		self.statement(node.if_block)
+		if node.else_block is None:
+			self.patch(jump_to_else, self.here())
+		else:
+			jump_to_end = self.emit(JUMP)
+			self.patch(jump_to_else, self.here())
+			self.statement(node.else_block)
+			self.patch(jump_to_end, self.here())
+
+	def while_loop(self, node):
+		start = self.here()
+		self.value(node.condition)
+		breaks = [self.emit(POP_JUMP_IF_FALSE)]
+		self.loops.append((start, breaks))
+		self.statement(node.block)
+		self.loops.pop()
+		self.emit(JUMP, start)
+		for i in breaks:
+			self.patch(i, self.here())
+
+	def function_definition(self, node, keep = False):
+		code = compile_function(node.function_name, node.argument_names, node.block)
+		self.emit(MAKE_FUNCTION, self.constant(code))
+		if keep:
+			self.emit(DUP_TOP)
+		self.emit(STORE_NAME, self.name_index(node.function_name))
+
+	def frame_function_definition(self, node, keep = False):
+		code = compile_function(node.function_name, node.argument_names, node.block, node.frame_size)
+		self.emit(MAKE_FRAME_FUNCTION, self.constant(code))
+		if keep:
+			self.emit(DUP_TOP)
+		if node.slot is None:
+			self.emit(STORE_NAME, self.name_index(node.function_name))
+		else:
+			self.emit(STORE_FAST, self.slot(node.function_name, node.slot))
+
+def chain(node):
+	"""Describes where to find a variable, given the node that reads it from within a function.
+
+	Returns `[[[depth, slot], ...], name]`: each frame slot to try in turn,
+	then the name to look up in the scope if they're all unassigned."""
+	slots = []
+	while type(node) is not vivarium.core.GlobalVariable:
+		depth = node.depth if type(node) is vivarium.core.OuterVariable else 0
+		slots.append([depth, node.slot])
+		node = node.fallback
+	return [slots, node.name]
+
+def load_chain(frame, chain):
+	"""Retrieve the value of a variable described by `chain`."""
+	slots, name = chain
+	for depth, slot in slots:
+		value = frame.outer(depth).slots[slot]
+		if value is not None:
+			return value
+	return frame.scope.get(name).get()
+
+def compile_function(name, argument_names, block, frame_size = None):
+	"""Compile the body of a function into a CodeObject.
+
+	If frame_size is given, the function's variables have been resolved into slots and it runs in a Frame."""
+	compiler = Compiler(name, argument_names, True, frame_size)
+	compiler.statement(block)
+	compiler.emit(LOAD_CONST, compiler.constant(None))
+	compiler.emit(RETURN_VALUE)
+	return compiler.code()
+
+def compile(node):
+	"""Compile a structure produced by `vivarium.transform.transform` into a Program."""
+	compiler = Compiler('<module>', [], False)
+	compiler.result(node)
+	compiler.emit(RETURN_VALUE)
+	return Program(compiler.code())
+
+def execute(code, scope, max_depth = MAX_DEPTH):
+	"""Run a CodeObject in the given scope (or Frame) and return the value it returns.
+
+	Calls to functions compiled by the VM don't recurse in Python. The caller's state is saved
+	on a list and the callee runs in the same loop, so programs can recurse as deeply as `max_depth`
+	without using up Python's stack. Going any deeper raises a RecursionDepthExceeded."""
+	execution = Execution(code, scope, max_depth)
+	resume(execution)
+	return execution.result
+
+class Execution:
+	"""The state of a CodeObject being run by the VM, so that it can be paused and picked up again (see `resume`)."""
+
+	__slots__ = ('code', 'scope', 'pc', 'stack', 'calls', 'max_depth', 'finished', 'result')
+
+	def __init__(self, code, scope, max_depth = MAX_DEPTH):
+		self.code = code
+		self.scope = scope
+		self.pc = 0
+		self.stack = []
+		# The state of each suspended caller: (code, scope, pc, stack)
+		self.calls = []
+		self.max_depth = max_depth
+		self.finished = False
+		self.result = None
+
+	def __repr__(self):
+		return 'EXECUTION({}, pc {}, depth {})'.format(self.code.name, self.pc, len(self.calls))
+
+def resume(execution, steps = None):
+	"""Carry on running an Execution. Returns True once it has finished, with its return value in `execution.result`.
+
+	If `steps` is given, the execution is paused after that many steps and False is returned.
+	A step is a jump or a call to a function compiled by the VM, so every loop iteration and every call counts.
+
+	If a builtin function raises a `vivarium.signal.WouldBlock` (such as `input` with nothing to read yet),
+	the execution is left just before the call, and the WouldBlock is raised. Resuming it makes the call again."""
+	if steps is None:
+		# Counts down forever without reaching zero
+		steps = -1
+	max_depth = execution.max_depth
+	calls = execution.calls
+	fuel = None
+	code = execution.code
+	scope = execution.scope
+	instructions = code.instructions
+	constants = code.constants
+	names = code.names
+	if type(scope) is Frame:
+		slots = scope.slots
+		slot_names = code.slot_names
+		fallbacks = code.fallbacks
+		root = scope.root
+	stack = execution.stack
+	push = stack.append
+	pop = stack.pop
+	pc = execution.pc
+	while True:
+		opcode = instructions[pc]
+		argument = instructions[pc + 1]
+		pc += 2
+		if opcode == LOAD_FAST:
+			value = slots[argument]
+			if value is None:
+				value = load_chain(scope, fallbacks[argument])
+			push(value)
+		elif opcode == LOAD_NAME:
+			push(scope.get(names[argument]).get())
+		elif opcode == LOAD_CONST:
+			push(constants[argument])
+		elif opcode == BINARY:
+			right = pop()
+			stack[-1] = OPERATORS[argument](stack[-1], right)
+		elif opcode == STORE_FAST:
+			value = pop()
+			name = slot_names[argument]
+			if name in root:
+				root[name].set(value)
+			else:
+				assert_datatype(value)
+				slots[argument] = value.copy()
+		elif opcode == STORE_NAME:
+			value = pop()
+			scope.set(names[argument]).set(value)
+		elif opcode == POP_JUMP_IF_FALSE:
+			if not pop():
+				pc = argument
+		elif opcode == JUMP:
+			pc = argument
+			steps -= 1
+			if not steps:
+				execution.code, execution.scope, execution.pc, execution.stack = code, scope, pc, stack
+				return False
+		elif opcode == CALL:
+			if argument:
+				arguments = stack[-argument:]
+				del stack[-argument:]
+			else:
+				arguments = []
+			function = pop()
+			t = type(function)
+			if (t is FrameFunction or t is Function) and type(function.block) is CodeObject:
+				# Run the body in this loop, rather than through `call`
+				if len(calls) >= max_depth:
+					raise vivarium.errors.RecursionDepthExceeded(max_depth)
+				callee_scope = function.bind(arguments)
+				calls.append((code, scope, pc, stack))
+				code = function.block
+				scope = callee_scope
+				instructions = code.instructions
+				constants = code.constants
+				names = code.names
+				if t is FrameFunction:
+					slots = scope.slots
+					slot_names = code.slot_names
+					fallbacks = code.fallbacks
+					root = scope.root
+				stack = []
+				push = stack.append
+				pop = stack.pop
+				pc = 0
+				steps -= 1
+				if not steps:
+					execution.code, execution.scope, execution.pc, execution.stack = code, scope, pc, stack
+					return False
+			else:
+				try:
+					push(function.call(arguments))
+				except vivarium.signal.WouldBlock:
+					# Put everything back the way it was before the call, so that it's made again on resuming
+					push(function)
+					stack.extend(arguments)
+					execution.code, execution.scope, execution.pc, execution.stack = code, scope, pc - 2, stack
+					raise
+		elif opcode == UNWRAP:
+			if type(stack[-1]) is Store:
+				stack[-1] = stack[-1].get()
+		elif opcode == RETURN_VALUE:
+			value = pop()
+			if not calls:
+				execution.finished = True
+				execution.result = value
+				return True
+			# Resume the caller
+			code, scope, pc, stack = calls.pop()
+			instructions = code.instructions
+			constants = code.constants
+			names = code.names
+			if type(scope) is Frame:
+				slots = scope.slots
+				slot_names = code.slot_names
+				fallbacks = code.fallbacks
+				root = scope.root
+			push = stack.append
+			pop = stack.pop
+			push(value)
+		elif opcode == LOAD_GLOBAL:
+			push(scope.scope.get(names[argument]).get())
+		elif opcode == LOAD_DEREF:
+			push(load_chain(scope, code.derefs[argument]))
+		elif opcode == POP_TOP:
+			pop()
+		elif opcode == LOAD_REF:
+			push(scope.set(names[argument]))
+		elif opcode == STORE_REF:
+			storage = pop()
+			storage.set(pop())
+		elif opcode == MAKE_FRAME_FUNCTION:
+			function_code = constants[argument]
+			if type(scope) is Frame:
+				push(FrameFunction(function_code.argument_names, function_code, function_code.frame_size, scope, scope.scope))
+			else:
+				push(FrameFunction(function_code.argument_names, function_code, function_code.frame_size, None, scope))
+		elif opcode == MAKE_FUNCTION:
+			function_code = constants[argument]
+			push(Function(function_code.argument_names, function_code, scope))
+		elif opcode == BUILD_LIST:
+			values = stack[len(stack) - argument:]
+			del stack[len(stack) - argument:]
+			push(values)
+		elif opcode == BUILD_TUPLE:
+			values = tuple(stack[len(stack) - argument:])
+			del stack[len(stack) - argument:]
+			push(values)
+		elif opcode == DUP_TOP:
+			push(stack[-1])
+		elif opcode == PRINT:
+			print(pop())
+		elif opcode == CHARGE:
+			# Every call made from here runs in this loop, so they all share the same fuel
+			if fuel is None:
+				fuel = find_fuel(scope)
+			fuel.charge(argument)
+		elif opcode == EVALUATE:
+			push(constants[argument].evaluate(scope))
+		else:
+			raise Exception('Unknown opcode {} at {}'.format(opcode, pc - 2))
+
+def disassemble(code):
+	"""Returns a human readable listing of a CodeObject (or Program), including nested functions."""
+	if type(code) is Program:
+		code = code.code
+	lines = ['{}({}):'.format(code.name, ', '.join(code.argument_names))]
+	nested = []
+	for pc in range(0, len(code.instructions), 2):
+		opcode = code.instructions[pc]
+		argument = code.instructions[pc + 1]
+		detail = ''
+		if opcode in (LOAD_CONST, MAKE_FUNCTION, MAKE_FRAME_FUNCTION, EVALUATE):
+			detail = repr(code.constants[argument])
+		elif opcode in (LOAD_NAME, STORE_NAME, LOAD_REF, LOAD_GLOBAL):
+			detail = code.names[argument]
+		elif opcode in (LOAD_FAST, STORE_FAST):
+			detail = code.slot_names[argument]
+		elif opcode == LOAD_DEREF:
+			detail = repr(code.derefs[argument])
+		elif opcode == BINARY:
+			detail = OPERATOR_SYMBOLS[argument]
+		if opcode in (MAKE_FUNCTION, MAKE_FRAME_FUNCTION):
+			nested.append(code.constants[argument])
+		lines.append('{:6} {:20} {:6} {}'.format(pc, OPCODE_NAMES[opcode], argument, detail).rstrip())
+	for i in nested:
+		lines.append('')
+		lines.append(disassemble(i))
+	return '\n'.join(lines)
+
+def encode_constant(value):
+	if type(value) is CodeObject:
+		return ['code', encode_code(value)]
+	return vivarium.serialise.encode_constant(value)
+
+def decode_constant(data):
+	if data[0] == 'code':
+		return decode_code(data[1])
+	return vivarium.serialise.decode_constant(data)
+
+def encode_code(code):
+	return {
+		'name': code.name,
+		'arguments': code.argument_names,
+		'instructions': code.instructions,
+		'constants': [encode_constant(i) for i in code.constants],
+		'names': code.names,
+		'function': code.is_function,
+		'slots': code.slot_names,
+		'fallbacks': code.fallbacks,
+		'derefs': code.derefs,
+	}
+
+def decode_code(data):
+	constants = [decode_constant(i) for i in data['constants']]
+	return CodeObject(data['name'], data['arguments'], data['instructions'], constants, data['names'], data['function'],
+		data['slots'], data['fallbacks'], data['derefs'])
+
+def dumps(program):
+	"""Serialise a Program into a string."""
+	return json.dumps({'version': FORMAT_VERSION, 'code': encode_code(program.code)})
+
+def loads(string):
+	"""Load a Program from a string produced by `dumps`."""
+	data = json.loads(string)
+	if data.get('version') != FORMAT_VERSION:
+		raise ValueError('Unsupported bytecode version ' + repr(data.get('version')))
+	return Program(decode_code(data['code']))